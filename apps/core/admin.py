@@ -1 +1,18 @@
 # apps.core.admin
+
+from django.contrib import admin
+
+from .models import ExtractProfile, VideoJob
+
+
+@admin.register(ExtractProfile)
+class ExtractProfileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'fps', 'max_long_edge', 'image_format', 'quality', 'is_default')
+    list_editable = ('is_default',)
+
+
+@admin.register(VideoJob)
+class VideoJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'lease_owner', 'lease_expires_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('last_error', 'stage_stats')
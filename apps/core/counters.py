@@ -0,0 +1,78 @@
+# apps/core/counters.py
+"""
+任务计数器：labeled / audited / approved / rejected
+
+原逻辑每保存一次标注就对整个任务执行一次 COUNT(*)。这里改为在样本状态真正发生变化时，
+用 F() 表达式对 LabelTask 做原子增减，一次 UPDATE 搞定，并发保存也不会互相覆盖。
+调用方需在同一事务里对样本 select_for_update，保证读到的「变化前状态」可靠。
+计数若因异常或手工改库出现偏差，用 python manage.py reconcile_counters 校正。
+"""
+from django.db.models import Count, F, Min, Q
+
+from apps.core.models import LabelTask
+
+AUDIT_PENDING = 0
+AUDIT_APPROVED = 1
+AUDIT_REJECTED = 2
+
+# 计数字段 -> 样本满足的条件 (经由 LabelTask.samples 关联，用于对账统计)
+COUNTER_FILTERS = {
+    'labeled_count': Q(samples__is_labeled=True),
+    'audited_count': Q(samples__audit_status__in=[AUDIT_APPROVED, AUDIT_REJECTED]),
+    'approved_count': Q(samples__audit_status=AUDIT_APPROVED),
+    'rejected_count': Q(samples__audit_status=AUDIT_REJECTED),
+}
+COUNTER_FIELDS = tuple(COUNTER_FILTERS)
+
+
+def sample_state(sample):
+    """样本中影响计数的状态 (is_labeled, audit_status)"""
+    return sample.is_labeled, sample.audit_status
+
+
+def _flags(state):
+    is_labeled, audit_status = state
+    return {
+        'labeled_count': int(bool(is_labeled)),
+        'audited_count': int(audit_status != AUDIT_PENDING),
+        'approved_count': int(audit_status == AUDIT_APPROVED),
+        'rejected_count': int(audit_status == AUDIT_REJECTED),
+    }
+
+
+def counter_deltas(before, after):
+    """状态 before -> after 引起的计数变化，只返回非零项"""
+    old, new = _flags(before), _flags(after)
+    return {field: new[field] - old[field] for field in old if new[field] != old[field]}
+
+
+def merge_deltas(total, deltas):
+    for field, delta in deltas.items():
+        total[field] = total.get(field, 0) + delta
+    return total
+
+
+def apply_counter_deltas(task_id, deltas):
+    """把计数变化原子地写回任务；没有任何变化时不发 SQL"""
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if updates:
+        LabelTask.objects.filter(id=task_id).update(**updates)
+
+
+def record_transition(task_id, before, after):
+    apply_counter_deltas(task_id, counter_deltas(before, after))
+
+
+def actual_counts(tasks):
+    """
+    按样本表实际统计各任务的计数与首张样本 id (一条 GROUP BY 查询)
+    返回 {task_id: {'sample_count': n, 'labeled_count': n, ..., 'first_sample_id': id 或 None}}
+    """
+    annotations = {'actual_sample_count': Count('samples'), 'actual_first_sample_id': Min('samples__id')}
+    for field, condition in COUNTER_FILTERS.items():
+        annotations[f'actual_{field}'] = Count('samples', filter=condition)
+    rows = tasks.order_by().values('id').annotate(**annotations)
+    return {
+        row['id']: {key[len('actual_'):]: value for key, value in row.items() if key.startswith('actual_')}
+        for row in rows
+    }
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_sampleimage_audit_reason_sampleimage_audit_status_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("extract_fps", models.FloatField(default=1, verbose_name="抽帧频率")),
+                (
+                    "status",
+                    models.IntegerField(
+                        choices=[
+                            (0, "排队中"),
+                            (1, "处理中"),
+                            (2, "已完成"),
+                            (3, "失败"),
+                        ],
+                        default=0,
+                        verbose_name="队列状态",
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0, verbose_name="已尝试次数")),
+                (
+                    "max_attempts",
+                    models.IntegerField(default=3, verbose_name="最大尝试次数"),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="最早执行时间"
+                    ),
+                ),
+                (
+                    "lease_owner",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="租用者"
+                    ),
+                ),
+                (
+                    "lease_expires_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="租约到期时间"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, null=True, verbose_name="最近错误"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="video_jobs",
+                        to="core.labeltask",
+                        verbose_name="关联任务",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "视频处理队列",
+                "verbose_name_plural": "视频处理队列",
+                "db_table": "core_video_job",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "run_after"], name="video_job_status_idx"
+                    )
+                ],
+            },
+        ),
+    ]
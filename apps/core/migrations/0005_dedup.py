@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_videojob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="labeltask",
+            name="dedup_skipped",
+            field=models.IntegerField(default=0, verbose_name="跳过相似帧数"),
+        ),
+        migrations.AddField(
+            model_name="videojob",
+            name="dedup_distance",
+            field=models.IntegerField(blank=True, null=True, verbose_name="相似帧阈值"),
+        ),
+    ]
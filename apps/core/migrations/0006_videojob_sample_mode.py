@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_dedup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videojob",
+            name="max_fps",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="自适应最高频率"
+            ),
+        ),
+        migrations.AddField(
+            model_name="videojob",
+            name="min_fps",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="自适应最低频率"
+            ),
+        ),
+        migrations.AddField(
+            model_name="videojob",
+            name="sample_mode",
+            field=models.CharField(
+                choices=[("fixed", "固定频率"), ("adaptive", "场景自适应")],
+                default="fixed",
+                max_length=20,
+                verbose_name="采样模式",
+            ),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_videojob_sample_mode"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExtractProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="配置名称"
+                    ),
+                ),
+                ("fps", models.FloatField(default=1, verbose_name="抽帧频率")),
+                (
+                    "max_long_edge",
+                    models.IntegerField(
+                        blank=True,
+                        help_text="留空为保持原尺寸",
+                        null=True,
+                        verbose_name="最长边上限(像素)",
+                    ),
+                ),
+                (
+                    "image_format",
+                    models.CharField(
+                        choices=[("jpeg", "JPEG"), ("webp", "WebP"), ("png", "PNG")],
+                        default="jpeg",
+                        max_length=10,
+                        verbose_name="图片格式",
+                    ),
+                ),
+                (
+                    "quality",
+                    models.IntegerField(
+                        default=70,
+                        help_text="1~100，PNG 为无损，仅影响压缩级别",
+                        verbose_name="图片质量",
+                    ),
+                ),
+                (
+                    "is_default",
+                    models.BooleanField(default=False, verbose_name="默认配置"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "抽帧配置",
+                "verbose_name_plural": "抽帧配置",
+                "db_table": "core_extract_profile",
+                "ordering": ["-is_default", "id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="videojob",
+            name="profile",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="core.extractprofile",
+                verbose_name="抽帧配置",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:48
+
+from django.db import migrations
+
+DEFAULT_PROFILES = [
+    # 与原先固定逻辑一致：每秒 1 帧，原尺寸 JPEG 质量 70
+    {"name": "标准", "fps": 1, "max_long_edge": None, "image_format": "jpeg", "quality": 70, "is_default": True},
+    {"name": "轻量", "fps": 1, "max_long_edge": 1280, "image_format": "webp", "quality": 75, "is_default": False},
+    {"name": "高清", "fps": 2, "max_long_edge": None, "image_format": "jpeg", "quality": 90, "is_default": False},
+]
+
+
+def seed_profiles(apps, schema_editor):
+    ExtractProfile = apps.get_model("core", "ExtractProfile")
+    for data in DEFAULT_PROFILES:
+        ExtractProfile.objects.get_or_create(name=data["name"], defaults=data)
+
+
+def remove_profiles(apps, schema_editor):
+    ExtractProfile = apps.get_model("core", "ExtractProfile")
+    ExtractProfile.objects.filter(name__in=[p["name"] for p in DEFAULT_PROFILES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_extractprofile"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_profiles, remove_profiles),
+    ]
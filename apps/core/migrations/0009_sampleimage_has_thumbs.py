@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_seed_extract_profiles"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sampleimage",
+            name="has_thumbs",
+            field=models.BooleanField(default=False, verbose_name="是否已生成缩略图"),
+        ),
+    ]
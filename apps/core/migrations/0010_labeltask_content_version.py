@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_sampleimage_has_thumbs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="labeltask",
+            name="content_version",
+            field=models.IntegerField(
+                default=0,
+                help_text="图片或标注变化时递增，用于判断导出缓存是否过期",
+                verbose_name="内容版本",
+            ),
+        ),
+    ]
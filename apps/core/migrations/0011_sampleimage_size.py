@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_labeltask_content_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sampleimage",
+            name="height",
+            field=models.IntegerField(blank=True, null=True, verbose_name="图片高度"),
+        ),
+        migrations.AddField(
+            model_name="sampleimage",
+            name="width",
+            field=models.IntegerField(blank=True, null=True, verbose_name="图片宽度"),
+        ),
+    ]
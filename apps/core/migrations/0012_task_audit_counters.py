@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:57
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    LabelTask = apps.get_model("core", "LabelTask")
+    rows = LabelTask.objects.values("id").annotate(
+        labeled=Count("samples", filter=Q(samples__is_labeled=True)),
+        audited=Count("samples", filter=Q(samples__audit_status__in=[1, 2])),
+        approved=Count("samples", filter=Q(samples__audit_status=1)),
+        rejected=Count("samples", filter=Q(samples__audit_status=2)),
+    )
+    for row in rows:
+        LabelTask.objects.filter(id=row["id"]).update(
+            labeled_count=row["labeled"],
+            audited_count=row["audited"],
+            approved_count=row["approved"],
+            rejected_count=row["rejected"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_sampleimage_size"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="labeltask",
+            name="approved_count",
+            field=models.IntegerField(default=0, verbose_name="审核通过数"),
+        ),
+        migrations.AddField(
+            model_name="labeltask",
+            name="audited_count",
+            field=models.IntegerField(default=0, verbose_name="已审核数"),
+        ),
+        migrations.AddField(
+            model_name="labeltask",
+            name="rejected_count",
+            field=models.IntegerField(default=0, verbose_name="审核驳回数"),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_task_audit_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sampleimage",
+            index=models.Index(
+                fields=["task", "is_labeled", "id"], name="sample_task_labeled_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sampleimage",
+            index=models.Index(
+                fields=["task", "audit_status", "id"], name="sample_task_audit_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sampleimage",
+            index=models.Index(
+                fields=["task", "labeled_by", "id"], name="sample_task_labeler_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def fill_first_sample(apps, schema_editor):
+    LabelTask = apps.get_model("core", "LabelTask")
+    rows = LabelTask.objects.values("id").annotate(first_id=Min("samples__id")).exclude(first_id=None)
+    for row in rows:
+        LabelTask.objects.filter(id=row["id"]).update(first_sample_id=row["first_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_sample_gallery_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="labeltask",
+            name="first_sample_id",
+            field=models.IntegerField(
+                blank=True,
+                help_text="入库时写入，任务大厅「开始标注」直接跳转，不必逐个任务查询样本表",
+                null=True,
+                verbose_name="首张样本ID",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="labeltask",
+            index=models.Index(
+                fields=["state", "created_at"], name="task_state_created_idx"
+            ),
+        ),
+        migrations.RunPython(fill_first_sample, migrations.RunPython.noop),
+    ]
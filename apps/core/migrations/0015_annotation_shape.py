@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_task_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnnotationShape",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label", models.CharField(max_length=20, verbose_name="类别编号")),
+                (
+                    "shape_type",
+                    models.CharField(
+                        choices=[("polygon", "多边形"), ("rect", "矩形")],
+                        default="polygon",
+                        max_length=10,
+                        verbose_name="图形类型",
+                    ),
+                ),
+                ("point_count", models.IntegerField(default=0, verbose_name="顶点数")),
+                ("x_min", models.FloatField(verbose_name="外接框 x_min")),
+                ("y_min", models.FloatField(verbose_name="外接框 y_min")),
+                ("x_max", models.FloatField(verbose_name="外接框 x_max")),
+                ("y_max", models.FloatField(verbose_name="外接框 y_max")),
+                ("area", models.FloatField(default=0, verbose_name="面积(像素²)")),
+                (
+                    "sample",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shapes",
+                        to="core.sampleimage",
+                        verbose_name="样本",
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shapes",
+                        to="core.labeltask",
+                        verbose_name="任务",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "标注图形",
+                "verbose_name_plural": "标注图形",
+                "db_table": "core_annotation_shape",
+                "indexes": [
+                    models.Index(fields=["task", "label"], name="shape_task_label_idx"),
+                    models.Index(fields=["label"], name="shape_label_idx"),
+                ],
+            },
+        ),
+    ]
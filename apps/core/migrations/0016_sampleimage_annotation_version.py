@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_annotation_shape"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sampleimage",
+            name="annotation_version",
+            field=models.IntegerField(
+                default=0,
+                help_text="每次保存递增，增量保存时用于检测并发修改",
+                verbose_name="标注版本",
+            ),
+        ),
+    ]
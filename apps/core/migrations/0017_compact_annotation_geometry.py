@@ -0,0 +1,144 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:40
+
+import base64
+import json
+import os
+import struct
+
+import cv2
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+# 编码格式与 apps/labeler/geometry.py 相同；迁移里保留一份副本，之后修改该模块不会影响已执行的迁移
+GRID = 16383
+COMPACT_KEY = "pc"
+
+
+def _quantize(value, size):
+    return int(round(min(max(value / size, 0.0), 1.0) * GRID))
+
+
+def _encode_points(points, width, height):
+    values = []
+    last_x = last_y = 0
+    for p in points:
+        x, y = _quantize(float(p["x"]), width), _quantize(float(p["y"]), height)
+        values += [x - last_x, y - last_y]
+        last_x, last_y = x, y
+    return base64.b64encode(struct.pack(f"<{len(values)}h", *values)).decode("ascii")
+
+
+def _decode_points(packed, width, height):
+    raw = base64.b64decode(packed)
+    values = struct.unpack(f"<{len(raw) // 2}h", raw[:len(raw) // 2 * 2])
+    points = []
+    x = y = 0
+    for dx, dy in zip(values[::2], values[1::2]):
+        x += dx
+        y += dy
+        points.append({"x": round(x * width / GRID, 2), "y": round(y * height / GRID, 2)})
+    return points
+
+
+def _compact_shape(shape, width, height):
+    if isinstance(shape, dict) and isinstance(shape.get("points"), list):
+        try:
+            packed = _encode_points(shape["points"], width, height)
+        except (KeyError, TypeError, ValueError, struct.error):
+            return shape
+        shape = {key: value for key, value in shape.items() if key != "points"}
+        shape[COMPACT_KEY] = packed
+    return shape
+
+
+def _expand_shape(shape, width, height):
+    if isinstance(shape, dict) and COMPACT_KEY in shape:
+        try:
+            points = _decode_points(shape[COMPACT_KEY], width, height)
+        except (TypeError, ValueError, struct.error):
+            return shape
+        shape = {key: value for key, value in shape.items() if key != COMPACT_KEY}
+        shape["points"] = points
+    return shape
+
+
+def _convert_content(convert_shape):
+    def convert(annotation_content, width, height):
+        try:
+            data = json.loads(annotation_content)
+        except ValueError:
+            return annotation_content
+        if not isinstance(data, list):
+            return annotation_content
+        data = [convert_shape(shape, width, height) for shape in data]
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return convert
+
+
+def _annotated(SampleImage):
+    return (SampleImage.objects
+            .exclude(annotation_content__isnull=True).exclude(annotation_content="")
+            .order_by("id"))
+
+
+def _batches(samples):
+    last_id = 0
+    while True:
+        batch = list(samples.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1].id
+
+
+def _backfill_sizes(SampleImage):
+    """宽高在 0011 之后才随入库写入，更早的已标注样本在这里读取原图补上 (原图缺失的保持为空、不做编码)"""
+    samples = _annotated(SampleImage).filter(width__isnull=True).only("id", "file_path", "width", "height")
+    for batch in _batches(samples):
+        changed = []
+        for sample in batch:
+            image = cv2.imread(os.path.join(settings.MEDIA_ROOT, sample.file_path))
+            if image is None:
+                continue
+            sample.height, sample.width = image.shape[:2]
+            changed.append(sample)
+        SampleImage.objects.bulk_update(changed, ["width", "height"])
+
+
+def _convert(SampleImage, convert):
+    samples = (_annotated(SampleImage)
+               .exclude(width__isnull=True).exclude(height__isnull=True)
+               .only("id", "annotation_content", "width", "height"))
+    for batch in _batches(samples):
+        changed = []
+        for sample in batch:
+            content = convert(sample.annotation_content, sample.width, sample.height)
+            if content != sample.annotation_content:
+                sample.annotation_content = content
+                changed.append(sample)
+        SampleImage.objects.bulk_update(changed, ["annotation_content"])
+
+
+def compact_geometry(apps, schema_editor):
+    if not getattr(settings, "ANNOTATION_COMPACT_GEOMETRY", True):
+        return
+    SampleImage = apps.get_model("core", "SampleImage")
+    _backfill_sizes(SampleImage)
+    _convert(SampleImage, _convert_content(_compact_shape))
+
+
+def expand_geometry(apps, schema_editor):
+    _convert(apps.get_model("core", "SampleImage"), _convert_content(_expand_shape))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_sampleimage_annotation_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_geometry, expand_geometry),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:10
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_audited_at(apps, schema_editor):
+    # 已审核的旧样本没有审核时间：按迁移时间计，驳回样本的优先返工期从上线时开始算
+    SampleImage = apps.get_model("core", "SampleImage")
+    SampleImage.objects.exclude(audit_status=0).filter(audited_at__isnull=True).update(audited_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_compact_annotation_geometry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sampleimage",
+            name="audited_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="审核时间"),
+        ),
+        migrations.AddField(
+            model_name="sampleimage",
+            name="lease_expires_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="领取到期时间"
+            ),
+        ),
+        migrations.AddField(
+            model_name="sampleimage",
+            name="lease_owner",
+            field=models.CharField(
+                blank=True, max_length=100, null=True, verbose_name="领取人"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sampleimage",
+            index=models.Index(
+                fields=["task", "lease_owner", "id"], name="sample_task_lease_idx"
+            ),
+        ),
+        migrations.RunPython(fill_audited_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_sample_leases"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sampleimage",
+            name="draft_content",
+            field=models.TextField(blank=True, null=True, verbose_name="预标注草稿"),
+        ),
+        migrations.AddField(
+            model_name="sampleimage",
+            name="draft_source_id",
+            field=models.IntegerField(
+                blank=True, null=True, verbose_name="草稿来源样本"
+            ),
+        ),
+    ]
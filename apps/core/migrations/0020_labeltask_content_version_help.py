@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_sample_drafts"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="labeltask",
+            name="content_version",
+            field=models.IntegerField(
+                default=0,
+                help_text="图片集变化 (入库/重新抽帧) 时递增，用于判断图片包缓存是否过期",
+                verbose_name="内容版本",
+            ),
+        ),
+    ]
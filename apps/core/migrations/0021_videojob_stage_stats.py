@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_labeltask_content_version_help"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videojob",
+            name="stage_stats",
+            field=models.JSONField(
+                blank=True,
+                help_text="完成时写入 (秒)，见 apps/hospital/pipeline.py StageStats",
+                null=True,
+                verbose_name="各阶段耗时",
+            ),
+        ),
+    ]
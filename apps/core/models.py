@@ -1,5 +1,8 @@
+import os
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 # ... (保留原有的 STATUS 常量定义) ...
 STATUS_PROCESSING = 0
@@ -9,6 +12,38 @@ STATUS_REVIEWING = 3
 STATUS_REJECTED = 4
 STATUS_ERROR = 9
 
+# 视频处理任务队列状态
+JOB_PENDING = 0
+JOB_RUNNING = 1
+JOB_DONE = 2
+JOB_FAILED = 3
+
+class ExtractProfile(models.Model):
+    """
+    抽帧配置：抽帧频率、输出尺寸、图片格式与质量 (在后台 admin 中维护)
+    """
+    FORMAT_CHOICES = (
+        ('jpeg', 'JPEG'),
+        ('webp', 'WebP'),
+        ('png', 'PNG'),
+    )
+    name = models.CharField(max_length=50, unique=True, verbose_name='配置名称')
+    fps = models.FloatField(default=1, verbose_name='抽帧频率')
+    max_long_edge = models.IntegerField(null=True, blank=True, verbose_name='最长边上限(像素)', help_text='留空为保持原尺寸')
+    image_format = models.CharField(max_length=10, default='jpeg', choices=FORMAT_CHOICES, verbose_name='图片格式')
+    quality = models.IntegerField(default=70, verbose_name='图片质量', help_text='1~100，PNG 为无损，仅影响压缩级别')
+    is_default = models.BooleanField(default=False, verbose_name='默认配置')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'core_extract_profile'
+        verbose_name = '抽帧配置'
+        verbose_name_plural = verbose_name
+        ordering = ['-is_default', 'id']
+
+    def __str__(self):
+        return self.name
+
 class LabelTask(models.Model):
     # ... (保持原有代码不变) ...
     code = models.CharField(max_length=50, verbose_name='任务编号', unique=True)
@@ -20,6 +55,12 @@ class LabelTask(models.Model):
     video_fps = models.IntegerField(default=30, verbose_name='抽帧频率')
     sample_count = models.IntegerField(default=0, verbose_name='样本数量')
     labeled_count = models.IntegerField(default=0, verbose_name='已标注数')
+    audited_count = models.IntegerField(default=0, verbose_name='已审核数')
+    approved_count = models.IntegerField(default=0, verbose_name='审核通过数')
+    rejected_count = models.IntegerField(default=0, verbose_name='审核驳回数')
+    dedup_skipped = models.IntegerField(default=0, verbose_name='跳过相似帧数')
+    first_sample_id = models.IntegerField(null=True, blank=True, verbose_name='首张样本ID', help_text='入库时写入，任务大厅「开始标注」直接跳转，不必逐个任务查询样本表')
+    content_version = models.IntegerField(default=0, verbose_name='内容版本', help_text='图片集变化 (入库/重新抽帧) 时递增，用于判断图片包缓存是否过期')
     state = models.IntegerField(default=STATUS_PROCESSING, verbose_name='状态') 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
@@ -27,10 +68,34 @@ class LabelTask(models.Model):
         db_table = 'core_label_task'
         verbose_name = '病例任务'
         verbose_name_plural = verbose_name
+        # 任务大厅按状态筛选后按创建时间分页
+        indexes = [
+            models.Index(fields=['state', 'created_at'], name='task_state_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def progress(self):
+        """标注完成百分比 (由计数器字段算出，无需查询样本表)"""
+        if self.sample_count > 0:
+            return int(self.labeled_count * 100 / self.sample_count)
+        return 0
+
+    @property
+    def status_tag(self):
+        """not_started: 一张未标；processing: 标注中；done: 全部标完"""
+        if self.labeled_count == 0:
+            return 'not_started'
+        if self.labeled_count < self.sample_count:
+            return 'processing'
+        return 'done'
+
+    def mark_content_changed(self):
+        """图片集有变化：原子递增内容版本，使已缓存的图片包失效 (保存标注、审核不影响图片包，不递增)"""
+        LabelTask.objects.filter(id=self.id).update(content_version=models.F('content_version') + 1)
+
 class SampleImage(models.Model):
     """
     [B端核心表] 样本图片
@@ -39,9 +104,13 @@ class SampleImage(models.Model):
     code = models.CharField(max_length=50, verbose_name='样本编号')
     file_path = models.CharField(max_length=500, verbose_name='图片路径')
     original_name = models.CharField(max_length=200, verbose_name='文件名')
+    has_thumbs = models.BooleanField(default=False, verbose_name='是否已生成缩略图')
+    width = models.IntegerField(null=True, blank=True, verbose_name='图片宽度')
+    height = models.IntegerField(null=True, blank=True, verbose_name='图片高度')
     
     is_labeled = models.BooleanField(default=False, verbose_name='是否已标注')
     annotation_content = models.TextField(verbose_name='标注数据(XML/JSON)', null=True, blank=True)
+    annotation_version = models.IntegerField(default=0, verbose_name='标注版本', help_text='每次保存递增，增量保存时用于检测并发修改')
     
     labeled_by = models.CharField(max_length=100, verbose_name='标注员', null=True, blank=True)
     labeled_at = models.DateTimeField(null=True, blank=True, verbose_name='标注时间')
@@ -54,10 +123,86 @@ class SampleImage(models.Model):
     )
     audit_status = models.IntegerField(default=0, choices=AUDIT_STATUS_CHOICES, verbose_name='审核状态')
     audit_reason = models.TextField(null=True, blank=True, verbose_name='驳回修改意见')
+    audited_at = models.DateTimeField(null=True, blank=True, verbose_name='审核时间')
+
+    # 领取 (租约)：多人协作同一任务时每张图同一时间只分给一个标注员，过期自动释放 (见 apps/labeler/leasing.py)
+    lease_owner = models.CharField(max_length=100, null=True, blank=True, verbose_name='领取人')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name='领取到期时间')
+
+    # 跟踪传播生成的预标注草稿 (见 apps/labeler/propagation.py)：不计入标注进度，标注员采用并保存后清空
+    draft_content = models.TextField(null=True, blank=True, verbose_name='预标注草稿')
+    draft_source_id = models.IntegerField(null=True, blank=True, verbose_name='草稿来源样本')
 
     class Meta:
         db_table = 'core_sample_image'
         verbose_name = '样本图片'
+        # 图片库按 (task, 条件, id) 做 keyset 分页
+        indexes = [
+            models.Index(fields=['task', 'is_labeled', 'id'], name='sample_task_labeled_idx'),
+            models.Index(fields=['task', 'audit_status', 'id'], name='sample_task_audit_idx'),
+            models.Index(fields=['task', 'labeled_by', 'id'], name='sample_task_labeler_idx'),
+            models.Index(fields=['task', 'lease_owner', 'id'], name='sample_task_lease_idx'),
+        ]
+
+    @property
+    def image_url(self):
+        return f"/media/{self.file_path}"
+
+    def thumb_path(self, size):
+        """upload/images/<code>/img_00000.jpg -> upload/thumbs/<code>/<size>/img_00000.jpg"""
+        # 直接由 file_path 推导，避免为取 task.code 多查一次数据库
+        task_dir, file_name = os.path.split(self.file_path)
+        name = os.path.splitext(file_name)[0] + '.jpg'
+        return f"upload/thumbs/{os.path.basename(task_dir)}/{size}/{name}"
+
+    def _thumb_url(self, size):
+        # 旧任务尚未回填缩略图时退回原图
+        if not self.has_thumbs:
+            return self.image_url
+        return f"/media/{self.thumb_path(size)}"
+
+    @property
+    def thumb_url(self):
+        """小缩略图 (最长边 160)，用于胶片条"""
+        return self._thumb_url('sm')
+
+    @property
+    def preview_url(self):
+        """中缩略图 (最长边 480)，用于图片库卡片"""
+        return self._thumb_url('md')
+
+class AnnotationShape(models.Model):
+    """
+    标注图形：annotation_content 的结构化副本，一个图形一行
+    保存/导入标注时同步重写，用于按类别统计、检索「哪些帧含有某类别」，不必逐行解析 JSON
+    """
+    SHAPE_TYPE_CHOICES = (
+        ('polygon', '多边形'),
+        ('rect', '矩形'),
+    )
+    sample = models.ForeignKey(SampleImage, on_delete=models.CASCADE, related_name='shapes', verbose_name='样本')
+    # 冗余任务 id，按任务统计时不必关联样本表
+    task = models.ForeignKey(LabelTask, on_delete=models.CASCADE, related_name='shapes', verbose_name='任务')
+    label = models.CharField(max_length=20, verbose_name='类别编号')
+    shape_type = models.CharField(max_length=10, default='polygon', choices=SHAPE_TYPE_CHOICES, verbose_name='图形类型')
+    point_count = models.IntegerField(default=0, verbose_name='顶点数')
+    x_min = models.FloatField(verbose_name='外接框 x_min')
+    y_min = models.FloatField(verbose_name='外接框 y_min')
+    x_max = models.FloatField(verbose_name='外接框 x_max')
+    y_max = models.FloatField(verbose_name='外接框 y_max')
+    area = models.FloatField(default=0, verbose_name='面积(像素²)')
+
+    class Meta:
+        db_table = 'core_annotation_shape'
+        verbose_name = '标注图形'
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['task', 'label'], name='shape_task_label_idx'),
+            models.Index(fields=['label'], name='shape_label_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sample_id}:{self.label}"
 
 # ... (TaskFeedback 保持不变) ...
 class TaskFeedback(models.Model):
@@ -71,4 +216,48 @@ class TaskFeedback(models.Model):
     class Meta:
         db_table = 'core_task_feedback'
         verbose_name = '任务反馈'
-        ordering = ['-create_time']
\ No newline at end of file
+        ordering = ['-create_time']
+
+class VideoJob(models.Model):
+    """
+    视频抽帧任务队列 (由 run_video_worker 管理命令消费)
+    worker 通过 SELECT ... FOR UPDATE SKIP LOCKED 租用任务，租约过期后可被其他 worker 接管
+    """
+    JOB_STATUS_CHOICES = (
+        (JOB_PENDING, '排队中'),
+        (JOB_RUNNING, '处理中'),
+        (JOB_DONE, '已完成'),
+        (JOB_FAILED, '失败'),
+    )
+    task = models.ForeignKey(LabelTask, on_delete=models.CASCADE, related_name='video_jobs', verbose_name='关联任务')
+    SAMPLE_MODE_CHOICES = (
+        ('fixed', '固定频率'),
+        ('adaptive', '场景自适应'),
+    )
+    extract_fps = models.FloatField(default=1, verbose_name='抽帧频率')
+    sample_mode = models.CharField(max_length=20, default='fixed', choices=SAMPLE_MODE_CHOICES, verbose_name='采样模式')
+    min_fps = models.FloatField(null=True, blank=True, verbose_name='自适应最低频率')
+    max_fps = models.FloatField(null=True, blank=True, verbose_name='自适应最高频率')
+    dedup_distance = models.IntegerField(null=True, blank=True, verbose_name='相似帧阈值')
+    profile = models.ForeignKey(ExtractProfile, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='抽帧配置')
+    status = models.IntegerField(default=JOB_PENDING, choices=JOB_STATUS_CHOICES, verbose_name='队列状态')
+    attempts = models.IntegerField(default=0, verbose_name='已尝试次数')
+    max_attempts = models.IntegerField(default=3, verbose_name='最大尝试次数')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='最早执行时间')
+    lease_owner = models.CharField(max_length=100, null=True, blank=True, verbose_name='租用者')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name='租约到期时间')
+    last_error = models.TextField(null=True, blank=True, verbose_name='最近错误')
+    stage_stats = models.JSONField(null=True, blank=True, verbose_name='各阶段耗时', help_text='完成时写入 (秒)，见 apps/hospital/pipeline.py StageStats')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'core_video_job'
+        verbose_name = '视频处理队列'
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='video_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}#{self.id}"
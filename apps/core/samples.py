@@ -0,0 +1,91 @@
+# apps/core/samples.py
+"""
+样本导航与图片库分页
+
+相邻窗口：一次查询取出当前样本前后各 N 张
+
+原逻辑每翻一页都要执行 id__lt ... order_by('-id').first() 与 id__gt ... order_by('id').first() 两条查询，
+这里把「前 N 张」「当前及后 N 张」两段用 UNION ALL 合成一条 SQL (任务 id 也用子查询取，不再单独查当前样本)，
+前端拿到窗口后即可预取相邻图片。
+SQLite 不支持在 UNION 的子查询里 ORDER BY/LIMIT，开发环境下退化为两条查询。
+"""
+from django.db import connection
+from django.db.models import Q, Subquery
+
+from apps.core.models import AnnotationShape, SampleImage
+
+DEFAULT_WINDOW = 5
+MAX_WINDOW = 50
+WINDOW_FIELDS = ('id', 'task_id', 'file_path', 'original_name', 'has_thumbs', 'is_labeled', 'audit_status')
+
+
+def neighbor_window(sample_id, size=DEFAULT_WINDOW, task_id=None):
+    """返回按 id 排序的样本列表：当前样本前 size 张 + 当前样本 + 后 size 张"""
+    size = min(max(int(size), 0), MAX_WINDOW)
+    if task_id is None:
+        task_id = Subquery(SampleImage.objects.filter(id=sample_id).values('task_id')[:1])
+    base = SampleImage.objects.filter(task_id=task_id).only(*WINDOW_FIELDS)
+    before = base.filter(id__lt=sample_id).order_by('-id')[:size]
+    after = base.filter(id__gte=sample_id).order_by('id')[:size + 1]
+    if connection.features.supports_slicing_ordering_in_compound:
+        rows = list(before.union(after, all=True))
+    else:
+        rows = list(before) + list(after)
+    return sorted(rows, key=lambda s: s.id)
+
+
+def window_item(sample):
+    return {
+        'id': sample.id,
+        'url': sample.image_url,
+        'thumb': sample.thumb_url,
+        'name': sample.original_name,
+        'is_labeled': sample.is_labeled,
+        'audit_status': sample.audit_status,
+    }
+
+
+def window_links(window, sample_id):
+    """从窗口里找出上一张/下一张 id"""
+    ids = [s.id for s in window]
+    prev_id = next_id = None
+    if sample_id in ids:
+        pos = ids.index(sample_id)
+        prev_id = ids[pos - 1] if pos > 0 else None
+        next_id = ids[pos + 1] if pos + 1 < len(ids) else None
+    return prev_id, next_id
+
+
+# ==========================================
+#  图片库 keyset 分页
+# ==========================================
+# 按 id > last_id 翻页，不用 OFFSET：翻到第 5 万张和第 1 张一样快
+GALLERY_PAGE_SIZE = 100
+GALLERY_MAX_PAGE_SIZE = 500
+GALLERY_FILTERS = {
+    'unlabeled': Q(is_labeled=False),
+    'labeled': Q(is_labeled=True),
+    'approved': Q(audit_status=1),
+    'rejected': Q(audit_status=2),
+}
+
+
+def gallery_page(task_id, after=0, limit=GALLERY_PAGE_SIZE, status=None, labeled_by=None, label=None):
+    """
+    返回 (样本列表, 下一页的 after 游标)，没有更多时游标为 None
+    status: GALLERY_FILTERS 中的一项；labeled_by: 标注员用户名；label: 只看含该类别图形的样本
+    """
+    limit = min(max(int(limit), 1), GALLERY_MAX_PAGE_SIZE)
+    qs = SampleImage.objects.filter(task_id=task_id, id__gt=int(after or 0)).only(*WINDOW_FIELDS)
+    if status:
+        qs = qs.filter(GALLERY_FILTERS[status])
+    if labeled_by:
+        qs = qs.filter(labeled_by=labeled_by)
+    if label:
+        # 走结构化图形表的 (task, label) 索引，不解析标注 JSON
+        qs = qs.filter(id__in=AnnotationShape.objects.filter(task_id=task_id, label=label).values('sample_id'))
+    # 多取一条判断是否还有下一页
+    rows = list(qs.order_by('id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1].id if has_more else None)
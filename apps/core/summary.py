@@ -0,0 +1,50 @@
+# apps/core/summary.py
+"""
+任务概要：任务大厅展示所需的首张样本、进度与状态分类
+
+计数 (sample_count / labeled_count ...) 已由 counters 模块随样本变化原子维护，
+首张样本 id 在入库时写入 LabelTask.first_sample_id；进度与状态分类都由这几个字段推出
+(见 LabelTask.progress / status_tag)。因此任务大厅只需两条 SQL：
+一条聚合统计各状态数量，一条按页取任务，排序和筛选都在数据库里完成。
+"""
+from django.db.models import Count, F, FloatField, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from apps.core.models import LabelTask, SampleImage
+
+# 与 LabelTask.status_tag 的判断保持一致
+STATUS_FILTERS = {
+    'not_started': Q(labeled_count=0),
+    'processing': Q(labeled_count__gt=0, labeled_count__lt=F('sample_count')),
+    'done': Q(labeled_count__gt=0, labeled_count__gte=F('sample_count')),
+}
+
+# 排序键 -> order_by 参数；progress/remaining 用表达式在 SQL 里排序
+_PROGRESS = Coalesce(
+    Cast('labeled_count', FloatField()) / NullIf(F('sample_count'), 0), Value(0.0), output_field=FloatField()
+)
+DASHBOARD_SORTS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'progress': (_PROGRESS.asc(), '-created_at', '-id'),
+    'remaining': ((F('sample_count') - F('labeled_count')).desc(), '-created_at', '-id'),
+    'name': ('name', 'id'),
+}
+DEFAULT_SORT = 'newest'
+
+
+def status_stats(tasks):
+    """一条聚合查询统计 total / not_started / processing / done"""
+    aggregates = {'total': Count('id')}
+    for tag, condition in STATUS_FILTERS.items():
+        aggregates[tag] = Count('id', filter=condition)
+    return tasks.order_by().aggregate(**aggregates)
+
+
+def first_sample_subquery(task_id):
+    return Subquery(SampleImage.objects.filter(task_id=task_id).order_by('id').values('id')[:1])
+
+
+def refresh_first_sample(task_id):
+    """样本集合变化 (入库、重新抽帧) 后重新写入首张样本 id，一条 UPDATE"""
+    LabelTask.objects.filter(id=task_id).update(first_sample_id=first_sample_subquery(task_id))
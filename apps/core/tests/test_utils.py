@@ -0,0 +1,74 @@
+# apps/core/tests/test_utils.py
+import os
+import shutil
+import struct
+import tempfile
+
+from django.test import SimpleTestCase
+
+from apps.core.utils import (
+    encrypt_stream, encrypt_file, decrypt_stream, read_encrypted_name, DecryptError, STREAM_CHUNK_SIZE, STREAM_MAGIC,
+)
+
+NAME = '病例.pdf'
+# 头部长度：MAGIC + nonce 前缀 (7) + 文件名长度 (1) + 文件名
+HEADER_SIZE = len(STREAM_MAGIC) + 7 + 1 + len(NAME.encode('utf-8'))
+
+
+class StreamEncryptionTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.plain = os.urandom(STREAM_CHUNK_SIZE * 2 + 1000)
+        self.path = self.write(self.encrypt(self.plain))
+
+    def encrypt(self, plain):
+        path = os.path.join(self.dir, 'tmp')
+        with open(path, 'wb') as f:
+            # 分块大小与 STREAM_CHUNK_SIZE 不一致，加密时会重新切块
+            encrypt_stream((plain[i:i + 5000] for i in range(0, len(plain), 5000)), f, file_name=NAME)
+        with open(path, 'rb') as f:
+            return bytearray(f.read())
+
+    def write(self, data, name='enc.bin'):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def decrypt(self, path):
+        return b''.join(decrypt_stream(path))
+
+    def test_round_trip(self):
+        self.assertEqual(self.decrypt(self.path), self.plain)
+        self.assertEqual(read_encrypted_name(self.path), NAME)
+
+    def test_empty_file(self):
+        self.assertEqual(self.decrypt(self.write(self.encrypt(b''))), b'')
+
+    def test_legacy_fernet_file(self):
+        self.assertEqual(self.decrypt(self.write(encrypt_file(b'legacy'))), b'legacy')
+
+    def test_tampering_is_detected(self):
+        data = self.encrypt(self.plain)
+        first_chunk = HEADER_SIZE + 4
+        cases = {
+            'ciphertext': lambda d: d.__setitem__(first_chunk + 10, d[first_chunk + 10] ^ 1),
+            'header': lambda d: d.__setitem__(len(STREAM_MAGIC), d[len(STREAM_MAGIC)] ^ 1),
+            'truncated at chunk boundary': lambda d: d.__delitem__(slice(-(1000 + 16 + 4), None)),
+            'truncated inside length': lambda d: d.__delitem__(slice(-(1000 + 16 + 2), None)),
+            'trailing data': lambda d: d.extend(b'x'),
+        }
+        for name, tamper in cases.items():
+            with self.subTest(name):
+                tampered = bytearray(data)
+                tamper(tampered)
+                with self.assertRaises(DecryptError):
+                    self.decrypt(self.write(tampered, 'tampered.bin'))
+
+    def test_oversized_length_is_rejected_before_reading(self):
+        data = self.encrypt(b'abc')
+        data[HEADER_SIZE:HEADER_SIZE + 4] = struct.pack('>I', 0xFFFFFFFF)
+        path = self.write(data, 'oversized.bin')
+        with self.assertRaisesMessage(DecryptError, '文件已损坏'):
+            self.decrypt(path)
@@ -1,10 +1,20 @@
 # apps/core/utils.py
+import base64
 import os
 import random
+import re
 import string
+import struct
 import time
-from cryptography.fernet import Fernet
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 # 动态引入模型，防止循环引用
 from django.apps import apps
 
@@ -14,8 +24,9 @@ def gen_random_code(prefix="TK", length=4):
     random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
     return f"{prefix}{timestamp}{random_str}"
 
-# 获取加密密钥 (单例模式)
-def get_cipher_suite():
+# 读取 (首次使用时生成) 密钥，每个进程只读一次磁盘
+@lru_cache(maxsize=1)
+def get_secret_key():
     key_path = os.path.join(settings.BASE_DIR, 'secret.key')
     if not os.path.exists(key_path):
         key = Fernet.generate_key()
@@ -23,14 +34,208 @@ def get_cipher_suite():
             key_file.write(key)
     else:
         with open(key_path, "rb") as key_file:
-            key = key_file.read()
-    return Fernet(key)
+            key = key_file.read().strip()
+    return key
+
+# 获取加密密钥 (单例模式)
+@lru_cache(maxsize=1)
+def get_cipher_suite():
+    return Fernet(get_secret_key())
 
-# 加密文件内容
+# 加密文件内容 (旧格式：整个文件一个 Fernet token，需整体读入内存)
 def encrypt_file(file_data):
     cipher = get_cipher_suite()
     return cipher.encrypt(file_data)
 
+# ==========================================
+#  流式分块加密 (病例文件)
+# ==========================================
+# 文件格式:
+#   头部   MAGIC(6) | nonce 前缀(7) | 文件名长度(1) | 原文件名(UTF-8)
+#   数据块 密文长度(4, 大端) | AES-256-GCM 密文 (含 16 字节认证标签)
+# 第 i 块的 nonce = 前缀 + i(4, 大端) + 是否最后一块(1)，整个头部作为附加认证数据，
+# 块被篡改、调换顺序、截断或拼接都会在解密时校验失败。
+# AES 密钥由 secret.key 经 HKDF 派生，沿用现有密钥文件。
+STREAM_MAGIC = b'YTENC1'
+STREAM_CHUNK_SIZE = 64 * 1024
+_NONCE_PREFIX_SIZE = 7
+_LENGTH = struct.Struct('>I')
+# 单块密文的最大长度：明文块 + GCM 认证标签
+_TAG_SIZE = 16
+_MAX_CIPHERTEXT_SIZE = STREAM_CHUNK_SIZE + _TAG_SIZE
+
+
+class DecryptError(Exception):
+    pass
+
+
+@lru_cache(maxsize=1)
+def get_stream_cipher():
+    key = HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None, info=b'yintu-stream-v1'
+    ).derive(base64.urlsafe_b64decode(get_secret_key()))
+    return AESGCM(key)
+
+
+def _stream_nonce(prefix, counter, last):
+    return prefix + struct.pack('>IB', counter, 1 if last else 0)
+
+
+def _rechunk(chunks, size):
+    """把任意大小的数据块整理成固定大小，最后一块可能不足 size"""
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    yield bytes(buf)
+
+
+def encrypt_stream(chunks, out_file, file_name=''):
+    """
+    边读边加密：chunks 为可迭代的明文块 (如 UploadedFile.chunks())，密文写入 out_file
+    内存占用只与 STREAM_CHUNK_SIZE 有关，与文件大小无关
+    """
+    cipher = get_stream_cipher()
+    name = file_name.encode('utf-8')[:255]
+    prefix = os.urandom(_NONCE_PREFIX_SIZE)
+    header = STREAM_MAGIC + prefix + bytes([len(name)]) + name
+    out_file.write(header)
+
+    # 多看一块，才能知道当前块是不是最后一块
+    blocks = _rechunk(chunks, STREAM_CHUNK_SIZE)
+    current = next(blocks)
+    counter = 0
+    for following in blocks:
+        data = cipher.encrypt(_stream_nonce(prefix, counter, False), current, header)
+        out_file.write(_LENGTH.pack(len(data)) + data)
+        current = following
+        counter += 1
+    data = cipher.encrypt(_stream_nonce(prefix, counter, True), current, header)
+    out_file.write(_LENGTH.pack(len(data)) + data)
+
+
+def encrypt_upload(uploaded_file, dest_path):
+    """把上传文件流式加密写入 dest_path"""
+    with open(dest_path, 'wb') as f:
+        encrypt_stream(uploaded_file.chunks(), f, file_name=os.path.basename(uploaded_file.name))
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise DecryptError("密文不完整")
+    return data
+
+
+def read_encrypted_name(path):
+    """读取加密文件头部记录的原文件名 (旧格式返回空字符串)"""
+    with open(path, 'rb') as f:
+        if f.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+            return ''
+        f.read(_NONCE_PREFIX_SIZE)
+        size = f.read(1)
+        return f.read(size[0]).decode('utf-8', errors='ignore') if size else ''
+
+
+def decrypt_stream(path):
+    """
+    逐块解密，产出明文字节；兼容旧的整文件 Fernet 格式
+    认证失败时抛出 DecryptError (此时可能已产出部分明文，调用方应放弃整个结果)
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(STREAM_MAGIC))
+        if magic != STREAM_MAGIC:
+            try:
+                yield get_cipher_suite().decrypt(magic + f.read())
+            except InvalidToken:
+                raise DecryptError("密文校验失败")
+            return
+
+        prefix = _read_exact(f, _NONCE_PREFIX_SIZE)
+        name_size = _read_exact(f, 1)
+        header = magic + prefix + name_size + _read_exact(f, name_size[0])
+        cipher = get_stream_cipher()
+        counter = 0
+        while True:
+            size = f.read(_LENGTH.size)
+            if not size:
+                # 没读到标记为最后一块的数据就结束了：文件被截断
+                raise DecryptError("密文不完整")
+            if len(size) < _LENGTH.size:
+                # 截断在块长度字段中间
+                raise DecryptError("文件已损坏")
+            length = _LENGTH.unpack(size)[0]
+            # 长度字段在认证之前读取，超出加密时的块大小说明已损坏，不按它去读 (最大可达 4 GiB)
+            if length > _MAX_CIPHERTEXT_SIZE:
+                raise DecryptError("文件已损坏")
+            data = _read_exact(f, length)
+            try:
+                yield cipher.decrypt(_stream_nonce(prefix, counter, False), data, header)
+            except InvalidTag:
+                try:
+                    plain = cipher.decrypt(_stream_nonce(prefix, counter, True), data, header)
+                except InvalidTag:
+                    raise DecryptError("密文校验失败")
+                if f.read(1):
+                    raise DecryptError("最后一块之后还有多余数据")
+                yield plain
+                return
+            counter += 1
+
+# ==========================================
+#  支持 Range (断点续传) 的文件下载
+# ==========================================
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _iter_file_range(path, start, length, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def ranged_file_response(request, path, filename, content_type='application/octet-stream', etag=None):
+    """
+    返回文件下载响应，支持单段 Range 请求 (206)，多段范围按整文件返回
+    etag 用于 If-Range 校验：文件已变化时忽略 Range 返回完整内容
+    """
+    size = os.path.getsize(path)
+    start, end = 0, size - 1
+    status = 200
+    range_header = request.headers.get('Range', '')
+    if_range = request.headers.get('If-Range')
+    match = _RANGE_RE.match(range_header.strip())
+    if match and (if_range is None or if_range == etag):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            # bytes=-500：最后 500 字节
+            start = max(size - int(last), 0)
+        if not (first or last) or start > end or start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        status = 206
+
+    response = StreamingHttpResponse(_iter_file_range(path, start, end - start + 1), status=status, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if etag:
+        response['ETag'] = etag
+    return response
+
 # 简单的分页页码生成器
 def build_page_labels(current_page, total_pages):
     return [{"page": i, "cur": 1 if i == current_page else 0, "name": str(i)} for i in range(1, total_pages + 1)]
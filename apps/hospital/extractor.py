@@ -0,0 +1,469 @@
+# apps/hospital/extractor.py
+"""
+视频抽帧引擎
+
+原逻辑对每一帧都调用 cap.read() (解码 + 颜色转换)，只保留其中 1/extract_interval。
+这里改为只对「需要保存的帧」做完整解码：
+- grab 模式：跳过的帧只 grab() (不做 retrieve 转换)，命中的帧再 retrieve()
+- seek 模式：抽帧间隔很大时直接 set(CAP_PROP_POS_FRAMES) 跳到目标帧
+- 对于 seek 不准确的封装格式 (部分 AVI / 流式 MP4)，自动回退到 grab 模式
+"""
+import os
+
+import cv2
+import numpy as np
+
+# 抽帧模式
+MODE_READ = 'read'   # 旧逻辑：逐帧 read()，仅用于基准对比
+MODE_GRAB = 'grab'
+MODE_SEEK = 'seek'
+MODE_AUTO = 'auto'
+
+# auto 模式下，间隔达到该帧数才使用 seek (seek 需要回到关键帧重新解码，间隔小时反而更慢)
+# 本机 OpenCV 的 grab() 同样会完整解码每一帧，省下的只有颜色转换；用 bench_extract 在 30fps 样例视频上实测
+# (seek 相对 grab)：间隔 15 为 0.77x、20 为 0.87x、24 为 1.27x、25 为 1.41x、30 为 1.68x，
+# 因此取 24，25/30fps 视频按每秒 1 帧抽取时走 seek。
+# seek 的代价随关键帧间隔 (GOP) 增大，GOP 很长的视频可能更慢，此时可设 VIDEO_EXTRACT_MODE = 'grab'
+SEEK_MIN_INTERVAL = 24
+
+
+def open_video(video_abs_path):
+    """打开视频并返回 (cap, fps, total_frames)，打不开时 cap 为 None"""
+    cap = cv2.VideoCapture(video_abs_path)
+    if not cap.isOpened():
+        cap.release()
+        return None, 0, 0
+
+    video_fps = cap.get(cv2.CAP_PROP_FPS)
+    if video_fps <= 0:
+        video_fps = 30
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    return cap, video_fps, max(total_frames, 0)
+
+
+def output_size(cap, max_long_edge=None):
+    """按 resize_long_edge 的规则计算输出图片尺寸 (width, height)，无法获取时返回 (None, None)"""
+    w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if w <= 0 or h <= 0:
+        return None, None
+    long_edge = max(w, h)
+    if max_long_edge and long_edge > max_long_edge:
+        ratio = max_long_edge / long_edge
+        return max(int(w * ratio), 1), max(int(h * ratio), 1)
+    return w, h
+
+
+def calc_interval(video_fps, extract_fps):
+    """根据视频帧率与目标抽帧频率计算抽帧间隔 (至少为 1)"""
+    if not extract_fps or extract_fps <= 0:
+        return 1
+    return max(int(round(video_fps / extract_fps)), 1)
+
+
+def resolve_mode(mode, interval):
+    if mode == MODE_AUTO:
+        return MODE_SEEK if interval >= SEEK_MIN_INTERVAL else MODE_GRAB
+    return mode
+
+
+def iter_sampled_frames(video_abs_path, interval, mode=MODE_AUTO, start=0, end=None):
+    """
+    生成器：按 interval 抽帧，依次产出 (frame_index, frame)
+
+    start / end 为帧号区间 [start, end)，end 为 None 时读到视频结尾。
+    命中的帧号始终为 interval 的整数倍，与原 `frame_count % extract_interval == 0` 逻辑一致。
+    """
+    cap, _, total_frames = open_video(video_abs_path)
+    if cap is None:
+        return
+
+    mode = resolve_mode(mode, interval)
+    # 第一个命中帧：start 之后第一个 interval 的整数倍
+    target = ((start + interval - 1) // interval) * interval
+
+    seek_ok = True
+    try:
+        if mode == MODE_SEEK:
+            for item in _iter_seek(cap, interval, target, end, total_frames):
+                if item is None:
+                    # seek 不准确，重新打开视频，回退到 grab 模式继续
+                    seek_ok = False
+                    mode = MODE_GRAB
+                    break
+                target = item[0] + interval
+                yield item
+            else:
+                return
+
+        if mode == MODE_READ:
+            yield from _iter_read(cap, interval, target, end)
+            return
+
+        # grab 模式：先定位到第一个命中帧 (分段抽帧时 target 可能很靠后)
+        if not (seek_ok and _seek_to(cap, target)):
+            cap.release()
+            cap, _, _ = open_video(video_abs_path)
+            if cap is None or not _skip_to(cap, target):
+                return
+        yield from _iter_grab(cap, interval, target, end)
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def _seek_to(cap, target):
+    """直接定位到 target 帧，定位结果不可信时返回 False"""
+    if target <= 0:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+    return int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == target
+
+
+def _skip_to(cap, target):
+    """从开头顺序 grab 到 target 之前 (不解码成 BGR)"""
+    for _ in range(target):
+        if not cap.grab():
+            return False
+    return True
+
+
+def _iter_read(cap, interval, target, end):
+    # 旧逻辑：每一帧都完整解码
+    frame_index = 0
+    while end is None or frame_index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_index >= target and frame_index % interval == 0:
+            yield frame_index, frame
+        frame_index += 1
+
+
+def _iter_grab(cap, interval, target, end):
+    # 调用方已将 cap 定位到 target
+    frame_index = target
+    while end is None or frame_index < end:
+        if not cap.grab():
+            break
+        if frame_index % interval == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield frame_index, frame
+        frame_index += 1
+
+
+def _iter_seek(cap, interval, target, end, total_frames):
+    """
+    seek 模式：每次直接定位到目标帧。
+    定位后校验 CAP_PROP_POS_FRAMES，不一致说明该容器 seek 不可靠，产出 None 通知调用方回退。
+    """
+    while end is None or target < end:
+        if total_frames and target >= total_frames:
+            break
+        if not _seek_to(cap, target):
+            yield None
+            return
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield target, frame
+        target += interval
+
+
+def frame_hash(frame, hash_size=8):
+    """
+    dHash 感知哈希：缩成 (hash_size+1) x hash_size 的灰度图，比较左右相邻像素的明暗，
+    得到 hash_size*hash_size 位的指纹 (bool 数组)。对亮度/压缩噪声不敏感，计算量很小。
+    """
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return small[:, 1:] > small[:, :-1]
+
+
+def hash_distance(a, b):
+    """两个 dHash 的汉明距离"""
+    return int(np.count_nonzero(a != b))
+
+
+class DedupFilter:
+    """
+    相似帧过滤：与「上一张保留的帧」比较哈希，汉明距离 <= max_distance 的帧直接丢弃
+    (与上一张保留帧比较而不是与上一帧比较，缓慢漂移的画面也能在累积变化后被保留)
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self.last_hash = None
+        self.skipped = 0
+
+    def __call__(self, frames):
+        for frame_index, frame in frames:
+            h = frame_hash(frame)
+            if self.last_hash is not None and hash_distance(h, self.last_hash) <= self.max_distance:
+                self.skipped += 1
+                continue
+            self.last_hash = h
+            yield frame_index, frame
+
+
+def downscale_gray(frame, size=(64, 36)):
+    """缩成小尺寸灰度图 (float32)，用于画面变化检测"""
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def change_score(a, b):
+    """两张缩略灰度图的平均绝对差 (0~255)，整块数组运算，无 Python 循环"""
+    return float(np.mean(np.abs(a - b)))
+
+
+class AdaptiveSampler:
+    """
+    自适应采样：输入为按 max_fps 扫描出的帧
+    - 与上一张保留帧相比变化 >= threshold (镜头移动) 时保留，最密可达 max_fps
+    - 画面静止时，距上一张保留帧超过 1/min_fps 秒也强制保留一帧
+    """
+
+    def __init__(self, video_fps, min_fps, threshold):
+        self.threshold = threshold
+        self.max_gap = max(int(round(video_fps / min_fps)), 1) if min_fps else None
+        self.dropped = 0
+
+    def __call__(self, frames):
+        last_small = None
+        last_index = 0
+        for frame_index, frame in frames:
+            small = downscale_gray(frame)
+            if (
+                last_small is None
+                or (self.max_gap and frame_index - last_index >= self.max_gap)
+                or change_score(small, last_small) >= self.threshold
+            ):
+                last_small = small
+                last_index = frame_index
+                yield frame_index, frame
+            else:
+                self.dropped += 1
+
+
+SAMPLE_FIXED = 'fixed'
+SAMPLE_ADAPTIVE = 'adaptive'
+DEFAULT_CHANGE_THRESHOLD = 12.0
+
+
+class SamplingOptions:
+    """
+    抽帧参数 (需要能 pickle 传给分段子进程)
+    - fixed:    每 1/extract_fps 秒取一帧
+    - adaptive: 以 max_fps 的粒度扫描，按画面变化在 [min_fps, max_fps] 之间自适应
+    dedup_distance 不为 None 时在最后再做一次相似帧过滤
+    """
+
+    def __init__(self, extract_fps=1, sample_mode=SAMPLE_FIXED, min_fps=None, max_fps=None,
+                 dedup_distance=None, change_threshold=DEFAULT_CHANGE_THRESHOLD):
+        self.extract_fps = extract_fps
+        self.sample_mode = sample_mode
+        self.min_fps = min_fps
+        self.max_fps = max_fps or extract_fps
+        self.dedup_distance = dedup_distance
+        self.change_threshold = change_threshold
+
+    @property
+    def adaptive(self):
+        return self.sample_mode == SAMPLE_ADAPTIVE
+
+    def scan_interval(self, video_fps):
+        """实际扫描 (解码) 的帧间隔"""
+        return calc_interval(video_fps, self.max_fps if self.adaptive else self.extract_fps)
+
+
+class FrameSource:
+    """
+    组装好的帧来源：按间隔抽帧 -> (自适应采样) -> (相似帧过滤)
+    scanned 为实际解码的帧数，skipped 为相似帧过滤丢弃的帧数
+    """
+
+    def __init__(self, video_abs_path, video_fps, options, mode=MODE_AUTO, start=0, end=None):
+        self.video_abs_path = video_abs_path
+        self.interval = options.scan_interval(video_fps)
+        self.mode = mode
+        self.start = start
+        self.end = end
+        self.scanned = 0
+        self.adaptive = AdaptiveSampler(video_fps, options.min_fps, options.change_threshold) if options.adaptive else None
+        self.dedup = DedupFilter(options.dedup_distance) if options.dedup_distance is not None else None
+
+    @property
+    def skipped(self):
+        return self.dedup.skipped if self.dedup else 0
+
+    def _count(self, frames):
+        for item in frames:
+            self.scanned += 1
+            yield item
+
+    def __iter__(self):
+        frames = self._count(iter_sampled_frames(
+            self.video_abs_path, self.interval, mode=self.mode, start=self.start, end=self.end
+        ))
+        if self.adaptive:
+            frames = self.adaptive(frames)
+        if self.dedup:
+            frames = self.dedup(frames)
+        return frames
+
+
+FORMAT_JPEG = 'jpeg'
+FORMAT_WEBP = 'webp'
+FORMAT_PNG = 'png'
+FORMAT_EXTENSIONS = {FORMAT_JPEG: 'jpg', FORMAT_WEBP: 'webp', FORMAT_PNG: 'png'}
+
+
+class EncodeOptions:
+    """
+    输出图片参数 (同样需要能 pickle)
+    max_long_edge: 最长边上限，超过时等比缩小，None 为保持原尺寸
+    quality:       JPEG/WebP 质量 1~100；PNG 为无损，质量越高压缩级别越低 (编码越快、文件越大)
+    """
+
+    def __init__(self, image_format=FORMAT_JPEG, quality=70, max_long_edge=None):
+        self.image_format = image_format if image_format in FORMAT_EXTENSIONS else FORMAT_JPEG
+        self.quality = min(max(int(quality), 1), 100)
+        self.max_long_edge = max_long_edge or None
+
+    @property
+    def extension(self):
+        return FORMAT_EXTENSIONS[self.image_format]
+
+    def imencode_params(self):
+        if self.image_format == FORMAT_WEBP:
+            return [int(cv2.IMWRITE_WEBP_QUALITY), self.quality]
+        if self.image_format == FORMAT_PNG:
+            return [int(cv2.IMWRITE_PNG_COMPRESSION), min(max((100 - self.quality) // 10, 0), 9)]
+        return [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+
+
+def resize_long_edge(frame, max_long_edge):
+    """最长边超过 max_long_edge 时等比缩小 (INTER_AREA 缩小效果最好)"""
+    if not max_long_edge:
+        return frame
+    h, w = frame.shape[:2]
+    long_edge = max(h, w)
+    if long_edge <= max_long_edge:
+        return frame
+    ratio = max_long_edge / long_edge
+    return cv2.resize(frame, (max(int(w * ratio), 1), max(int(h * ratio), 1)), interpolation=cv2.INTER_AREA)
+
+
+def encode_image(frame, options=None):
+    """按 EncodeOptions 缩放并编码，返回图片字节"""
+    options = options or EncodeOptions()
+    frame = resize_long_edge(frame, options.max_long_edge)
+    ok, buf = cv2.imencode('.' + options.extension, frame, options.imencode_params())
+    if not ok:
+        raise ValueError(f"{options.image_format} 编码失败")
+    return buf.tobytes()
+
+
+def sample_file_name(sample_index, extension='jpg'):
+    return f"img_{sample_index:05d}.{extension}"
+
+
+# 缩略图金字塔：(尺寸名, 最长边)，从大到小，小图由上一级缩小得到，比每级都从原图缩放更省
+THUMB_SIZES = (('md', 480), ('sm', 160))
+THUMB_QUALITY = 75
+
+
+def thumb_file_name(file_name):
+    """缩略图统一用 JPEG：img_00000.webp -> img_00000.jpg"""
+    return os.path.splitext(file_name)[0] + '.jpg'
+
+
+def encode_thumbnails(frame):
+    """返回 {尺寸名: JPEG 字节}"""
+    thumbs = {}
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), THUMB_QUALITY]
+    for size, long_edge in THUMB_SIZES:
+        frame = resize_long_edge(frame, long_edge)
+        ok, buf = cv2.imencode('.jpg', frame, params)
+        if not ok:
+            raise ValueError("缩略图编码失败")
+        thumbs[size] = buf.tobytes()
+    return thumbs
+
+
+def encode_with_thumbnails(frame, options=None):
+    """编码原图并生成缩略图，返回 (图片字节, {尺寸名: 缩略图字节})"""
+    return encode_image(frame, options), encode_thumbnails(frame)
+
+
+def write_thumbnails(thumb_dir, file_name, thumbs):
+    """写入 thumb_dir/<尺寸名>/<缩略图文件名>"""
+    name = thumb_file_name(file_name)
+    for size, data in thumbs.items():
+        size_dir = os.path.join(thumb_dir, size)
+        os.makedirs(size_dir, exist_ok=True)
+        with open(os.path.join(size_dir, name), 'wb') as f:
+            f.write(data)
+
+
+def remove_thumbnails(thumb_dir, file_name):
+    name = thumb_file_name(file_name)
+    for size, _ in THUMB_SIZES:
+        path = os.path.join(thumb_dir, size, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def rename_thumbnails(thumb_dir, old_name, new_name):
+    old_name, new_name = thumb_file_name(old_name), thumb_file_name(new_name)
+    for size, _ in THUMB_SIZES:
+        old_path = os.path.join(thumb_dir, size, old_name)
+        if os.path.exists(old_path):
+            os.replace(old_path, os.path.join(thumb_dir, size, new_name))
+
+
+def plan_segments(total_frames, interval, parts):
+    """
+    把 [0, total_frames) 切成 parts 段，每段边界对齐到 interval 的整数倍，
+    保证各段抽出的帧号与顺序抽帧完全一致。最后一段 end 为 None，读到视频真实结尾。
+    """
+    total_samples = (total_frames + interval - 1) // interval
+    parts = max(min(parts, total_samples), 1)
+    bounds = [total_samples * k // parts for k in range(parts + 1)]
+    segments = []
+    for k in range(parts):
+        start = bounds[k] * interval
+        end = bounds[k + 1] * interval if k < parts - 1 else None
+        segments.append((start, end))
+    return segments
+
+
+def extract_segment(video_abs_path, output_dir, video_fps, options, start, end, mode=MODE_AUTO, encode_options=None,
+                    thumb_dir=None):
+    """
+    进程池任务：独立打开一个 VideoCapture，抽取 [start, end) 内的帧并按 encode_options 编码写盘
+    指定 thumb_dir 时同时生成缩略图
+    文件名由帧号决定 (img_<frame_index // interval>.<ext>)，与分段方式无关。
+    返回 (按顺序排列的文件名列表, 扫描帧数, 相似帧跳过数, 保留帧的 dHash 列表)；
+    未开启相似帧过滤时哈希列表为 None，开启时供合并阶段与上一段末尾的保留帧比较。
+
+    注意：本模块不依赖 Django，spawn 出来的子进程可直接导入
+    """
+    encode_options = encode_options or EncodeOptions()
+    source = FrameSource(video_abs_path, video_fps, options, mode=mode, start=start, end=end)
+    file_names = []
+    hashes = [] if source.dedup else None
+    for frame_index, frame in source:
+        if hashes is not None:
+            hashes.append(source.dedup.last_hash)
+        file_name = sample_file_name(frame_index // source.interval, encode_options.extension)
+        with open(os.path.join(output_dir, file_name), 'wb') as f:
+            f.write(encode_image(frame, encode_options))
+        if thumb_dir:
+            write_thumbnails(thumb_dir, file_name, encode_thumbnails(frame))
+        file_names.append(file_name)
+    return file_names, source.scanned, source.skipped, hashes
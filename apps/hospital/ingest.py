@@ -0,0 +1,262 @@
+# apps/hospital/ingest.py
+"""
+视频入库：把抽出的帧批量写入 SampleImage
+
+原逻辑每保存一帧就执行一次 SampleImage.objects.create()，1 万帧的视频就是 1 万次 INSERT。
+这里攒够一批后在同一个事务里 bulk_create，并顺带把 task.sample_count 落盘作为检查点，
+后台进程中途崩溃时也能从数据库看到已入库的数量。
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.models import LabelTask, SampleImage, STATUS_READY
+from apps.core.summary import first_sample_subquery
+from apps.core.utils import gen_random_code
+from apps.hospital.extractor import (
+    open_video, output_size, plan_segments, extract_segment, sample_file_name, encode_with_thumbnails,
+    write_thumbnails, rename_thumbnails, remove_thumbnails, hash_distance,
+    FrameSource, SamplingOptions, EncodeOptions, MODE_AUTO,
+)
+from apps.hospital.pipeline import StageStats, run_pipeline
+from apps.hospital.progress import ProgressReporter
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class VideoIngestError(Exception):
+    pass
+
+
+class IngestAborted(VideoIngestError):
+    """调用方要求停止 (如队列租约已被其他 worker 接管)，已入库的样本由接手方清理"""
+
+
+def get_batch_size():
+    return max(int(getattr(settings, 'VIDEO_INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)), 1)
+
+
+class SampleBatchWriter:
+    """
+    攒批写入器
+
+    用法:
+        writer = SampleBatchWriter(task)
+        writer.add(file_name)
+        ...
+        writer.flush()
+    """
+
+    def __init__(self, task, batch_size=None, stats=None, has_thumbs=True, size=(None, None), should_stop=None):
+        self.task = task
+        self.should_stop = should_stop
+        self.has_thumbs = has_thumbs
+        self.width, self.height = size
+        self.stats = stats
+        self.batch_size = batch_size or get_batch_size()
+        self.pending = []
+        self.saved_count = 0
+
+    def add(self, file_name):
+        self.pending.append(SampleImage(
+            task=self.task,
+            code=gen_random_code("SP", 4),
+            file_path=f"upload/images/{self.task.code}/{file_name}",
+            original_name=file_name,
+            has_thumbs=self.has_thumbs,
+            width=self.width,
+            height=self.height,
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        # 每批写库前检查一次，停止后不再写入任何样本
+        if self.should_stop and self.should_stop():
+            raise IngestAborted(f"任务 {self.task.code} 已停止入库")
+        started = time.perf_counter()
+        with transaction.atomic():
+            SampleImage.objects.bulk_create(self.pending, batch_size=self.batch_size)
+            first_batch = self.saved_count == 0
+            self.saved_count += len(self.pending)
+            # 检查点：每批写完同步一次样本数；第一批顺带写入首张样本 id
+            updates = {'sample_count': self.saved_count}
+            if first_batch:
+                updates['first_sample_id'] = first_sample_subquery(self.task.id)
+            LabelTask.objects.filter(id=self.task.id).update(**updates)
+        self.pending = []
+        if self.stats is not None:
+            self.stats.add('db', time.perf_counter() - started)
+
+
+def task_images_dir(task):
+    """任务抽帧图片的存放目录 (MEDIA_ROOT/upload/images/<code>)"""
+    return os.path.join(settings.MEDIA_ROOT, 'upload', 'images', task.code)
+
+
+def task_thumbs_dir(task):
+    """缩略图目录 (MEDIA_ROOT/upload/thumbs/<code>/<尺寸名>)，与原图分开存放，打包下载时不会混进去"""
+    return os.path.join(settings.MEDIA_ROOT, 'upload', 'thumbs', task.code)
+
+
+def get_segment_workers():
+    """分段并行抽帧的进程数，0/1 表示关闭"""
+    workers = getattr(settings, 'VIDEO_SEGMENT_WORKERS', 0)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return int(workers)
+
+
+def ingest_video(task, video_abs_path, output_dir, options=None, encode_options=None, should_stop=None, stats=None):
+    """
+    抽帧并入库，返回生成的样本数；出错时直接抛出异常，由调用方决定重试或标记失败
+    options 为 SamplingOptions (固定/自适应采样、相似帧过滤)，默认每秒 1 帧
+    encode_options 为 EncodeOptions (尺寸、格式、质量)，默认原尺寸 JPEG 质量 70
+    should_stop() 返回 True 时在下一批写库前抛出 IngestAborted
+    stats 为 StageStats，传入时由调用方读取各阶段耗时 (完成时也会写进进度的 stages 字段)
+    """
+    options = options or SamplingOptions()
+    encode_options = encode_options or EncodeOptions()
+    thumb_dir = task_thumbs_dir(task)
+    cap, video_fps, total_frames = open_video(video_abs_path)
+    if cap is None:
+        raise VideoIngestError(f"无法打开视频: {video_abs_path}")
+    # 同一视频抽出的帧尺寸一致，入库时一并记录，导出数据集时不必再读图片
+    width, height = output_size(cap, encode_options.max_long_edge)
+    cap.release()
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    scan_interval = options.scan_interval(video_fps)
+    mode = getattr(settings, 'VIDEO_EXTRACT_MODE', MODE_AUTO)
+
+    stats = stats or StageStats()
+    writer = SampleBatchWriter(task, stats=stats, size=(width, height), should_stop=should_stop)
+    progress = ProgressReporter(task, total=(total_frames + scan_interval - 1) // scan_interval)
+    progress.update(0, 0, force=True)
+
+    try:
+        # 长视频：按时间段切分，多进程并行解码
+        segment_workers = get_segment_workers()
+        min_seconds = getattr(settings, 'VIDEO_SEGMENT_MIN_SECONDS', 600)
+        if segment_workers > 1 and total_frames and total_frames / video_fps >= min_seconds:
+            started = time.perf_counter()
+            segment_files = _iter_parallel(
+                video_abs_path, output_dir, thumb_dir, video_fps, options, encode_options, mode,
+                total_frames, segment_workers, stats
+            )
+            for file_name in segment_files:
+                writer.add(file_name)
+                stats.frames += 1
+                progress.update(stats.scanned, stats.frames, skipped=stats.skipped)
+            stats.add('segments', time.perf_counter() - started)
+        else:
+            source = FrameSource(video_abs_path, video_fps, options, mode=mode)
+            _run_sequential(source, encode_options, output_dir, thumb_dir, writer, stats, progress)
+        writer.flush()
+        if should_stop and should_stop():
+            raise IngestAborted(f"任务 {task.code} 已停止入库")
+    except IngestAborted:
+        # 进度由接手的 worker 重新上报
+        raise
+    except Exception as e:
+        progress.fail(e)
+        raise
+    saved_count = writer.saved_count
+    print(f"⏱ 任务 {task.code} 各阶段耗时: {stats.summary()}")
+
+    task.sample_count = saved_count
+    task.dedup_skipped = stats.skipped
+    task.state = STATUS_READY
+    task.save(update_fields=['sample_count', 'dedup_skipped', 'state'])
+    task.mark_content_changed()
+    progress.finish(stats.scanned, saved_count, skipped=stats.skipped, stages=stats.as_dict())
+    print(f"✅ 任务 {task.code} 后台处理完成，生成 {saved_count} 张图片，跳过相似帧 {stats.skipped} 张")
+    return saved_count
+
+
+def _run_sequential(source, encode_options, output_dir, thumb_dir, writer, stats, progress):
+    """
+    单进程：解码线程 + 编码线程池 + 当前线程写盘入库 (见 apps.hospital.pipeline)
+    自适应采样与相似帧过滤都在解码线程里完成，被丢弃的帧不再进入编码/写盘阶段
+    缩略图与原图在同一个编码线程里生成，复用已解码的帧
+    """
+
+    def write(seq, frame_index, encoded):
+        data, thumbs = encoded
+        file_name = sample_file_name(seq, encode_options.extension)
+        with open(os.path.join(output_dir, file_name), 'wb') as f:
+            f.write(data)
+        write_thumbnails(thumb_dir, file_name, thumbs)
+        # 攒批入库，每批一个事务
+        writer.add(file_name)
+        stats.scanned = source.scanned
+        stats.skipped = source.skipped
+        progress.update(stats.scanned, seq + 1, skipped=stats.skipped)
+
+    run_pipeline(
+        source,
+        encode=partial(encode_with_thumbnails, options=encode_options),
+        write=write,
+        encoder_threads=getattr(settings, 'VIDEO_ENCODER_THREADS', 2),
+        queue_size=getattr(settings, 'VIDEO_PIPELINE_QUEUE_SIZE', 16),
+        stats=stats,
+    )
+    stats.scanned = source.scanned
+    stats.skipped = source.skipped
+
+
+def _iter_parallel(video_abs_path, output_dir, thumb_dir, video_fps, options, encode_options, mode, total_frames, workers, stats):
+    """
+    每个进程独立打开 VideoCapture 处理一段；executor.map 按分段顺序返回结果，
+    合并后的文件名与入库顺序和顺序抽帧保持一致。
+    段数取进程数的 2 倍，避免某一段解码慢拖住整体。
+    开启自适应采样/相似帧过滤时各段编号会出现空洞，合并时按顺序重命名为连续的 img_00000.jpg ...
+
+    相似帧过滤在合并时跨段衔接：每段开头的保留帧继续与上一段最后保留的帧比较，相似的删除，
+    直到出现第一张不相似的帧，与单进程的结果基本一致 (段内曾因与被删帧相似而跳过的帧不会找回)。
+    自适应采样不做衔接 (需要跨进程传递上一张保留帧的缩略图)，每段第一帧总会保留，
+    段边界处可能比单进程多保留几帧，见 settings.VIDEO_SEGMENT_WORKERS。
+    """
+    segments = plan_segments(total_frames, options.scan_interval(video_fps), workers * 2)
+    # extractor 模块不依赖 Django，用 spawn 启动子进程，避免 fork 继承数据库连接和 worker 线程
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        results = executor.map(
+            extract_segment,
+            *zip(*[
+                (video_abs_path, output_dir, video_fps, options, start, end, mode, encode_options, thumb_dir)
+                for start, end in segments
+            ])
+        )
+        seq = 0
+        last_hash = None
+        for file_names, scanned, skipped, hashes in results:
+            stats.scanned += scanned
+            stats.skipped += skipped
+            leading = hashes is not None and last_hash is not None
+            for i, file_name in enumerate(file_names):
+                if hashes is not None:
+                    if leading and hash_distance(hashes[i], last_hash) <= options.dedup_distance:
+                        # 与上一段末尾的保留帧相似：单进程时这张也会被过滤
+                        os.remove(os.path.join(output_dir, file_name))
+                        remove_thumbnails(thumb_dir, file_name)
+                        stats.skipped += 1
+                        continue
+                    leading = False
+                    last_hash = hashes[i]
+                stats.decoded += 1
+                expected = sample_file_name(seq, encode_options.extension)
+                if file_name != expected:
+                    os.replace(os.path.join(output_dir, file_name), os.path.join(output_dir, expected))
+                    rename_thumbnails(thumb_dir, file_name, expected)
+                seq += 1
+                yield expected
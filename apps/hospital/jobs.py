@@ -0,0 +1,254 @@
+# apps/hospital/jobs.py
+"""
+视频处理任务队列 (基于数据库)
+
+- add_task 只负责 enqueue_video_job()，不在 Web 进程里起线程
+- run_video_worker 管理命令启动 N 个 worker，用 SELECT ... FOR UPDATE SKIP LOCKED 租用任务，
+  多台机器可以同时消费同一个队列
+- worker 处理期间定期续租；进程崩溃后租约过期，任务会被重新租用或在启动时回收
+"""
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.core.models import (
+    LabelTask, VideoJob,
+    STATUS_PROCESSING, STATUS_ERROR,
+    JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED,
+)
+from apps.core.summary import refresh_first_sample
+from apps.hospital.extractor import SamplingOptions, EncodeOptions, SAMPLE_FIXED, DEFAULT_CHANGE_THRESHOLD
+from apps.hospital.ingest import ingest_video, task_images_dir, IngestAborted
+from apps.hospital.pipeline import StageStats
+from apps.hospital.progress import mark_failed, mark_retry_pending
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# 重试退避：第 n 次失败后等待 n * RETRY_DELAY 秒
+RETRY_DELAY_SECONDS = 30
+
+
+def get_lease_seconds():
+    return int(getattr(settings, 'VIDEO_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+
+def make_worker_id(index=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def enqueue_video_job(task, extract_fps=1, dedup_distance=None, sample_mode=SAMPLE_FIXED, min_fps=None, max_fps=None,
+                      profile=None):
+    """
+    投递一个抽帧任务
+    dedup_distance 为 None 表示不过滤相似帧；sample_mode='adaptive' 时按 [min_fps, max_fps] 自适应采样
+    指定 profile (ExtractProfile) 时，抽帧频率与输出尺寸/格式/质量以配置为准
+    """
+    return VideoJob.objects.create(
+        task=task,
+        profile=profile,
+        extract_fps=profile.fps if profile else extract_fps,
+        sample_mode=sample_mode,
+        min_fps=min_fps,
+        max_fps=max_fps,
+        dedup_distance=dedup_distance,
+        max_attempts=int(getattr(settings, 'VIDEO_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+    )
+
+
+def job_encode_options(job):
+    profile = job.profile
+    if profile is None:
+        return EncodeOptions()
+    return EncodeOptions(
+        image_format=profile.image_format,
+        quality=profile.quality,
+        max_long_edge=profile.max_long_edge,
+    )
+
+
+def job_sampling_options(job):
+    return SamplingOptions(
+        extract_fps=job.extract_fps,
+        sample_mode=job.sample_mode,
+        min_fps=job.min_fps,
+        max_fps=job.max_fps,
+        dedup_distance=job.dedup_distance,
+        change_threshold=getattr(settings, 'VIDEO_ADAPTIVE_THRESHOLD', DEFAULT_CHANGE_THRESHOLD),
+    )
+
+
+def lease_next_job(worker_id):
+    """
+    租用下一个可执行的任务：排队中且到了执行时间，或处理中但租约已过期且还有重试次数
+    租约过期、次数已用完的任务 (通常是 worker 在处理中崩溃，如 OOM) 顺带标记失败，不再反复重试
+    返回 VideoJob 或 None
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        exhausted = VideoJob.objects.select_for_update(skip_locked=True).filter(
+            status=JOB_RUNNING, lease_expires_at__lt=now, attempts__gte=F('max_attempts')
+        )
+        for job in exhausted:
+            _mark_failed(job, job.last_error or '租约过期且重试次数已用完')
+
+        job = (
+            VideoJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=JOB_PENDING, run_after__lte=now) |
+                Q(status=JOB_RUNNING, lease_expires_at__lt=now, attempts__lt=F('max_attempts'))
+            )
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        job.lease_owner = worker_id
+        job.lease_expires_at = now + timedelta(seconds=get_lease_seconds())
+        job.save(update_fields=['status', 'attempts', 'lease_owner', 'lease_expires_at', 'updated_at'])
+    return job
+
+
+def renew_lease(job_id, worker_id):
+    """续租，返回 False 表示租约已被他人接管"""
+    expires = timezone.now() + timedelta(seconds=get_lease_seconds())
+    return VideoJob.objects.filter(
+        id=job_id, status=JOB_RUNNING, lease_owner=worker_id
+    ).update(lease_expires_at=expires) > 0
+
+
+def recover_expired_jobs():
+    """
+    启动时回收：
+    1. 租约已过期的处理中任务 -> 还有重试次数则重新排队，否则标记失败
+    2. 仍处于「处理中」却没有任何未完成队列任务的 LabelTask (旧线程模式遗留) -> 补投递
+    返回 (重新排队数, 失败数, 补投递数)
+    """
+    now = timezone.now()
+    requeued = failed = orphaned = 0
+
+    with transaction.atomic():
+        expired = VideoJob.objects.select_for_update(skip_locked=True).filter(
+            status=JOB_RUNNING, lease_expires_at__lt=now
+        )
+        for job in expired:
+            if job.attempts >= job.max_attempts:
+                _mark_failed(job, job.last_error or '租约过期且重试次数已用完')
+                failed += 1
+            else:
+                job.status = JOB_PENDING
+                job.lease_owner = None
+                job.lease_expires_at = None
+                job.save(update_fields=['status', 'lease_owner', 'lease_expires_at', 'updated_at'])
+                requeued += 1
+
+    active_task_ids = VideoJob.objects.filter(
+        status__in=[JOB_PENDING, JOB_RUNNING]
+    ).values('task_id')
+    stuck_tasks = LabelTask.objects.filter(
+        state=STATUS_PROCESSING, source_video_path__isnull=False
+    ).exclude(id__in=active_task_ids)
+    for task in stuck_tasks:
+        enqueue_video_job(task)
+        orphaned += 1
+
+    return requeued, failed, orphaned
+
+
+def _mark_failed(job, error):
+    job.status = JOB_FAILED
+    job.last_error = error
+    job.lease_owner = None
+    job.lease_expires_at = None
+    job.save(update_fields=['status', 'last_error', 'lease_owner', 'lease_expires_at', 'updated_at'])
+    LabelTask.objects.filter(id=job.task_id).update(state=STATUS_ERROR)
+    mark_failed(job.task_id, error.splitlines()[0] if error else '')
+
+
+class _LeaseKeeper(threading.Thread):
+    """处理期间定期续租 (每 1/3 租期一次)；续租失败说明任务已被其他 worker 接管，置 lost 标记"""
+
+    def __init__(self, job_id, worker_id):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        interval = max(get_lease_seconds() / 3, 1)
+        try:
+            while not self.stopped.wait(interval):
+                if not renew_lease(self.job_id, self.worker_id):
+                    self.lost.set()
+                    break
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def run_job(job, worker_id):
+    """执行一个已租用的任务，成功返回 True"""
+    task = job.task
+    video_abs_path = os.path.join(settings.MEDIA_ROOT, task.source_video_path or '')
+
+    keeper = _LeaseKeeper(job.id, worker_id)
+    keeper.start()
+    stats = StageStats()
+    try:
+        # 清掉之前残留的样本 (上一次失败的尝试，或旧线程模式中断后补投递的任务)，避免重复入库
+        task.samples.all().delete()
+        refresh_first_sample(task.id)
+        task.mark_content_changed()
+        task.sample_count = 0
+        task.labeled_count = task.audited_count = task.approved_count = task.rejected_count = 0
+        task.state = STATUS_PROCESSING
+        task.save(update_fields=[
+            'sample_count', 'labeled_count', 'audited_count', 'approved_count', 'rejected_count', 'state'
+        ])
+
+        ingest_video(
+            task, video_abs_path, task_images_dir(task), job_sampling_options(job), job_encode_options(job),
+            should_stop=keeper.lost.is_set, stats=stats,
+        )
+    except IngestAborted:
+        # 租约已被他人接管：任务状态交给接手的 worker，这里不再改动
+        print(f"⚠️ 视频任务 {job.id} 的租约已被接管，停止处理")
+        return False
+    except Exception as e:
+        error = f"{e}\n{traceback.format_exc()}"
+        print(f"❌ 视频任务 {job.id} 第 {job.attempts} 次执行失败: {e}")
+        if job.attempts >= job.max_attempts:
+            _mark_failed(job, error)
+        else:
+            run_after = timezone.now() + timedelta(seconds=RETRY_DELAY_SECONDS * job.attempts)
+            VideoJob.objects.filter(id=job.id, lease_owner=worker_id).update(
+                status=JOB_PENDING,
+                last_error=error,
+                lease_owner=None,
+                lease_expires_at=None,
+                run_after=run_after,
+                updated_at=timezone.now(),
+            )
+            mark_retry_pending(task.id, job.attempts, e, run_after.timestamp())
+        return False
+    finally:
+        keeper.stop()
+
+    done = VideoJob.objects.filter(id=job.id, status=JOB_RUNNING, lease_owner=worker_id).update(
+        status=JOB_DONE, lease_owner=None, lease_expires_at=None, stage_stats=stats.as_dict(), updated_at=timezone.now()
+    )
+    if not done:
+        print(f"⚠️ 视频任务 {job.id} 的租约已被接管，结果以接手的 worker 为准")
+        return False
+    return True
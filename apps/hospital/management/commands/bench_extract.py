@@ -0,0 +1,92 @@
+# apps/hospital/management/commands/bench_extract.py
+import os
+import tempfile
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.hospital.extractor import (
+    open_video, calc_interval, iter_sampled_frames, encode_with_thumbnails, sample_file_name,
+    FrameSource, SamplingOptions, EncodeOptions, MODE_READ, MODE_GRAB, MODE_SEEK, MODE_AUTO,
+)
+from apps.hospital.pipeline import StageStats, run_pipeline
+
+
+class Command(BaseCommand):
+    """
+    抽帧基准测试：对比旧的逐帧 read() 与 grab/seek 引擎的吞吐；
+    --pipeline 时再完整跑一遍 解码 -> 编码 -> 写盘 流水线 (写到临时目录，不入库)，输出各阶段耗时与等待
+
+    用法: python manage.py bench_extract /path/to/video.mp4 --fps 1 [--pipeline]
+    """
+    help = '对比各抽帧模式的速度 (只解码不落盘)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', help='视频文件路径')
+        parser.add_argument('--fps', type=float, default=1, help='目标抽帧频率 (默认 1)')
+        parser.add_argument(
+            '--modes', default=','.join([MODE_READ, MODE_GRAB, MODE_SEEK, MODE_AUTO]),
+            help='参与对比的模式，逗号分隔'
+        )
+        parser.add_argument('--pipeline', action='store_true', help='额外运行完整流水线并输出各阶段耗时')
+
+    def handle(self, *args, **options):
+        cap, video_fps, total_frames = open_video(options['video'])
+        if cap is None:
+            raise CommandError(f"无法打开视频: {options['video']}")
+        cap.release()
+
+        interval = calc_interval(video_fps, options['fps'])
+        self.stdout.write(
+            f"视频帧率 {video_fps:.2f}, 总帧数 {total_frames}, 抽帧间隔 {interval}"
+        )
+
+        baseline = None
+        for mode in options['modes'].split(','):
+            mode = mode.strip()
+            started = time.perf_counter()
+            sampled = 0
+            for _ in iter_sampled_frames(options['video'], interval, mode=mode):
+                sampled += 1
+            elapsed = max(time.perf_counter() - started, 1e-9)
+
+            # 以「视频帧数 / 耗时」作为吞吐，反映扫完整段视频的速度
+            scanned = total_frames or sampled * interval
+            fps = scanned / elapsed
+            if baseline is None:
+                baseline = fps
+            self.stdout.write(
+                f"[{mode:>4}] 抽取 {sampled} 帧, 耗时 {elapsed:.2f}s, "
+                f"{fps:.1f} 视频帧/s, 相对 {baseline and fps / baseline or 0:.2f}x"
+            )
+
+        if options['pipeline']:
+            stats = self.run_pipeline(options['video'], video_fps, options['fps'])
+            self.stdout.write("[pipeline] 各阶段耗时 (秒，编码为各线程之和；*_wait 为空等时间):")
+            for key, value in stats.as_dict().items():
+                self.stdout.write(f"  {key:>12}: {value}")
+
+    def run_pipeline(self, video, video_fps, extract_fps):
+        """与入库相同的流水线 (默认 EncodeOptions)，写盘改为临时目录、不写数据库"""
+        encode_options = EncodeOptions()
+        source = FrameSource(video, video_fps, SamplingOptions(extract_fps=extract_fps))
+        stats = StageStats()
+        with tempfile.TemporaryDirectory() as output_dir:
+            def write(seq, frame_index, encoded):
+                data, _ = encoded
+                with open(os.path.join(output_dir, sample_file_name(seq, encode_options.extension)), 'wb') as f:
+                    f.write(data)
+
+            run_pipeline(
+                source,
+                encode=partial(encode_with_thumbnails, options=encode_options),
+                write=write,
+                encoder_threads=getattr(settings, 'VIDEO_ENCODER_THREADS', 2),
+                queue_size=getattr(settings, 'VIDEO_PIPELINE_QUEUE_SIZE', 16),
+                stats=stats,
+            )
+        stats.scanned = source.scanned
+        stats.skipped = source.skipped
+        return stats
@@ -0,0 +1,79 @@
+# apps/hospital/management/commands/build_thumbnails.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.core.models import SampleImage
+from apps.hospital.extractor import encode_thumbnails, write_thumbnails
+
+
+def build_one(sample_id, file_path, thumb_dir, need_thumbs=True):
+    """
+    读取原图生成缩略图 (need_thumbs=False 时只读尺寸)
+    成功返回 (sample_id, 宽, 高)，原图丢失/损坏返回 None
+    """
+    frame = cv2.imread(os.path.join(settings.MEDIA_ROOT, file_path))
+    if frame is None:
+        return None
+    if need_thumbs:
+        write_thumbnails(thumb_dir, os.path.basename(file_path), encode_thumbnails(frame))
+    height, width = frame.shape[:2]
+    return sample_id, width, height
+
+
+class Command(BaseCommand):
+    """
+    为已有任务回填缩略图 (新抽帧的任务在入库时已自动生成)，顺带补上缺失的图片宽高
+
+    用法: python manage.py build_thumbnails [--task TK2025...] [--force]
+    """
+    help = '为历史样本生成缩略图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', help='只处理指定任务编号')
+        parser.add_argument('--force', action='store_true', help='已生成过的也重新生成')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行线程数')
+        parser.add_argument('--batch', type=int, default=500, help='每批处理并更新的样本数')
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        qs = SampleImage.objects.order_by('id')
+        if options['task']:
+            qs = qs.filter(task__code=options['task'])
+        if not options['force']:
+            qs = qs.filter(Q(has_thumbs=False) | Q(width__isnull=True) | Q(height__isnull=True))
+        rows = qs.values_list('id', 'file_path', 'task__code', 'has_thumbs').iterator(chunk_size=options['batch'])
+
+        done = missing = 0
+        batch = []
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= options['batch']:
+                    ok, failed = self._run_batch(executor, batch)
+                    done, missing = done + ok, missing + failed
+                    batch = []
+            if batch:
+                ok, failed = self._run_batch(executor, batch)
+                done, missing = done + ok, missing + failed
+
+        self.stdout.write(self.style.SUCCESS(f"✅ 已处理 {done} 张样本的缩略图/尺寸，原图缺失 {missing} 张"))
+
+    def _run_batch(self, executor, batch):
+        thumbs_root = os.path.join(settings.MEDIA_ROOT, 'upload', 'thumbs')
+        force = self.force
+        results = executor.map(
+            lambda row: build_one(row[0], row[1], os.path.join(thumbs_root, row[2]), need_thumbs=force or not row[3]),
+            batch
+        )
+        done = [
+            SampleImage(id=sample_id, has_thumbs=True, width=width, height=height)
+            for sample_id, width, height in filter(None, results)
+        ]
+        SampleImage.objects.bulk_update(done, ['has_thumbs', 'width', 'height'])
+        self.stdout.write(f"已处理 {len(batch)} 张，成功 {len(done)} 张")
+        return len(done), len(batch) - len(done)
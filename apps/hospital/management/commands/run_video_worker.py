@@ -0,0 +1,77 @@
+# apps/hospital/management/commands/run_video_worker.py
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.hospital.jobs import lease_next_job, run_job, recover_expired_jobs, make_worker_id
+
+
+class Command(BaseCommand):
+    """
+    视频抽帧 worker 池
+
+    用法: python manage.py run_video_worker --concurrency 4
+    可在多台机器上同时启动，共享同一个数据库队列
+    """
+    help = '消费视频处理队列 (VideoJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=getattr(settings, 'VIDEO_WORKER_CONCURRENCY', 2),
+            help='并行处理的任务数'
+        )
+        parser.add_argument('--poll', type=float, default=2.0, help='队列为空时的轮询间隔 (秒)')
+        parser.add_argument('--once', action='store_true', help='处理完当前队列后退出')
+
+    def handle(self, *args, **options):
+        requeued, failed, orphaned = recover_expired_jobs()
+        self.stdout.write(
+            f"启动回收: 重新排队 {requeued} 个, 标记失败 {failed} 个, 补投递遗留任务 {orphaned} 个"
+        )
+
+        stop_event = threading.Event()
+        workers = [
+            threading.Thread(
+                target=self.worker_loop,
+                args=(make_worker_id(i), options['poll'], options['once'], stop_event),
+                daemon=True,
+            )
+            for i in range(max(options['concurrency'], 1))
+        ]
+        for t in workers:
+            t.start()
+        self.stdout.write(self.style.SUCCESS(f"✅ 已启动 {len(workers)} 个 worker"))
+
+        try:
+            for t in workers:
+                while t.is_alive():
+                    t.join(timeout=1)
+        except KeyboardInterrupt:
+            # 不再领取新任务；正在处理的任务租约过期后会被其他 worker 接管
+            stop_event.set()
+            self.stdout.write("正在停止 worker ...")
+
+    def worker_loop(self, worker_id, poll, once, stop_event):
+        try:
+            while not stop_event.is_set():
+                close_old_connections()
+                try:
+                    job = lease_next_job(worker_id)
+                except Exception as e:
+                    # 数据库抖动时不退出 worker，稍后重试
+                    self.stderr.write(f"[{worker_id}] 领取任务失败: {e}")
+                    stop_event.wait(poll)
+                    continue
+                if job is None:
+                    if once:
+                        break
+                    stop_event.wait(poll)
+                    continue
+                self.stdout.write(f"[{worker_id}] 开始处理任务 {job.task.code} (第 {job.attempts} 次)")
+                ok = run_job(job, worker_id)
+                self.stdout.write(f"[{worker_id}] 任务 {job.task.code} {'完成' if ok else '失败'}")
+        finally:
+            connection.close()
@@ -0,0 +1,177 @@
+# apps/hospital/pipeline.py
+"""
+抽帧流水线：解码 -> 图片编码 -> 落盘/入库 三段并行
+
+- 解码线程：驱动帧源 (extractor.FrameSource，grab/retrieve、自适应采样与相似帧过滤都在这里)
+- 编码线程池：执行调用方传入的 encode (入库时为 extractor.encode_with_thumbnails，按 EncodeOptions 输出
+  JPEG/PNG/WebP 并生成缩略图)；缩放 + cv2.imencode 期间 OpenCV 会释放 GIL，多线程可以真正并行
+- 写入阶段：在调用方线程里按顺序写文件、写数据库，保证 img_00000.jpg 的编号与顺序不变
+
+各阶段之间用有界队列衔接，另有一个「在途帧」信号量限制同时驻留内存的帧数，
+即使某个编码线程偶尔变慢，乱序缓冲也不会无限增长，内存占用保持平稳。
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+
+_DONE = object()
+# 阻塞操作的轮询间隔，用于及时响应其他阶段的异常退出
+_POLL_SECONDS = 0.2
+
+
+class StageStats:
+    """
+    各阶段累计耗时 (秒)，编码阶段为所有线程之和。
+    *_wait 表示该阶段因上下游阻塞而空等的时间，哪个阶段的工作耗时最大、等待最少，哪个就是瓶颈。
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.scanned = 0
+        self.decoded = 0
+        self.frames = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    def as_dict(self):
+        with self._lock:
+            data = {k: round(v, 3) for k, v in self.seconds.items()}
+        data['scanned'] = self.scanned
+        data['decoded'] = self.decoded
+        data['frames'] = self.frames
+        data['skipped'] = self.skipped
+        data['total'] = round(time.perf_counter() - self.started, 3)
+        return data
+
+    def summary(self):
+        return ', '.join(f"{k}={v}" for k, v in self.as_dict().items())
+
+
+def run_pipeline(frames, encode, write, encoder_threads=2, queue_size=16, stats=None):
+    """
+    frames: 可迭代对象，产出 (frame_index, frame)
+    encode: encode(frame) -> data (任意编码结果)，在编码线程池中执行
+    write:  write(seq, frame_index, data)，在当前线程中按 seq (0, 1, 2 ...) 顺序调用
+    返回处理的帧数；任一阶段出错会停止整个流水线并在当前线程重新抛出异常
+    """
+    stats = stats or StageStats()
+    encoder_threads = max(int(encoder_threads), 1)
+    queue_size = max(int(queue_size), 1)
+
+    decode_q = queue.Queue(maxsize=queue_size)
+    result_q = queue.Queue(maxsize=queue_size)
+    # 在途帧上限：解码出来但还没写完的帧数
+    inflight = threading.Semaphore(queue_size * 2 + encoder_threads)
+    stop = threading.Event()
+    errors = []
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decoder():
+        seq = 0
+        it = iter(frames)
+        try:
+            while not stop.is_set():
+                waited = time.perf_counter()
+                while not inflight.acquire(timeout=_POLL_SECONDS):
+                    if stop.is_set():
+                        return
+                stats.add('decode_wait', time.perf_counter() - waited)
+
+                started = time.perf_counter()
+                item = next(it, _DONE)
+                stats.add('decode', time.perf_counter() - started)
+                if item is _DONE:
+                    inflight.release()
+                    break
+                frame_index, frame = item
+                stats.decoded += 1
+                if not put(decode_q, (seq, frame_index, frame)):
+                    return
+                seq += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            # 及时释放生成器里的 VideoCapture
+            if hasattr(it, 'close'):
+                it.close()
+            for _ in range(encoder_threads):
+                put(decode_q, _DONE)
+
+    def encoder():
+        try:
+            while not stop.is_set():
+                try:
+                    item = decode_q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                seq, frame_index, frame = item
+                started = time.perf_counter()
+                data = encode(frame)
+                stats.add('encode', time.perf_counter() - started)
+                if not put(result_q, (seq, frame_index, data)):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(result_q, _DONE)
+
+    threads = [threading.Thread(target=decoder, daemon=True)]
+    threads += [threading.Thread(target=encoder, daemon=True) for _ in range(encoder_threads)]
+    for t in threads:
+        t.start()
+
+    # 写入阶段：乱序到达的结果先放进 pending，按 seq 顺序写出
+    pending = {}
+    next_seq = 0
+    finished_encoders = 0
+    try:
+        while finished_encoders < encoder_threads and not stop.is_set():
+            waited = time.perf_counter()
+            try:
+                item = result_q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                stats.add('write_wait', time.perf_counter() - waited)
+                continue
+            stats.add('write_wait', time.perf_counter() - waited)
+            if item is _DONE:
+                finished_encoders += 1
+                continue
+            seq, frame_index, data = item
+            pending[seq] = (frame_index, data)
+            while next_seq in pending:
+                frame_index, data = pending.pop(next_seq)
+                started = time.perf_counter()
+                write(next_seq, frame_index, data)
+                stats.add('write', time.perf_counter() - started)
+                next_seq += 1
+                stats.frames = next_seq
+                inflight.release()
+    except Exception as e:
+        errors.append(e)
+    finally:
+        if errors:
+            stop.set()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return next_seq
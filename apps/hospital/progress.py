@@ -0,0 +1,113 @@
+# apps/hospital/progress.py
+"""
+抽帧进度：worker 定期把进度写入缓存 (CACHES['progress'])，前端通过 hospital:progress_api 批量轮询
+
+缓存必须能跨进程共享 (worker 与 Web 是不同进程)，默认用文件缓存，多机部署请换成 Redis。
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches, InvalidCacheBackendError
+
+from apps.core.models import STATUS_PROCESSING, STATUS_READY, STATUS_ERROR
+
+PROGRESS_TIMEOUT = 3600
+
+
+def get_progress_cache():
+    try:
+        return caches['progress']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def progress_key(task_id):
+    return f'task_progress_{task_id}'
+
+
+def get_progress_many(task_ids):
+    """一次取多个任务的进度，返回 {task_id: dict}"""
+    cache = get_progress_cache()
+    found = cache.get_many([progress_key(i) for i in task_ids])
+    return {i: found[progress_key(i)] for i in task_ids if progress_key(i) in found}
+
+
+def mark_failed(task_id, error=''):
+    get_progress_cache().set(progress_key(task_id), {
+        'state': STATUS_ERROR,
+        'error': str(error)[:200],
+        'updated_at': time.time(),
+    }, PROGRESS_TIMEOUT)
+
+
+def mark_retry_pending(task_id, attempt, error, retry_at):
+    """
+    本次尝试失败、等待重试：覆盖失败时写入的 ERROR 进度，任务仍按「处理中」展示 (附重试时间)，
+    前端不会把它当作已结束而刷新页面
+    """
+    get_progress_cache().set(progress_key(task_id), {
+        'state': STATUS_PROCESSING,
+        'saved': 0,
+        'total': None,
+        'percent': None,
+        'eta': None,
+        'attempt': attempt,
+        'error': str(error)[:200],
+        'retry_at': retry_at,
+        'updated_at': time.time(),
+    }, PROGRESS_TIMEOUT)
+
+
+class ProgressReporter:
+    """
+    进度上报器，按 VIDEO_PROGRESS_INTERVAL 秒节流，避免每帧都写缓存
+
+    decoded: 已解码 (扫描) 的帧数
+    saved:   已写盘入库的帧数
+    skipped: 相似帧过滤丢弃的帧数
+    total:   根据 CAP_PROP_FRAME_COUNT 估算的待扫描帧数 (部分容器不准确，可能为 0)
+    """
+
+    def __init__(self, task, total=0):
+        self.task_id = task.id
+        self.total = max(int(total), 0)
+        self.started = time.time()
+        self.interval = getattr(settings, 'VIDEO_PROGRESS_INTERVAL', 1.0)
+        self.last_report = 0
+        self.cache = get_progress_cache()
+
+    def update(self, decoded, saved, skipped=0, force=False):
+        now = time.time()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        self._write(STATUS_PROCESSING, decoded, saved, skipped, now)
+
+    def finish(self, decoded, saved, skipped=0, stages=None):
+        self._write(STATUS_READY, decoded, saved, skipped, time.time(), total=decoded, stages=stages)
+
+    def fail(self, error=''):
+        mark_failed(self.task_id, error)
+
+    def _write(self, state, decoded, saved, skipped, now, total=None, stages=None):
+        total = self.total if total is None else total
+        elapsed = now - self.started
+        # 以扫描进度计算百分比：自适应采样/相似帧过滤丢弃的帧同样算作已处理
+        eta = None
+        if decoded and total > decoded:
+            eta = round(elapsed / decoded * (total - decoded), 1)
+        data = {
+            'state': state,
+            'decoded': decoded,
+            'saved': saved,
+            'skipped': skipped,
+            'total': total,
+            'percent': min(int(decoded * 100 / total), 100) if total else None,
+            'elapsed': round(elapsed, 1),
+            'eta': eta,
+            'updated_at': now,
+        }
+        if stages:
+            # 各阶段耗时 (见 pipeline.StageStats)，只在完成时附带
+            data['stages'] = stages
+        self.cache.set(progress_key(self.task_id), data, PROGRESS_TIMEOUT)
@@ -0,0 +1,17 @@
+# apps/hospital/tests/base.py
+from django.test import TestCase, override_settings
+
+from apps.hospital.progress import get_progress_cache
+
+# 进度缓存换成进程内缓存，不碰开发环境的文件缓存
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'progress': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'progress-tests'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HospitalTestCase(TestCase):
+    def setUp(self):
+        # 任务 id 在各测试间会重复，先清空上一个测试写下的进度
+        get_progress_cache().clear()
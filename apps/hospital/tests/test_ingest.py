@@ -0,0 +1,88 @@
+# apps/hospital/tests/test_ingest.py
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+from django.test import override_settings
+
+from apps.core.models import LabelTask, VideoJob, STATUS_READY, JOB_DONE
+from apps.hospital.extractor import SamplingOptions
+from apps.hospital.ingest import ingest_video, task_images_dir
+from apps.hospital.jobs import enqueue_video_job, lease_next_job, run_job
+from apps.hospital.pipeline import StageStats
+from apps.hospital.progress import get_progress_many
+from apps.hospital.tests.base import HospitalTestCase
+from apps.users.models import UserProfile
+
+VIDEO_FPS = 10
+
+
+def write_video(path, frames):
+    """每帧一种灰度，相邻帧差异明显"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), VIDEO_FPS, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), (i * 37) % 256, dtype=np.uint8))
+    writer.release()
+
+
+def write_scene_video(path, scenes, seconds_per_scene):
+    """每个场景一张随机块状图案 (压缩后 dHash 仍稳定)，场景内画面静止"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), VIDEO_FPS, (64, 48))
+    for scene in range(scenes):
+        blocks = np.random.RandomState(scene).randint(0, 256, (6, 8), dtype=np.uint8)
+        frame = cv2.cvtColor(cv2.resize(blocks, (64, 48), interpolation=cv2.INTER_NEAREST), cv2.COLOR_GRAY2BGR)
+        for _ in range(VIDEO_FPS * seconds_per_scene):
+            writer.write(frame)
+    writer.release()
+
+
+@override_settings(VIDEO_SEGMENT_WORKERS=0)
+class IngestTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.makedirs(os.path.join(self.media, 'upload', 'videos'))
+        write_video(os.path.join(self.media, 'upload', 'videos', 'v.mp4'), VIDEO_FPS * 3)
+        user = UserProfile.objects.create_user('doc1', password='x', role='hospital')
+        self.task = LabelTask.objects.create(code='TK-I1', name='i', creator=user, source_video_path='upload/videos/v.mp4')
+
+    def test_run_job_records_stage_stats(self):
+        enqueue_video_job(self.task, extract_fps=1)
+        job = lease_next_job('w1')
+        self.assertTrue(run_job(job, 'w1'))
+
+        task = LabelTask.objects.get(id=self.task.id)
+        self.assertEqual((task.state, task.sample_count), (STATUS_READY, 3))
+        job = VideoJob.objects.get(id=job.id)
+        self.assertEqual(job.status, JOB_DONE)
+        for key in ('decode', 'encode', 'write', 'db', 'total'):
+            self.assertIn(key, job.stage_stats)
+        self.assertEqual(job.stage_stats['frames'], 3)
+        self.assertEqual(get_progress_many([task.id])[task.id]['stages']['frames'], 3)
+
+    def test_parallel_dedup_matches_sequential(self):
+        """分段边界落在静止场景中间时，跨段的相似帧同样被过滤"""
+        video = os.path.join(self.media, 'upload', 'videos', 'scenes.mp4')
+        write_scene_video(video, scenes=6, seconds_per_scene=2)
+        options = SamplingOptions(extract_fps=2, dedup_distance=6)
+
+        results = {}
+        for workers in (0, 2):
+            with self.settings(VIDEO_SEGMENT_WORKERS=workers, VIDEO_SEGMENT_MIN_SECONDS=0):
+                stats = StageStats()
+                saved = ingest_video(self.task, video, task_images_dir(self.task), options, stats=stats)
+            thumbs = os.path.join(self.media, 'upload', 'thumbs', self.task.code)
+            # 被删除的边界帧不留下缩略图
+            results[workers] = (saved, stats.scanned, stats.decoded, stats.skipped, len(os.listdir(os.path.join(thumbs, 'sm'))))
+            self.task.samples.all().delete()
+            shutil.rmtree(task_images_dir(self.task))
+            shutil.rmtree(thumbs)
+
+        self.assertEqual(results[0], (6, 24, 6, 18, 6))
+        self.assertEqual(results[2], results[0])
@@ -0,0 +1,60 @@
+# apps/hospital/tests/test_jobs.py
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.core.models import LabelTask, VideoJob, STATUS_ERROR, JOB_PENDING, JOB_RUNNING, JOB_FAILED
+from apps.hospital.jobs import lease_next_job, recover_expired_jobs
+from apps.hospital.progress import get_progress_many
+from apps.hospital.tests.base import HospitalTestCase
+from apps.users.models import UserProfile
+
+
+class LeaseTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        user = UserProfile.objects.create_user('doc1', password='x', role='hospital')
+        self.task = LabelTask.objects.create(code='TK-J1', name='j', creator=user, source_video_path='upload/videos/j.mp4')
+
+    def job(self, **fields):
+        return VideoJob.objects.create(task=self.task, max_attempts=3, **fields)
+
+    def expired(self, attempts):
+        return self.job(
+            status=JOB_RUNNING, attempts=attempts, last_error='boom', lease_owner='w0',
+            lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+
+    def test_lease_pending_job(self):
+        job = self.job()
+        leased = lease_next_job('w1')
+        self.assertEqual((leased.id, leased.status, leased.attempts, leased.lease_owner), (job.id, JOB_RUNNING, 1, 'w1'))
+        self.assertIsNone(lease_next_job('w2'))
+
+    def test_pending_job_waits_for_backoff(self):
+        self.job(run_after=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(lease_next_job('w1'))
+
+    def test_expired_lease_is_retried(self):
+        job = self.expired(attempts=2)
+        leased = lease_next_job('w1')
+        self.assertEqual((leased.id, leased.attempts, leased.lease_owner), (job.id, 3, 'w1'))
+
+    def test_expired_lease_without_attempts_left_fails(self):
+        job = self.expired(attempts=3)
+        self.assertIsNone(lease_next_job('w1'))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.lease_owner), (JOB_FAILED, 3, None))
+        self.assertEqual(LabelTask.objects.get(id=self.task.id).state, STATUS_ERROR)
+        self.assertEqual(get_progress_many([self.task.id])[self.task.id]['state'], STATUS_ERROR)
+
+    def test_active_lease_is_skipped(self):
+        self.job(status=JOB_RUNNING, attempts=1, lease_owner='w0', lease_expires_at=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(lease_next_job('w1'))
+
+    def test_recover_expired_jobs(self):
+        retry, exhausted = self.expired(attempts=1), self.expired(attempts=3)
+        self.assertEqual(recover_expired_jobs(), (1, 1, 0))
+        self.assertEqual(VideoJob.objects.get(id=retry.id).status, JOB_PENDING)
+        self.assertEqual(VideoJob.objects.get(id=exhausted.id).status, JOB_FAILED)
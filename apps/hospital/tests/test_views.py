@@ -0,0 +1,17 @@
+# apps/hospital/tests/test_views.py
+
+from apps.core.models import LabelTask
+from apps.hospital.tests.base import HospitalTestCase
+from apps.users.models import UserProfile
+
+
+class ProgressApiTests(HospitalTestCase):
+    def test_progress_is_not_cached(self):
+        user = UserProfile.objects.create_user('doc1', password='x', role='hospital')
+        task = LabelTask.objects.create(code='TK-P1', name='p', creator=user, sample_count=4)
+        self.client.force_login(user)
+
+        r = self.client.get('/hospital/api/progress/', {'ids': str(task.id)})
+
+        self.assertEqual(r.json()['tasks'][str(task.id)]['saved'], 4)
+        self.assertIn('no-cache', r['Cache-Control'])
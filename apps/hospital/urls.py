@@ -17,5 +17,9 @@ urlpatterns = [
     path('audit/<int:task_id>/', views.audit_workspace, name='audit'),
     # ✅ [新增] 审核提交API
     path('api/audit/save/', views.save_audit_result, name='audit_save'),
+    # 解密下载病例
+    path('patient/<int:task_id>/', views.download_patient_file, name='patient_file'),
+    # ✅ [新增] 抽帧进度批量查询API
+    path('api/progress/', views.task_progress_api, name='progress_api'),
 
 ]
\ No newline at end of file
@@ -1,23 +1,31 @@
 import os
-import cv2
 import json
-import threading
+from urllib.parse import quote
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
 from django.contrib import messages
-from django.db import connection
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.utils import timezone
 
 # 引入装饰器
-from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
 from apps.core.decorators import hospital_required 
 
 # 引入核心模型
-from apps.core.models import LabelTask, SampleImage, STATUS_READY, STATUS_ERROR
-from apps.core.utils import gen_random_code, encrypt_file, log_operation
+from apps.core.models import LabelTask, SampleImage, ExtractProfile
+from apps.core.counters import sample_state, record_transition, AUDIT_APPROVED, AUDIT_REJECTED
+from apps.core.samples import neighbor_window, window_item, window_links
+from apps.core.utils import gen_random_code, encrypt_upload, decrypt_stream, read_encrypted_name, DecryptError, log_operation
+from apps.hospital.extractor import SAMPLE_FIXED, SAMPLE_ADAPTIVE
+from apps.hospital.jobs import enqueue_video_job
+from apps.hospital.progress import get_progress_many
+from apps.labeler.geometry import GRID
+
+# 审核胶片条：当前图片前后各显示几张
+FILMSTRIP_SIDE = 4
 
 @never_cache
 @hospital_required
@@ -27,6 +35,18 @@ def add_task(request):
         try:
             name = request.POST.get('name')
             remark = request.POST.get('remark')
+            dedup = request.POST.get('dedup') == 'on'
+            profile_id = request.POST.get('profile')
+            profile = ExtractProfile.objects.filter(id=profile_id).first() if profile_id else None
+            sample_mode = request.POST.get('sample_mode') or SAMPLE_FIXED
+            min_fps = max_fps = None
+            if sample_mode == SAMPLE_ADAPTIVE:
+                min_fps = float(request.POST.get('min_fps') or settings.VIDEO_ADAPTIVE_MIN_FPS)
+                max_fps = float(request.POST.get('max_fps') or settings.VIDEO_ADAPTIVE_MAX_FPS)
+                if min_fps <= 0 or max_fps < min_fps:
+                    raise Exception("自适应采样频率设置不正确：需满足 0 < 最低频率 <= 最高频率")
+            elif sample_mode != SAMPLE_FIXED:
+                raise Exception("未知的采样模式")
             video_file = request.FILES.get('video_file')
             patient_file = request.FILES.get('patient_file')
 
@@ -51,10 +71,8 @@ def add_task(request):
                 os.makedirs(secure_dir)
 
             if patient_file:
-                enc_data = encrypt_file(patient_file.read())
-                enc_path = os.path.join(secure_dir, 'patient.enc')
-                with open(enc_path, 'wb') as f:
-                    f.write(enc_data)
+                # 边读上传块边加密，大体积 DICOM/PDF 也不会整体读入内存
+                encrypt_upload(patient_file, os.path.join(secure_dir, 'patient.enc'))
                 task.patient_file_path = os.path.join('secure_data', task.code, 'patient.enc')
 
             # 2. 保存原始视频
@@ -66,16 +84,12 @@ def add_task(request):
             task.source_video_path = os.path.join('secure_data', task.code, f'source{video_ext}')
             task.save()
 
-            # 3. 启动异步线程执行抽帧
-            public_images_dir = os.path.join(settings.MEDIA_ROOT, 'upload', 'images', task.code)
-            if not os.path.exists(public_images_dir):
-                os.makedirs(public_images_dir)
-            
-            thread = threading.Thread(
-                target=process_video_thread,
-                args=(task.id, video_path, public_images_dir, 1)
+            # 3. 投递到视频处理队列，由 run_video_worker 后台进程抽帧
+            dedup_distance = getattr(settings, 'VIDEO_DEDUP_DISTANCE', 5) if dedup else None
+            enqueue_video_job(
+                task, extract_fps=1, dedup_distance=dedup_distance,
+                sample_mode=sample_mode, min_fps=min_fps, max_fps=max_fps, profile=profile
             )
-            thread.start()
 
             # 记录日志
             log_operation(
@@ -91,69 +105,11 @@ def add_task(request):
         except Exception as e:
             messages.error(request, f"创建失败: {str(e)}")
     
-    return render(request, 'hospital/add_task.html')
-
-def process_video_thread(task_id, video_abs_path, output_dir, extract_fps=1):
-    """
-    线程安全的视频处理函数
-    """
-    try:
-        connection.close() 
-        task = LabelTask.objects.get(id=task_id)
-        process_video_logic(task, video_abs_path, output_dir, extract_fps)
-    except Exception as e:
-        print(f"线程异常: {e}")
-    finally:
-        connection.close()
-
-def process_video_logic(task, video_abs_path, output_dir, extract_fps=1):
-    """
-    原有的处理逻辑
-    """
-    try:
-        cap = cv2.VideoCapture(video_abs_path)
-        if not cap.isOpened():
-            task.state = STATUS_ERROR
-            task.save()
-            return
-
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        if video_fps <= 0: video_fps = 30
-        
-        extract_interval = int(round(video_fps / extract_fps))
-        
-        frame_count = 0
-        saved_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret: break
-
-            if frame_count % extract_interval == 0:
-                file_name = f"img_{saved_count:05d}.jpg"
-                save_path = os.path.join(output_dir, file_name)
-                cv2.imwrite(save_path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-
-                SampleImage.objects.create(
-                    task=task,
-                    code=gen_random_code("SP", 4),
-                    file_path=f"upload/images/{task.code}/{file_name}",
-                    original_name=file_name
-                )
-                saved_count += 1
-            frame_count += 1
-        
-        cap.release()
-        
-        task.sample_count = saved_count
-        task.state = STATUS_READY
-        task.save()
-        print(f"✅ 任务 {task.code} 后台处理完成，生成 {saved_count} 张图片")
-
-    except Exception as e:
-        print(f"❌ 视频处理异常: {e}")
-        task.state = STATUS_ERROR
-        task.save()
+    return render(request, 'hospital/add_task.html', {
+        'profiles': ExtractProfile.objects.all(),
+        'adaptive_min_fps': settings.VIDEO_ADAPTIVE_MIN_FPS,
+        'adaptive_max_fps': settings.VIDEO_ADAPTIVE_MAX_FPS,
+    })
 
 @never_cache
 @hospital_required
@@ -161,17 +117,10 @@ def index(request):
     """
     A端任务列表
     """
-    # 1. 获取所有任务（倒序）
+    # 1. 获取所有任务（倒序）；进度由 LabelTask.progress 按计数字段算出，不用先遍历全部任务
     task_list = LabelTask.objects.all().order_by('-id')
-    
-    # 2. 计算每个任务的进度（为了在卡片上显示进度条）
-    for task in task_list:
-        if task.sample_count > 0:
-            task.progress = int((task.labeled_count / task.sample_count) * 100)
-        else:
-            task.progress = 0
 
-    # 3. 分页处理：每页 12 个任务
+    # 2. 分页处理：每页 12 个任务
     paginator = Paginator(task_list, 12)
     page = request.GET.get('page')
     
@@ -184,6 +133,63 @@ def index(request):
 
     return render(request, 'hospital/task_list.html', {'tasks': tasks})
 
+@never_cache
+@hospital_required
+def task_progress_api(request):
+    """
+    批量查询抽帧进度: GET ?ids=1,2,3
+    进度来自缓存；缓存里没有的任务 (尚未开始或早已完成) 再用一条 id__in 查询补上状态
+    """
+    try:
+        task_ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip()][:100]
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'ids 参数格式错误'}, status=400)
+
+    progress = get_progress_many(task_ids)
+    missing = [i for i in task_ids if i not in progress]
+    if missing:
+        for row in LabelTask.objects.filter(id__in=missing).values('id', 'state', 'sample_count'):
+            progress[row['id']] = {
+                'state': row['state'],
+                'saved': row['sample_count'],
+                'total': None,
+                'percent': None,
+                'eta': None,
+            }
+
+    return JsonResponse({'status': 'ok', 'tasks': {str(k): v for k, v in progress.items()}})
+
+@never_cache
+@hospital_required
+def download_patient_file(request, task_id):
+    """
+    解密下载病例文件：逐块解密后流式返回，不在内存或磁盘上留下完整明文
+    """
+    task = get_object_or_404(LabelTask, id=task_id)
+    if not task.patient_file_path:
+        raise Http404("该任务没有上传病例")
+    enc_path = os.path.join(settings.MEDIA_ROOT, task.patient_file_path)
+    if not os.path.exists(enc_path):
+        raise Http404("病例文件不存在")
+
+    # 先解出第一块：密钥不对或文件损坏时直接报错，而不是返回一个半截文件
+    chunks = decrypt_stream(enc_path)
+    try:
+        first = next(chunks, b'')
+    except DecryptError as e:
+        messages.error(request, f"病例解密失败: {e}")
+        return redirect('hospital:index')
+
+    def stream():
+        yield first
+        yield from chunks
+
+    log_operation(request, action="下载病例", target=task.name, details=f"任务 {task.code}")
+    file_name = read_encrypted_name(enc_path) or f"{task.code}_patient"
+    response = StreamingHttpResponse(stream(), content_type='application/octet-stream')
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(file_name)}"
+    return response
+
 # ==========================================
 #  ✅ 新增：审核功能相关视图
 # ==========================================
@@ -214,9 +220,9 @@ def audit_workspace(request, task_id):
         if not sample:
             return JsonResponse({'status': 'empty', 'msg': '暂无样本'})
 
-        # 获取上一张/下一张 ID (方便切换)
-        prev_obj = SampleImage.objects.filter(task=task, id__lt=sample.id).order_by('-id').first()
-        next_obj = SampleImage.objects.filter(task=task, id__gt=sample.id).order_by('id').first()
+        # 前后若干张一次查出 (胶片条只加载小缩略图)，顺带得到上一张/下一张 ID
+        window = neighbor_window(sample.id, FILMSTRIP_SIDE, task_id=task.id)
+        prev_id, next_id = window_links(window, sample.id)
 
         # 解析标注数据
         annotations = []
@@ -230,16 +236,19 @@ def audit_workspace(request, task_id):
             'status': 'ok',
             'sample': {
                 'id': sample.id,
-                'url': f"/media/{sample.file_path}",
+                'url': sample.image_url,
                 'name': sample.original_name,
                 'is_labeled': sample.is_labeled,
+                # 顶点可能是紧凑编码 (pc 字段)，前端按 size 解码
                 'annotations': annotations,
+                'size': [sample.width, sample.height],
                 # 审核相关
                 'audit_status': sample.audit_status,
                 'audit_reason': sample.audit_reason or ''
             },
-            'prev_id': prev_obj.id if prev_obj else None,
-            'next_id': next_obj.id if next_obj else None
+            'prev_id': prev_id,
+            'next_id': next_id,
+            'strip': [window_item(s) for s in window]
         })
 
     # === 普通页面加载 ===
@@ -251,7 +260,8 @@ def audit_workspace(request, task_id):
     ]
     return render(request, 'hospital/audit.html', {
         'task': task, 
-        'label_config': label_config
+        'label_config': label_config,
+        'geometry_grid': GRID,
     })
 
 @csrf_exempt
@@ -267,10 +277,19 @@ def save_audit_result(request):
             status = int(data.get('status')) # 1:通过, 2:驳回
             reason = data.get('reason', '')
 
-            sample = get_object_or_404(SampleImage, id=sample_id)
-            sample.audit_status = status
-            sample.audit_reason = reason
-            sample.save()
+            if status not in (AUDIT_APPROVED, AUDIT_REJECTED):
+                raise ValueError("审核状态不正确")
+
+            with transaction.atomic():
+                sample = get_object_or_404(SampleImage.objects.select_for_update(), id=sample_id)
+                before = sample_state(sample)
+                sample.audit_status = status
+                sample.audit_reason = reason
+                # 驳回时间用于判断原标注员的优先返工期 (见 apps/labeler/leasing.py)
+                sample.audited_at = timezone.now()
+                sample.save(update_fields=['audit_status', 'audit_reason', 'audited_at'])
+                # 审核计数按状态变化增减
+                record_transition(sample.task_id, before, sample_state(sample))
             
             return JsonResponse({'status': 'ok'})
         except Exception as e:
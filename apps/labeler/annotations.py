@@ -0,0 +1,239 @@
+# apps/labeler/annotations.py
+"""
+标注保存：整份保存、增量补丁、批量提交共用同一套逻辑
+
+批量接口把多张图片的标注放在一个请求、一个事务里处理：
+一条 SELECT ... FOR UPDATE 锁住全部样本，一条 bulk_update 写回，计数器按任务合并后各一条 UPDATE；
+结构化图形表 (AnnotationShape) 在同一事务里整体重写。
+
+增量补丁：每个图形带稳定的 id，前端只提交 add / modify / delete 操作和编辑起点的 annotation_version，
+服务端在行锁内核对版本，一致才应用并把版本 +1；版本落后说明期间有人保存过，整条补丁拒绝并返回最新数据，
+避免并发保存互相覆盖。
+
+写库时顶点坐标按 geometry 模块做紧凑编码；补丁在解码后的坐标上应用，前端拿到的是编码后的数据，自行解码。
+
+保存即完成：释放保存人自己的领取 (见 leasing 模块)、清空跟踪传播的预标注草稿 (见 propagation 模块)；
+被驳回的样本返工后回到「待审核」，重新进入医生的审核队列。
+"""
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.counters import (
+    sample_state, counter_deltas, merge_deltas, apply_counter_deltas, AUDIT_PENDING, AUDIT_REJECTED,
+)
+from apps.core.models import SampleImage
+from apps.labeler.geometry import compact_enabled, compact_shapes, expand_shapes
+from apps.labeler.shapes import sync_shapes
+
+# 单次批量保存的最大样本数
+MAX_BATCH_ITEMS = 200
+# 单个补丁的最大操作数
+MAX_PATCH_OPS = 500
+MAX_SHAPE_ID_LENGTH = 64
+
+SAVE_FIELDS = [
+    'annotation_content', 'annotation_version', 'is_labeled', 'labeled_by', 'labeled_at',
+    'audit_status', 'lease_owner', 'lease_expires_at', 'draft_content', 'draft_source_id',
+]
+# _save 需要读取的字段
+LOCK_FIELDS = (
+    'id', 'task_id', 'is_labeled', 'audit_status', 'annotation_version', 'width', 'height',
+    'lease_owner', 'lease_expires_at',
+)
+
+
+class PatchError(ValueError):
+    pass
+
+
+def ensure_shape_ids(annotations):
+    """旧数据里的图形没有 id：按位置补上 s0, s1 ... (同一份数据每次补出的 id 相同，读和写都能对上)"""
+    for index, shape in enumerate(annotations):
+        if isinstance(shape, dict) and not shape.get('id'):
+            shape['id'] = f"s{index}"
+    return annotations
+
+
+def load_annotations(annotation_content, width=None, height=None):
+    """
+    解析样本的标注内容，返回带 id 的图形列表；内容损坏时返回空列表
+    给出宽高时把紧凑编码的顶点解码为 points，否则保持存储格式 (由前端解码)
+    """
+    if not annotation_content:
+        return []
+    try:
+        data = json.loads(annotation_content)
+    except ValueError:
+        return []
+    if not isinstance(data, list):
+        return []
+    return ensure_shape_ids(expand_shapes(data, width, height))
+
+
+def dump_annotations(annotations, width, height):
+    """图形列表 -> 存库文本 (开启紧凑编码且样本有尺寸时编码顶点)"""
+    annotations = ensure_shape_ids(annotations)
+    if compact_enabled():
+        annotations = compact_shapes(annotations, width, height)
+    return json.dumps(annotations, ensure_ascii=False, separators=(',', ':'))
+
+
+def _check_shape(shape, shape_id=None):
+    if not isinstance(shape, dict):
+        raise PatchError('shape 必须是对象')
+    shape_id = shape_id or shape.get('id')
+    if not isinstance(shape_id, str) or not shape_id or len(shape_id) > MAX_SHAPE_ID_LENGTH:
+        raise PatchError('图形 id 无效')
+    if 'points' in shape and not isinstance(shape['points'], list):
+        raise PatchError('points 必须是数组')
+    return shape_id
+
+
+def apply_ops(annotations, ops):
+    """
+    在 annotations 上依次执行补丁操作，返回新的图形列表 (保持原有顺序，新增的追加在末尾)
+        {"op": "add", "shape": {"id": "c1", "label": "3", "points": [...]}}
+        {"op": "modify", "id": "c1", "shape": {"points": [...]}}   只覆盖给出的字段
+        {"op": "delete", "id": "c1"}
+    任一操作不合法时抛出 PatchError，整条补丁都不生效
+    """
+    if not isinstance(ops, list) or len(ops) > MAX_PATCH_OPS:
+        raise PatchError(f'ops 必须是数组且不超过 {MAX_PATCH_OPS} 条')
+    shapes = {shape['id']: shape for shape in annotations if isinstance(shape, dict)}
+    for op in ops:
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind == 'add':
+            shape_id = _check_shape(op.get('shape'))
+            if shape_id in shapes:
+                raise PatchError(f'图形 {shape_id} 已存在')
+            shapes[shape_id] = op['shape']
+        elif kind == 'modify':
+            shape_id = op.get('id')
+            if shape_id not in shapes:
+                raise PatchError(f'图形 {shape_id} 不存在')
+            _check_shape(op.get('shape'), shape_id)
+            # 前端提交的 shape 通常带着自己的 id，以 op 里的 id 为准
+            fields = {key: value for key, value in op['shape'].items() if key != 'id'}
+            shapes[shape_id] = {**shapes[shape_id], **fields, 'id': shape_id}
+        elif kind == 'delete':
+            if shapes.pop(op.get('id'), None) is None:
+                raise PatchError(f"图形 {op.get('id')} 不存在")
+        else:
+            raise PatchError(f'未知的操作: {kind}')
+    return list(shapes.values())
+
+
+def _ok(sample):
+    return {'status': 'ok', 'version': sample.annotation_version}
+
+
+def _error(msg):
+    return {'status': 'error', 'msg': msg}
+
+
+def _conflict(sample):
+    """版本冲突：回传服务端当前版本与标注，前端据此重新载入"""
+    return {
+        'status': 'conflict',
+        'msg': '该图片已被其他人修改',
+        'version': sample.annotation_version,
+        'annotations': load_annotations(sample.annotation_content, sample.width, sample.height),
+    }
+
+
+def apply_save_state(sample, username, now, release_lease=False):
+    """
+    标注写入后样本的状态变化 (保存与导入共用)，返回计数器增量：
+    版本 +1、标记已标注；被驳回的回到「待审核」；清空预标注草稿；
+    释放保存人自己的领取 (release_lease=True 时不论领取人一律释放)
+    """
+    before = sample_state(sample)
+    sample.annotation_version += 1
+    sample.is_labeled = True
+    sample.labeled_by = username
+    sample.labeled_at = now
+    if sample.audit_status == AUDIT_REJECTED:
+        sample.audit_status = AUDIT_PENDING
+    if release_lease or sample.lease_owner == username:
+        sample.lease_owner = sample.lease_expires_at = None
+    # 保存即确认，预标注草稿不再需要
+    sample.draft_content = sample.draft_source_id = None
+    return counter_deltas(before, sample_state(sample))
+
+
+def _save(samples, changes, username):
+    """
+    changes: {sample_id: change(sample)}，change 返回新的图形列表，或返回结果 dict 表示不写入
+    在一个事务里锁行、应用、写回，返回 {sample_id: 结果}
+    """
+    results = {}
+    now = timezone.now()
+    with transaction.atomic():
+        found = {sample.id: sample for sample in samples.select_for_update().filter(id__in=list(changes))}
+        deltas_by_task = {}
+        changed = []
+        for sample_id, change in changes.items():
+            sample = found.get(sample_id)
+            if sample is None:
+                results[sample_id] = _error('样本不存在')
+                continue
+            annotations = change(sample)
+            if isinstance(annotations, dict):
+                results[sample_id] = annotations
+                continue
+            sample.annotation_content = dump_annotations(annotations, sample.width, sample.height)
+            merge_deltas(deltas_by_task.setdefault(sample.task_id, {}), apply_save_state(sample, username, now))
+            changed.append(sample)
+            results[sample_id] = _ok(sample)
+
+        if changed:
+            SampleImage.objects.bulk_update(changed, SAVE_FIELDS)
+            sync_shapes(
+                (sample.id, sample.task_id, sample.annotation_content, sample.width, sample.height) for sample in changed
+            )
+        # 仅在「未标注 -> 已标注」时计数 +1；每个任务一条 UPDATE
+        for task_id, deltas in deltas_by_task.items():
+            apply_counter_deltas(task_id, deltas)
+    return results
+
+
+def save_annotations(entries, username):
+    """
+    整份保存
+    entries: {sample_id: annotations(list)}
+    返回 {sample_id: {'status': 'ok', 'version': n} 或 {'status': 'error', 'msg': ...}}，出错的样本不影响其他样本
+    """
+    results = {}
+    changes = {}
+    for sample_id, annotations in entries.items():
+        if not isinstance(annotations, list):
+            results[sample_id] = _error('annotations 必须是数组')
+        else:
+            changes[sample_id] = lambda sample, annotations=annotations: annotations
+    results.update(_save(SampleImage.objects.only(*LOCK_FIELDS), changes, username))
+    return results
+
+
+def save_patches(patches, username):
+    """
+    增量保存
+    patches: {sample_id: (编辑起点的 version, ops)}
+    返回 {sample_id: 结果}；版本不一致时结果为 {'status': 'conflict', 'version': 当前版本, 'annotations': [...]}
+    """
+    def make_change(version, ops):
+        def change(sample):
+            if sample.annotation_version != version:
+                return _conflict(sample)
+            try:
+                return apply_ops(load_annotations(sample.annotation_content, sample.width, sample.height), ops)
+            except PatchError as e:
+                return _error(str(e))
+            except (TypeError, ValueError, KeyError, AttributeError):
+                # 格式不对的补丁只影响这一张图片
+                return _error('补丁格式错误')
+        return change
+
+    changes = {sample_id: make_change(version, ops) for sample_id, (version, ops) in patches.items()}
+    return _save(SampleImage.objects.only(*LOCK_FIELDS, 'annotation_content'), changes, username)
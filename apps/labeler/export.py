@@ -0,0 +1,373 @@
+# apps/labeler/export.py
+"""
+数据集导出：边打包边输出的 ZIP 流
+
+zipfile 写入不可 seek 的流时会使用 data descriptor，不需要回头改写文件头，
+因此可以把 ZipFile 的输出直接接到 StreamingHttpResponse 上，第一个字节立刻发出，
+内存中只保留一个读块大小的数据。
+JPEG/PNG/WebP 本身已经压缩，用 ZIP_STORED 原样存储，省掉无意义的 deflate 开销。
+
+训练格式导出 (YOLO / COCO / Pascal VOC)：按 id 顺序用 .iterator() 分块读取样本，
+图片与标注文件一边生成一边写进 ZIP 流，内存占用与任务规模无关；
+COCO 的 instances.json 要等所有样本处理完才能写出，images / annotations 两个数组先逐条写到临时文件，最后拼成一个文件放进 ZIP。
+
+导出缓存：图片包只含图片，打包结果按「任务 + 内容版本 (LabelTask.content_version)」存到 EXPORT_CACHE_DIR；
+内容版本只在图片集变化 (入库/重新抽帧) 时递增，保存标注、审核不会使缓存失效。
+缓存由 python manage.py build_exports (定时执行) 统一构建，同一任务同一时间只有一个进程在构建，写入新版本后删除旧版本；
+下载时缓存缺失或已过期就直接边打包边发送，不在 Web 进程里另起构建。删除任务时一并删除其缓存 (remove_task_exports)。
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from xml.etree import ElementTree as ET
+
+import cv2
+from django.conf import settings
+
+from apps.core.counters import AUDIT_APPROVED
+from apps.core.models import SampleImage
+from apps.labeler.labels import LABEL_CONFIG, LABEL_CODES, label_name
+from apps.labeler.shapes import parse_shapes, polygon_bbox, polygon_area
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg', '.webp')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer:
+    """ZipFile 的输出目标：只记录写入的数据，由生成器取走"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        if data:
+            self.chunks.append(bytes(data))
+            self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def stream_zip(entries):
+    """
+    entries: 可迭代的 (arcname, 内容)，内容为本地文件路径 (str) 或 bytes
+    产出 ZIP 文件的字节块
+    """
+    buf = _StreamBuffer()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for arcname, content in entries:
+            if isinstance(content, bytes):
+                # 标注等文本内容压缩效果好，单独用 deflate
+                zf.writestr(arcname, content, compress_type=zipfile.ZIP_DEFLATED)
+            else:
+                info = zipfile.ZipInfo.from_file(content, arcname)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(content, 'rb') as src, zf.open(info, 'w') as dst:
+                    while True:
+                        chunk = src.read(READ_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield from buf.drain()
+            yield from buf.drain()
+    # 关闭时写出中央目录
+    yield from buf.drain()
+
+
+def iter_task_images(images_dir):
+    """按文件名顺序列出任务目录下的图片，产出 (arcname, 路径)"""
+    if not os.path.exists(images_dir):
+        return
+    for root, dirs, files in os.walk(images_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                yield file, os.path.join(root, file)
+
+
+# 超过该时间仍未完成的构建视为已中断，允许重新构建
+BUILD_LOCK_SECONDS = 3600
+
+
+def export_cache_dir():
+    return getattr(settings, 'EXPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'exports'))
+
+
+def task_export_entries(task):
+    images_dir = os.path.join(settings.MEDIA_ROOT, 'upload', 'images', task.code)
+    return iter_task_images(images_dir)
+
+
+def export_cache_path(task):
+    return os.path.join(export_cache_dir(), f"{task.code}_v{task.content_version}.zip")
+
+
+def export_lock_path(task):
+    """构建锁按任务加 (不区分版本)，同一任务的新旧版本也不会同时构建"""
+    return os.path.join(export_cache_dir(), f"{task.code}.lock")
+
+
+def get_cached_export(task):
+    """当前内容版本的缓存包存在时返回路径，否则返回 None"""
+    path = export_cache_path(task)
+    return path if os.path.exists(path) else None
+
+
+def remove_task_exports(task, keep=None):
+    """删除任务的缓存包 (keep 为要保留的路径)"""
+    cache_dir = export_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return
+    prefix = f"{task.code}_v"
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and name.endswith('.zip') and path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _acquire_build_lock(lock_path):
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            stale = time.time() - os.path.getmtime(lock_path) > BUILD_LOCK_SECONDS
+        except FileNotFoundError:
+            stale = True
+        if not stale:
+            return False
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        return _acquire_build_lock(lock_path)
+    os.close(fd)
+    return True
+
+
+def build_task_export(task):
+    """
+    打包当前版本并写入缓存，完成后删除该任务的旧版本
+    其他进程正在构建该任务时直接返回 None
+    """
+    cache_dir = export_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = export_cache_path(task)
+    if os.path.exists(path):
+        return path
+    lock_path = export_lock_path(task)
+    if not _acquire_build_lock(lock_path):
+        return None
+    # 拿到锁之前可能刚有进程构建完
+    if os.path.exists(path):
+        os.remove(lock_path)
+        return path
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in stream_zip(task_export_entries(task)):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        remove_task_exports(task, keep=path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        os.remove(lock_path)
+    return path
+
+
+# ==========================================
+#  训练格式导出
+# ==========================================
+FORMAT_YOLO = 'yolo'
+FORMAT_COCO = 'coco'
+FORMAT_VOC = 'voc'
+EXPORT_FORMATS = (FORMAT_YOLO, FORMAT_COCO, FORMAT_VOC)
+
+
+def iter_export_samples(task_ids, approved_only=False, chunk_size=500):
+    qs = (SampleImage.objects
+          .filter(task_id__in=task_ids)
+          .select_related('task')
+          .only('id', 'file_path', 'original_name', 'annotation_content', 'width', 'height', 'task__code')
+          .order_by('task_id', 'id'))
+    if approved_only:
+        qs = qs.filter(audit_status=AUDIT_APPROVED)
+    return qs.iterator(chunk_size=chunk_size)
+
+
+class _ExportSample:
+    """导出时用到的样本信息：本地路径、ZIP 内文件名、尺寸、图形"""
+
+    def __init__(self, sample, path, width, height):
+        self.id = sample.id
+        self.path = path
+        # 多任务合并导出时加上任务编号前缀，避免 img_00000.jpg 重名
+        self.file_name = f"{sample.task.code}_{sample.original_name}"
+        self.stem = os.path.splitext(self.file_name)[0]
+        self.width = width
+        self.height = height
+        self.shapes = parse_shapes(sample.annotation_content, sample.width, sample.height)
+
+
+def _iter_prepared(samples):
+    """补全图片尺寸并跳过原图缺失的样本；旧数据没有记录尺寸时每个任务只读一次图片"""
+    size_by_task = {}
+    for sample in samples:
+        path = os.path.join(settings.MEDIA_ROOT, sample.file_path)
+        if not os.path.exists(path):
+            continue
+        width, height = sample.width, sample.height
+        if not width or not height:
+            if sample.task_id not in size_by_task:
+                image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+                size_by_task[sample.task_id] = image.shape[1::-1] if image is not None else (None, None)
+            width, height = size_by_task[sample.task_id]
+            if not width:
+                continue
+        yield _ExportSample(sample, path, width, height)
+
+
+def _clamp(value, low, high):
+    return min(max(value, low), high)
+
+
+def _yolo_entries(samples):
+    names = [label_name(item) for item in LABEL_CONFIG]
+    yield 'classes.txt', '\n'.join(names).encode('utf-8')
+    yaml_names = '\n'.join(f"  {i}: {name}" for i, name in enumerate(names))
+    yield 'data.yaml', f"path: .\ntrain: images\nval: images\nnames:\n{yaml_names}\n".encode('utf-8')
+    for item in samples:
+        lines = []
+        for label, points in item.shapes:
+            x1, y1, x2, y2 = polygon_bbox(points)
+            x1, x2 = _clamp(x1, 0, item.width), _clamp(x2, 0, item.width)
+            y1, y2 = _clamp(y1, 0, item.height), _clamp(y2, 0, item.height)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            lines.append(
+                f"{LABEL_CODES.index(label)} {(x1 + x2) / 2 / item.width:.6f} {(y1 + y2) / 2 / item.height:.6f} "
+                f"{(x2 - x1) / item.width:.6f} {(y2 - y1) / item.height:.6f}"
+            )
+        yield f"images/{item.file_name}", item.path
+        # 没有目标的图片也写一个空文件，作为负样本
+        yield f"labels/{item.stem}.txt", '\n'.join(lines).encode('utf-8')
+
+
+class _JsonArrayWriter:
+    """把 JSON 数组的元素逐条写进文件 (不含外层方括号)"""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def write(self, obj):
+        if self.count:
+            self.f.write(',')
+        self.f.write(json.dumps(obj, ensure_ascii=False))
+        self.count += 1
+
+
+def _coco_entries(samples):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images_path = os.path.join(tmp_dir, 'images.part')
+        annotations_path = os.path.join(tmp_dir, 'annotations.part')
+        with open(images_path, 'w', encoding='utf-8') as images_file, \
+                open(annotations_path, 'w', encoding='utf-8') as annotations_file:
+            images, annotations = _JsonArrayWriter(images_file), _JsonArrayWriter(annotations_file)
+            for item in samples:
+                images.write({'id': item.id, 'file_name': item.file_name, 'width': item.width, 'height': item.height})
+                for label, points in item.shapes:
+                    x1, y1, x2, y2 = polygon_bbox(points)
+                    annotations.write({
+                        'id': annotations.count + 1,
+                        'image_id': item.id,
+                        'category_id': LABEL_CODES.index(label) + 1,
+                        'segmentation': [[round(v, 2) for p in points for v in p]],
+                        'bbox': [round(x1, 2), round(y1, 2), round(x2 - x1, 2), round(y2 - y1, 2)],
+                        'area': round(polygon_area(points), 2),
+                        'iscrowd': 0,
+                    })
+                yield f"images/{item.file_name}", item.path
+
+        categories = [
+            {'id': i + 1, 'name': label_name(item), 'supercategory': 'anatomy'}
+            for i, item in enumerate(LABEL_CONFIG)
+        ]
+        json_path = os.path.join(tmp_dir, 'instances.json')
+        with open(json_path, 'w', encoding='utf-8') as out:
+            out.write('{"images":[')
+            with open(images_path, encoding='utf-8') as part:
+                shutil.copyfileobj(part, out)
+            out.write('],"annotations":[')
+            with open(annotations_path, encoding='utf-8') as part:
+                shutil.copyfileobj(part, out)
+            out.write('],"categories":')
+            out.write(json.dumps(categories, ensure_ascii=False))
+            out.write('}')
+        yield 'annotations/instances.json', json_path
+
+
+def _voc_xml(item):
+    root = ET.Element('annotation')
+    ET.SubElement(root, 'folder').text = 'JPEGImages'
+    ET.SubElement(root, 'filename').text = item.file_name
+    size = ET.SubElement(root, 'size')
+    ET.SubElement(size, 'width').text = str(item.width)
+    ET.SubElement(size, 'height').text = str(item.height)
+    ET.SubElement(size, 'depth').text = '3'
+    ET.SubElement(root, 'segmented').text = '0'
+    for label, points in item.shapes:
+        x1, y1, x2, y2 = polygon_bbox(points)
+        obj = ET.SubElement(root, 'object')
+        ET.SubElement(obj, 'name').text = label_name(LABEL_CONFIG[LABEL_CODES.index(label)])
+        ET.SubElement(obj, 'pose').text = 'Unspecified'
+        ET.SubElement(obj, 'truncated').text = '0'
+        ET.SubElement(obj, 'difficult').text = '0'
+        box = ET.SubElement(obj, 'bndbox')
+        # VOC 坐标从 1 开始
+        ET.SubElement(box, 'xmin').text = str(_clamp(int(round(x1)) + 1, 1, item.width))
+        ET.SubElement(box, 'ymin').text = str(_clamp(int(round(y1)) + 1, 1, item.height))
+        ET.SubElement(box, 'xmax').text = str(_clamp(int(round(x2)) + 1, 1, item.width))
+        ET.SubElement(box, 'ymax').text = str(_clamp(int(round(y2)) + 1, 1, item.height))
+    return ET.tostring(root, encoding='utf-8')
+
+
+def _voc_entries(samples):
+    stems = []
+    for item in samples:
+        stems.append(item.stem)
+        yield f"JPEGImages/{item.file_name}", item.path
+        yield f"Annotations/{item.stem}.xml", _voc_xml(item)
+    yield 'ImageSets/Main/trainval.txt', '\n'.join(stems).encode('utf-8')
+
+
+_FORMAT_WRITERS = {
+    FORMAT_YOLO: _yolo_entries,
+    FORMAT_COCO: _coco_entries,
+    FORMAT_VOC: _voc_entries,
+}
+
+
+def dataset_entries(fmt, task_ids, approved_only=False):
+    """
+    产出指定训练格式的 ZIP 条目 (arcname, 路径或 bytes)，交给 stream_zip 打包
+    approved_only: 只导出审核通过 (AUDIT_APPROVED) 的样本
+    """
+    if fmt not in _FORMAT_WRITERS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    return _FORMAT_WRITERS[fmt](_iter_prepared(iter_export_samples(task_ids, approved_only)))
@@ -0,0 +1,128 @@
+# apps/labeler/importer.py
+"""
+标注包批量导入
+
+原逻辑对 ZIP 里的每个文件执行一次 original_name__startswith 前缀查询 (无索引) 再单独 save()，
+N 个文件就是 2N 条 SQL。这里先用一条查询建立「文件名 -> 样本」索引，
+逐个读取 ZIP 条目 (不整体解压)，每攒满一批就 bulk_update，内存占用与标注包大小无关。
+"""
+import json
+import os
+import zipfile
+import zlib
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.counters import merge_deltas, apply_counter_deltas
+from apps.core.models import SampleImage
+from apps.labeler.annotations import apply_save_state, SAVE_FIELDS, LOCK_FIELDS
+from apps.labeler.geometry import compact_enabled, compact_content
+from apps.labeler.shapes import sync_shapes
+
+IMPORT_BATCH_SIZE = 500
+
+
+class ImportResult:
+    def __init__(self):
+        self.matched = 0
+        self.unmatched = []
+        self.failed = []
+
+    def as_dict(self):
+        return {
+            'matched': self.matched,
+            'unmatched': len(self.unmatched),
+            'failed': len(self.failed),
+            # 只回传前若干个文件名，方便排查
+            'unmatched_files': self.unmatched[:20],
+            'failed_files': self.failed[:20],
+        }
+
+    def summary(self):
+        return f"匹配 {self.matched} 个，未匹配 {len(self.unmatched)} 个，解析失败 {len(self.failed)} 个"
+
+
+def build_name_index(task):
+    """一次查询建立 {文件名主干: 样本 id}，如 img_00001 -> 123"""
+    rows = SampleImage.objects.filter(task=task).values_list('id', 'original_name')
+    return {os.path.splitext(name)[0]: sample_id for sample_id, name in rows}
+
+
+def _match(index, task, base_name):
+    sample_id = index.get(base_name)
+    if sample_id is None and base_name.startswith(f"{task.code}_"):
+        # 训练格式导出的文件名带任务编号前缀 (TKxxx_img_00001)
+        sample_id = index.get(base_name[len(task.code) + 1:])
+    return sample_id
+
+
+def _read_entry(zf, info):
+    """读取一个条目，返回标注文本；条目无法读取 (加密、不支持的压缩方式、数据损坏) 或内容无法解析时返回 None"""
+    try:
+        content = zf.read(info).decode('utf-8')
+    except (UnicodeDecodeError, zipfile.BadZipFile, ValueError, RuntimeError, NotImplementedError, zlib.error, EOFError):
+        return None
+    if info.filename.lower().endswith('.json'):
+        try:
+            json.loads(content)
+        except ValueError:
+            return None
+    return content
+
+
+def _write_batch(batch, username, now, deltas):
+    """
+    写入一批 {sample_id: 标注文本}：锁住样本，状态变化与在线保存一致 (见 annotations.apply_save_state)——
+    标注版本 +1，标注员手里基于旧版本的增量补丁会被拒绝；被驳回的回到待审核；清空草稿并释放领取。
+    JSON 标注按样本尺寸做紧凑编码；计数变化累加到 deltas
+    """
+    samples = list(SampleImage.objects.select_for_update().filter(id__in=list(batch)).only(*LOCK_FIELDS))
+    for sample in samples:
+        content = batch[sample.id]
+        if compact_enabled():
+            content = compact_content(content, sample.width, sample.height)
+        sample.annotation_content = content
+        merge_deltas(deltas, apply_save_state(sample, username, now, release_lease=True))
+    SampleImage.objects.bulk_update(samples, SAVE_FIELDS)
+    sync_shapes(
+        (sample.id, sample.task_id, sample.annotation_content, sample.width, sample.height) for sample in samples
+    )
+
+
+def import_annotations(task, zip_file, username):
+    """
+    导入标注包：按文件名 (去掉扩展名) 匹配本任务的样本，覆盖其标注内容
+    每攒满 IMPORT_BATCH_SIZE 个条目写入一批，内存中只保留当前这一批；整个导入在一个事务里，出错时全部回滚
+    返回 ImportResult；ZIP 本身损坏时抛出 zipfile.BadZipFile
+    """
+    result = ImportResult()
+    index = build_name_index(task)
+    now = timezone.now()
+    deltas = {}
+    batch = {}
+    with zipfile.ZipFile(zip_file, 'r') as zf, transaction.atomic():
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            base_name = os.path.splitext(os.path.basename(info.filename))[0]
+            if not base_name or base_name.startswith('.'):
+                continue
+            sample_id = _match(index, task, base_name)
+            if sample_id is None:
+                result.unmatched.append(info.filename)
+                continue
+            content = _read_entry(zf, info)
+            if content is None:
+                result.failed.append(info.filename)
+                continue
+            # 同一样本出现多次时以最后一个为准
+            batch[sample_id] = content
+            result.matched += 1
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _write_batch(batch, username, now, deltas)
+                batch = {}
+        if batch:
+            _write_batch(batch, username, now, deltas)
+        apply_counter_deltas(task.id, deltas)
+    return result
@@ -0,0 +1,25 @@
+# apps/labeler/labels.py
+"""
+标注类别配置 (标注工具、数据集导出共用)
+code 即标注数据里保存的 label 字段
+"""
+
+LABEL_CONFIG = [
+    {'code': '0', 'name_cn': '0 牙齿',   'name_en': '0 Teeth',        'color': '#E74C3C'},
+    {'code': '1', 'name_cn': '1 舌头',   'name_en': '1 Tongue',       'color': '#2ECC71'},
+    {'code': '2', 'name_cn': '2 悬雍垂', 'name_en': '2 Uvula',        'color': '#3498DB'},
+    {'code': '3', 'name_cn': '3 会厌',   'name_en': '3 Epiglottis',   'color': '#F1C40F'},
+    {'code': '4', 'name_cn': '4 声门-1', 'name_en': '4 Glottis-CL-1', 'color': '#9B59B6'},
+    {'code': '5', 'name_cn': '5 声门-2', 'name_en': '5 Glottis-CL-2', 'color': '#1ABC9C'},
+    {'code': '6', 'name_cn': '6 声门-3', 'name_en': '6 Glottis-CL-3', 'color': '#E67E22'},
+    {'code': '7', 'name_cn': '7 气管环', 'name_en': '7 Ring',         'color': '#34495E'},
+    {'code': '8', 'name_cn': '8 食道',   'name_en': '8 Esophagus',    'color': '#95A5A6'},
+]
+
+
+LABEL_CODES = [item['code'] for item in LABEL_CONFIG]
+
+
+def label_name(item):
+    """导出用的英文类别名：'3 Epiglottis' -> 'Epiglottis'"""
+    return item['name_en'].split(' ', 1)[-1]
@@ -0,0 +1,101 @@
+# apps/labeler/leasing.py
+"""
+标注领取 (租约)
+
+多人协作同一任务时，原来大家都从第一张图按 id 顺序往后翻，容易撞到同一张图互相覆盖。
+这里每个标注员按批领取样本：SELECT ... FOR UPDATE SKIP LOCKED 锁住候选行 (并发领取互不等待，也不会领到同一张)，
+写上领取人与到期时间；保存标注时释放，过期未完成的自动回到待领取池。
+
+领取顺序：
+1. 自己手上未完成的领取 (当前图片之后的优先)
+2. 自己被驳回、待返工的样本
+3. 未标注的样本
+4. 他人被驳回且超过优先返工期 (LABEL_REWORK_GRACE_SECONDS) 仍未返工的样本
+候选都走 (task, 条件, id) 索引按 id 顺序取前 N 条，不扫描整个任务。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.counters import AUDIT_REJECTED
+from apps.core.models import SampleImage
+
+DEFAULT_LEASE_CHUNK = 20
+DEFAULT_LEASE_SECONDS = 1800
+DEFAULT_REWORK_GRACE_SECONDS = 86400
+
+# 还需要标注员处理的样本：未标注，或被驳回待返工
+PENDING_WORK = Q(is_labeled=False) | Q(audit_status=AUDIT_REJECTED)
+
+
+def get_lease_chunk():
+    return max(int(getattr(settings, 'LABEL_LEASE_CHUNK', DEFAULT_LEASE_CHUNK)), 1)
+
+
+def get_lease_seconds():
+    return int(getattr(settings, 'LABEL_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+
+def get_rework_grace_seconds():
+    return int(getattr(settings, 'LABEL_REWORK_GRACE_SECONDS', DEFAULT_REWORK_GRACE_SECONDS))
+
+
+def _free(now):
+    return Q(lease_owner__isnull=True) | Q(lease_expires_at__lt=now)
+
+
+def _lease_chunk(task_id, username, now):
+    """按优先级从各候选池锁定并领取最多一批样本，返回 id 列表 (按领取优先级排列)；需在事务中调用"""
+    size = get_lease_chunk()
+    grace_cutoff = now - timedelta(seconds=get_rework_grace_seconds())
+    candidates = SampleImage.objects.select_for_update(skip_locked=True).filter(task_id=task_id).filter(_free(now))
+    pools = [
+        candidates.filter(audit_status=AUDIT_REJECTED, labeled_by=username),
+        candidates.filter(is_labeled=False),
+        candidates.filter(audit_status=AUDIT_REJECTED, audited_at__lt=grace_cutoff).exclude(labeled_by=username),
+    ]
+    ids = []
+    for pool in pools:
+        if len(ids) >= size:
+            break
+        ids += list(pool.exclude(id__in=ids).order_by('id').values_list('id', flat=True)[:size - len(ids)])
+    if ids:
+        SampleImage.objects.filter(id__in=ids).update(
+            lease_owner=username, lease_expires_at=now + timedelta(seconds=get_lease_seconds())
+        )
+    return ids
+
+
+def next_sample(task_id, username, after=None):
+    """
+    返回分给 username 的下一张样本 id，任务里已没有可领取的样本时返回 None
+    after: 当前所在样本 id；手上的领取都处理完 (或只剩当前这张) 才领新的一批
+    每次调用顺带给手上未完成的领取续期
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        mine = (SampleImage.objects
+                .filter(task_id=task_id, lease_owner=username, lease_expires_at__gte=now)
+                .filter(PENDING_WORK)
+                .order_by('id'))
+        sample_id = None
+        if after:
+            sample_id = mine.filter(id__gt=after).values_list('id', flat=True).first()
+        if sample_id is None:
+            sample_id = mine.exclude(id=after or 0).values_list('id', flat=True).first()
+        if sample_id is not None:
+            mine.update(lease_expires_at=now + timedelta(seconds=get_lease_seconds()))
+            return sample_id
+        ids = _lease_chunk(task_id, username, now)
+    return ids[0] if ids else None
+
+
+def active_lease_owner(sample, now=None):
+    """样本当前的领取人 (已过期视为无人领取)"""
+    now = now or timezone.now()
+    if sample.lease_owner and sample.lease_expires_at and sample.lease_expires_at >= now:
+        return sample.lease_owner
+    return None
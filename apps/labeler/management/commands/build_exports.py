@@ -0,0 +1,35 @@
+# apps/labeler/management/commands/build_exports.py
+from django.core.management.base import BaseCommand
+
+from apps.core.models import LabelTask, STATUS_READY
+from apps.labeler.export import build_task_export, get_cached_export
+
+
+class Command(BaseCommand):
+    """
+    预先打包数据集导出缓存 (可配合 cron 定期执行)，已是最新版本的任务会跳过
+
+    用法: python manage.py build_exports [--task TK2025...]
+    """
+    help = '为就绪任务重建过期的数据集导出缓存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', help='只处理指定任务编号')
+
+    def handle(self, *args, **options):
+        tasks = LabelTask.objects.filter(state=STATUS_READY).order_by('id')
+        if options['task']:
+            tasks = tasks.filter(code=options['task'])
+
+        built = skipped = 0
+        for task in tasks.iterator():
+            if get_cached_export(task):
+                skipped += 1
+                continue
+            path = build_task_export(task)
+            if path:
+                built += 1
+                self.stdout.write(f"已打包 {task.code} -> {path}")
+            else:
+                self.stdout.write(f"{task.code} 正在由其他进程打包，跳过")
+        self.stdout.write(self.style.SUCCESS(f"✅ 新打包 {built} 个任务，{skipped} 个已是最新"))
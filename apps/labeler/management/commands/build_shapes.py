@@ -0,0 +1,39 @@
+# apps/labeler/management/commands/build_shapes.py
+from django.db import transaction
+from django.core.management.base import BaseCommand
+
+from apps.core.models import SampleImage
+from apps.labeler.shapes import sync_shapes
+
+
+class Command(BaseCommand):
+    """
+    从 annotation_content 回填结构化图形表 (AnnotationShape)，已存在的图形会被重写，可重复执行
+
+    用法: python manage.py build_shapes [--task TK2025...] [--batch-size 500]
+    """
+    help = '解析已有标注数据，回填结构化图形表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', help='只处理指定任务编号')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的样本数')
+
+    def handle(self, *args, **options):
+        samples = SampleImage.objects.filter(is_labeled=True).order_by('id')
+        if options['task']:
+            samples = samples.filter(task__code=options['task'])
+        batch_size = max(options['batch_size'], 1)
+
+        # 按 id 分批推进，每批一个事务
+        last_id = 0
+        sample_total = shape_total = 0
+        while True:
+            batch = list(samples.filter(id__gt=last_id).values_list('id', 'task_id', 'annotation_content', 'width', 'height')[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                shape_total += sync_shapes(batch)
+            sample_total += len(batch)
+            last_id = batch[-1][0]
+            self.stdout.write(f"已处理 {sample_total} 个样本，{shape_total} 个图形")
+        self.stdout.write(self.style.SUCCESS(f"✅ 回填完成：{sample_total} 个样本，{shape_total} 个图形"))
@@ -0,0 +1,33 @@
+# apps/labeler/management/commands/export_dataset.py
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import LabelTask
+from apps.labeler.export import stream_zip, dataset_entries, EXPORT_FORMATS
+
+
+class Command(BaseCommand):
+    """
+    导出训练格式数据集到本地 ZIP (替代离线转换脚本)
+
+    用法: python manage.py export_dataset --format coco --tasks TK2025...,TK2025... --approved -o out.zip
+    """
+    help = '按 YOLO / COCO / VOC 格式导出一个或多个任务的图片与标注'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', required=True, choices=EXPORT_FORMATS, help='导出格式')
+        parser.add_argument('--tasks', required=True, help='任务编号，逗号分隔')
+        parser.add_argument('--approved', action='store_true', help='只导出审核通过的样本')
+        parser.add_argument('-o', '--output', required=True, help='输出 ZIP 文件路径')
+
+    def handle(self, *args, **options):
+        codes = [c.strip() for c in options['tasks'].split(',') if c.strip()]
+        task_ids = list(LabelTask.objects.filter(code__in=codes).values_list('id', flat=True))
+        if len(task_ids) != len(set(codes)):
+            raise CommandError("部分任务编号不存在")
+
+        size = 0
+        with open(options['output'], 'wb') as f:
+            for chunk in stream_zip(dataset_entries(options['format'], task_ids, options['approved'])):
+                f.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"✅ 已导出 {options['output']} ({size / 1024 / 1024:.1f} MB)"))
@@ -0,0 +1,37 @@
+# apps/labeler/management/commands/propagate_annotations.py
+from django.core.management.base import BaseCommand
+
+from apps.core.models import LabelTask, STATUS_READY
+from apps.labeler.propagation import propagate_task
+
+
+class Command(BaseCommand):
+    """
+    把已标注帧的图形沿光流传播到后续未标注帧，生成预标注草稿；可重复执行，草稿会被覆盖
+
+    用法: python manage.py propagate_annotations [--task TK2025...] [--frames 5] [--workers 4]
+    """
+    help = '按任务批量生成跟踪传播的预标注草稿'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', help='只处理指定任务编号')
+        parser.add_argument('--frames', type=int, help='每个已标注帧向后传播的帧数 (默认取 ANNOTATION_PROPAGATION_FRAMES)')
+        parser.add_argument('--workers', type=int, help='进程数 (默认取 ANNOTATION_PROPAGATION_WORKERS，0/1 为单进程)')
+
+    def handle(self, *args, **options):
+        tasks = LabelTask.objects.filter(state=STATUS_READY).order_by('id')
+        if options['task']:
+            tasks = tasks.filter(code=options['task'])
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} 个片段")
+
+        sequence_total = draft_total = 0
+        for task in tasks.iterator():
+            sequences, drafts = propagate_task(
+                task.id, frames=options['frames'], workers=options['workers'], on_progress=progress
+            )
+            sequence_total += sequences
+            draft_total += drafts
+            self.stdout.write(f"{task.code}: {sequences} 个片段，{drafts} 张草稿")
+        self.stdout.write(self.style.SUCCESS(f"✅ 传播完成：{sequence_total} 个片段，{draft_total} 张草稿"))
@@ -0,0 +1,44 @@
+# apps/labeler/management/commands/reconcile_counters.py
+from django.core.management.base import BaseCommand
+
+from apps.core.counters import COUNTER_FIELDS, actual_counts
+from apps.core.models import LabelTask
+
+CHECKED_FIELDS = ('sample_count',) + COUNTER_FIELDS + ('first_sample_id',)
+
+
+class Command(BaseCommand):
+    """
+    校正任务计数器：按样本表重新统计，与 LabelTask 上的计数/首张样本 id 不一致时改正
+
+    用法: python manage.py reconcile_counters [--task TK2025...] [--dry-run]
+    """
+    help = '重新统计样本数/标注数/审核数，修正计数偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', help='只处理指定任务编号')
+        parser.add_argument('--dry-run', action='store_true', help='只报告偏差，不写库')
+
+    def handle(self, *args, **options):
+        tasks = LabelTask.objects.all()
+        if options['task']:
+            tasks = tasks.filter(code=options['task'])
+
+        actual = actual_counts(tasks)
+        fixed = 0
+        for task in tasks.only('id', 'code', *CHECKED_FIELDS).iterator():
+            counts = actual[task.id]
+            drift = {
+                field: counts[field] for field in CHECKED_FIELDS
+                if getattr(task, field) != counts[field]
+            }
+            if not drift:
+                continue
+            fixed += 1
+            detail = ', '.join(f"{field} {getattr(task, field)} -> {value}" for field, value in drift.items())
+            self.stdout.write(f"{task.code}: {detail}")
+            if not options['dry_run']:
+                LabelTask.objects.filter(id=task.id).update(**drift)
+
+        action = '发现' if options['dry_run'] else '已修正'
+        self.stdout.write(self.style.SUCCESS(f"✅ {action} {fixed} 个任务的计数偏差"))
@@ -0,0 +1,169 @@
+# apps/labeler/propagation.py
+"""
+标注跟踪传播 (预标注)
+
+相邻抽帧画面几乎一样，标注员却要在每一帧重画同样的结构。
+这里把已标注帧的图形沿光流带到后续 K 帧 (计算见 tracker 模块)，结果写入 SampleImage.draft_content 作为草稿：
+草稿不计入标注进度、不进图形表和导出；标注员打开图片时一键采用，微调后保存即确认，保存时清空草稿。
+
+整个任务批量处理时，以每个已标注帧为起点、到下一个已标注帧 (或 K 帧) 为止切成互不相关的片段，
+片段交给进程池并行计算 (子进程只读图片、不碰数据库)，主进程按批 bulk_update 写回。
+用法见 python manage.py propagate_annotations；标注页也可以从当前帧即时传播 (见 views.propagate_api)。
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.conf import settings
+
+from apps.core.models import SampleImage
+from apps.labeler.annotations import dump_annotations
+from apps.labeler.shapes import parse_shapes, shape_type
+from apps.labeler.tracker import track_sequence, DEFAULT_MAX_SIDE
+
+DEFAULT_PROPAGATION_FRAMES = 5
+# 标注页即时传播允许的最大帧数 (在请求里同步计算)
+MAX_PROPAGATION_FRAMES = 30
+DRAFT_BATCH_SIZE = 500
+
+DRAFT_FIELDS = ['draft_content', 'draft_source_id']
+
+
+def get_propagation_frames():
+    return max(int(getattr(settings, 'ANNOTATION_PROPAGATION_FRAMES', DEFAULT_PROPAGATION_FRAMES)), 1)
+
+
+def get_propagation_workers():
+    """批量传播的进程数，0/1 表示在当前进程里顺序计算"""
+    workers = getattr(settings, 'ANNOTATION_PROPAGATION_WORKERS', 0)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return int(workers)
+
+
+def get_max_side():
+    return int(getattr(settings, 'ANNOTATION_PROPAGATION_MAX_SIDE', DEFAULT_MAX_SIDE))
+
+
+def _image_path(file_path):
+    return os.path.join(settings.MEDIA_ROOT, file_path)
+
+
+def source_shapes(shapes):
+    """[(label, [(x, y), ...]), ...] -> 跟踪引擎的输入 [(label, is_rect, points), ...]"""
+    return [(label, shape_type(points) == 'rect', points) for label, points in shapes]
+
+
+def plan_sequences(task_id, frames):
+    """
+    按 id (即帧顺序) 扫描任务，返回 [(起点样本 id, [目标样本 id, ...], [图片路径, ...], 图形), ...]
+    目标是起点之后连续的未标注帧，遇到下一个已标注帧或满 frames 帧即止；每个未标注帧最多属于一个片段
+    """
+    sequences = []
+    current = None
+    rows = (SampleImage.objects.filter(task_id=task_id).order_by('id')
+            .values_list('id', 'file_path', 'is_labeled', 'annotation_content', 'width', 'height'))
+    for sample_id, file_path, is_labeled, content, width, height in rows.iterator():
+        if is_labeled:
+            shapes = parse_shapes(content, width, height)
+            current = (sample_id, [], [_image_path(file_path)], source_shapes(shapes)) if shapes else None
+            if current:
+                sequences.append(current)
+        elif current and len(current[1]) < frames:
+            current[1].append(sample_id)
+            current[2].append(_image_path(file_path))
+        else:
+            current = None
+    return [sequence for sequence in sequences if sequence[1]]
+
+
+def write_drafts(drafts):
+    """
+    drafts: [(起点样本 id, 目标样本 id, [(label, points), ...]), ...]
+    写入期间已被标注的样本跳过，返回写入的草稿数
+    """
+    if not drafts:
+        return 0
+    target_ids = [target_id for _, target_id, _ in drafts]
+    samples = {
+        sample.id: sample
+        for sample in SampleImage.objects.filter(id__in=target_ids, is_labeled=False).only('id', 'width', 'height')
+    }
+    changed = []
+    for source_id, target_id, shapes in drafts:
+        sample = samples.get(target_id)
+        if sample is None:
+            continue
+        annotations = [
+            {'id': f"d{index}", 'label': label, 'points': [{'x': x, 'y': y} for x, y in points]}
+            for index, (label, points) in enumerate(shapes)
+        ]
+        sample.draft_content = dump_annotations(annotations, sample.width, sample.height)
+        sample.draft_source_id = source_id
+        changed.append(sample)
+    SampleImage.objects.bulk_update(changed, DRAFT_FIELDS, batch_size=DRAFT_BATCH_SIZE)
+    return len(changed)
+
+
+def _sequence_drafts(source_id, target_ids, results):
+    return [(source_id, target_id, shapes) for target_id, shapes in zip(target_ids, results)]
+
+
+def propagate_from(sample, frames=None, shapes=None):
+    """
+    从一张样本向后传播 frames 帧 (在当前进程里同步计算)，返回写入的草稿数
+    shapes: [(label, [(x, y), ...]), ...]，不给时使用该样本已保存的标注
+    """
+    frames = min(frames or get_propagation_frames(), MAX_PROPAGATION_FRAMES)
+    if shapes is None:
+        shapes = parse_shapes(sample.annotation_content, sample.width, sample.height)
+    if not shapes:
+        return 0
+    targets = list(
+        SampleImage.objects.filter(task_id=sample.task_id, id__gt=sample.id)
+        .order_by('id').values_list('id', 'file_path', 'is_labeled')[:frames]
+    )
+    target_ids, paths = [], [_image_path(sample.file_path)]
+    for target_id, file_path, is_labeled in targets:
+        if is_labeled:
+            break
+        target_ids.append(target_id)
+        paths.append(_image_path(file_path))
+    if not target_ids:
+        return 0
+    results = track_sequence(paths, source_shapes(shapes), get_max_side())
+    return write_drafts(_sequence_drafts(sample.id, target_ids, results))
+
+
+def propagate_task(task_id, frames=None, workers=None, on_progress=None):
+    """
+    整个任务批量传播，返回 (片段数, 写入的草稿数)
+    workers 为 None 时取 ANNOTATION_PROPAGATION_WORKERS；on_progress(已完成片段数, 片段总数) 用于输出进度
+    """
+    frames = frames or get_propagation_frames()
+    workers = get_propagation_workers() if workers is None else workers
+    sequences = plan_sequences(task_id, frames)
+    paths = [sequence[2] for sequence in sequences]
+    shapes = [sequence[3] for sequence in sequences]
+    max_side = get_max_side()
+
+    def write(results):
+        written, pending = 0, []
+        for done, ((source_id, target_ids, _, _), result) in enumerate(zip(sequences, results), 1):
+            pending += _sequence_drafts(source_id, target_ids, result)
+            if len(pending) >= DRAFT_BATCH_SIZE or done == len(sequences):
+                written += write_drafts(pending)
+                pending = []
+                if on_progress:
+                    on_progress(done, len(sequences))
+        return written
+
+    if workers <= 1 or len(sequences) <= 1:
+        return len(sequences), write(map(track_sequence, paths, shapes, repeat(max_side)))
+
+    # executor.map 按片段顺序返回，主进程边收结果边写库
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        results = executor.map(track_sequence, paths, shapes, repeat(max_side), chunksize=4)
+        return len(sequences), write(results)
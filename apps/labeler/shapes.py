@@ -0,0 +1,127 @@
+# apps/labeler/shapes.py
+"""
+标注图形解析与结构化存储
+
+annotation_content 仍是标注数据的原始记录；保存、导入标注时同步把其中的图形
+重写到 AnnotationShape (类别、图形类型、外接框、面积)，
+「某类别有多少个框」「哪些帧含有类别 7」这类跨任务统计直接走 SQL，不必逐行 json.loads。
+已有数据用 python manage.py build_shapes 回填。
+"""
+import json
+
+from django.db.models import Avg, Count
+
+from apps.core.models import AnnotationShape
+from apps.labeler.geometry import expand_shapes
+from apps.labeler.labels import LABEL_CODES
+
+SHAPE_BATCH_SIZE = 1000
+
+
+def parse_shapes(annotation_content, width=None, height=None):
+    """
+    解析 annotation_content，返回 [(label, [(x, y), ...]), ...]，跳过格式不对或类别未知的图形
+    紧凑编码的图形需要样本宽高才能解码 (见 geometry 模块)
+    """
+    if not annotation_content:
+        return []
+    try:
+        data = json.loads(annotation_content)
+    except ValueError:
+        return []
+    return parse_shape_list(data, width, height)
+
+
+def parse_shape_list(data, width=None, height=None):
+    """同 parse_shapes，输入为已解析的图形列表 (如前端提交的 annotations)"""
+    shapes = []
+    for item in expand_shapes(data, width, height) if isinstance(data, list) else []:
+        try:
+            label = str(item['label'])
+            points = [(float(p['x']), float(p['y'])) for p in item['points']]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if label in LABEL_CODES and len(points) >= 3:
+            shapes.append((label, points))
+    return shapes
+
+
+def polygon_bbox(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def polygon_area(points):
+    """鞋带公式求多边形面积"""
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2
+
+
+def shape_type(points):
+    """标注工具画的矩形是 4 个轴对齐顶点 (拖动只平移，不会变形)，其余按多边形处理"""
+    if len(points) == 4:
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = points
+        if (y0 == y1 and x1 == x2 and y2 == y3 and x3 == x0) or (x0 == x1 and y1 == y2 and x2 == x3 and y3 == y0):
+            return 'rect'
+    return 'polygon'
+
+
+def build_shapes(sample_id, task_id, annotation_content, width=None, height=None):
+    shapes = []
+    for label, points in parse_shapes(annotation_content, width, height):
+        x_min, y_min, x_max, y_max = polygon_bbox(points)
+        shapes.append(AnnotationShape(
+            sample_id=sample_id,
+            task_id=task_id,
+            label=label,
+            shape_type=shape_type(points),
+            point_count=len(points),
+            x_min=x_min, y_min=y_min, x_max=x_max, y_max=y_max,
+            area=polygon_area(points),
+        ))
+    return shapes
+
+
+def sync_shapes(rows):
+    """
+    rows: [(sample_id, task_id, annotation_content, width, height), ...]
+    整体替换这些样本的图形 (先删后插)，返回写入的图形数；应在保存标注的同一事务里调用
+    """
+    rows = list(rows)
+    sample_ids = [row[0] for row in rows]
+    for i in range(0, len(sample_ids), SHAPE_BATCH_SIZE):
+        AnnotationShape.objects.filter(sample_id__in=sample_ids[i:i + SHAPE_BATCH_SIZE]).delete()
+    shapes = [shape for row in rows for shape in build_shapes(*row)]
+    AnnotationShape.objects.bulk_create(shapes, batch_size=SHAPE_BATCH_SIZE)
+    return len(shapes)
+
+
+def label_stats(task_ids=None):
+    """
+    按类别统计：图形数、含该类别的帧数、涉及任务数、平均面积 (一条 GROUP BY)
+    task_ids 为空时统计全部任务
+    """
+    qs = AnnotationShape.objects.all()
+    if task_ids:
+        qs = qs.filter(task_id__in=task_ids)
+    return list(
+        qs.values('label')
+        .annotate(
+            shapes=Count('id'),
+            samples=Count('sample', distinct=True),
+            tasks=Count('task', distinct=True),
+            avg_area=Avg('area'),
+        )
+        .order_by('label')
+    )
+
+
+def samples_with_label(label, task_id=None):
+    """含指定类别图形的样本 id，返回 values 查询集，可直接作为 id__in 子查询"""
+    qs = AnnotationShape.objects.filter(label=label)
+    if task_id is not None:
+        qs = qs.filter(task_id=task_id)
+    return qs.values('sample_id')
@@ -0,0 +1,31 @@
+# apps/labeler/tests/base.py
+import json
+
+from django.test import TestCase
+
+from apps.core.models import LabelTask, SampleImage, STATUS_READY
+from apps.labeler.annotations import load_annotations
+from apps.users.models import UserProfile
+
+RECT = [{'x': 10, 'y': 10}, {'x': 110, 'y': 10}, {'x': 110, 'y': 60}, {'x': 10, 'y': 60}]
+
+
+class AnnotationTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user('lab1', password='x', role='labeler')
+        self.task = LabelTask.objects.create(code='TK-T1', name='t', creator=self.user, state=STATUS_READY, sample_count=3)
+        self.samples = [
+            SampleImage.objects.create(
+                task=self.task, code=f'S{i}', file_path=f'upload/images/TK-T1/img_{i}.jpg',
+                original_name=f'img_{i}.jpg', width=640, height=480,
+            )
+            for i in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def post_batch(self, items):
+        return self.client.post('/labeler/api/save_batch/', json.dumps({'items': items}), content_type='application/json')
+
+    def stored(self, sample):
+        sample.refresh_from_db()
+        return load_annotations(sample.annotation_content, sample.width, sample.height)
@@ -0,0 +1,95 @@
+# apps/labeler/tests/test_annotations.py
+from django.test import SimpleTestCase
+
+from apps.labeler.annotations import apply_ops, save_annotations, save_patches, PatchError
+from apps.labeler.tests.base import AnnotationTestCase, RECT
+
+
+class ApplyOpsTests(SimpleTestCase):
+    def setUp(self):
+        self.shapes = [{'id': 'a', 'label': '1', 'points': RECT}, {'id': 'b', 'label': '2', 'points': RECT}]
+
+    def test_add_modify_delete(self):
+        result = apply_ops(self.shapes, [
+            {'op': 'add', 'shape': {'id': 'c', 'label': '3', 'points': RECT}},
+            {'op': 'modify', 'id': 'a', 'shape': {'label': '5'}},
+            {'op': 'delete', 'id': 'b'},
+        ])
+        self.assertEqual([(s['id'], s['label']) for s in result], [('a', '5'), ('c', '3')])
+        # modify 只覆盖给出的字段
+        self.assertEqual(result[0]['points'], RECT)
+
+    def test_modify_keeps_op_id(self):
+        [shape, _] = apply_ops(self.shapes, [{'op': 'modify', 'id': 'a', 'shape': {'id': 'x', 'label': '5'}}])
+        self.assertEqual(shape['id'], 'a')
+
+    def test_invalid_ops(self):
+        cases = [
+            {'op': 'add', 'shape': {'id': 'a', 'points': RECT}},
+            {'op': 'add', 'shape': {'points': RECT}},
+            {'op': 'add', 'shape': 'a'},
+            {'op': 'modify', 'id': 'z', 'shape': {}},
+            {'op': 'modify', 'id': 'a', 'shape': {'points': 'x'}},
+            {'op': 'delete', 'id': 'z'},
+            {'op': 'move', 'id': 'a'},
+            'delete',
+        ]
+        for op in cases:
+            with self.subTest(op=op), self.assertRaises(PatchError):
+                apply_ops(self.shapes, [op])
+        with self.assertRaises(PatchError):
+            apply_ops(self.shapes, {'op': 'delete', 'id': 'a'})
+
+    def test_failed_patch_leaves_input_untouched(self):
+        with self.assertRaises(PatchError):
+            apply_ops(self.shapes, [{'op': 'delete', 'id': 'a'}, {'op': 'delete', 'id': 'z'}])
+        self.assertEqual([s['id'] for s in self.shapes], ['a', 'b'])
+
+
+class SavePatchesTests(AnnotationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sample = self.samples[0]
+        self.version = save_annotations({self.sample.id: [{'id': 'c1', 'label': '1', 'points': RECT}]}, 'lab1')[self.sample.id]['version']
+
+    def test_stale_version_conflicts(self):
+        ops = [{'op': 'delete', 'id': 'c1'}]
+        self.assertEqual(save_patches({self.sample.id: (self.version, ops)}, 'lab1')[self.sample.id]['status'], 'ok')
+
+        result = save_patches({self.sample.id: (self.version, [{'op': 'modify', 'id': 'c1', 'shape': {'label': '2'}}])}, 'lab1')[self.sample.id]
+        self.assertEqual(result['status'], 'conflict')
+        self.assertEqual(result['version'], self.version + 1)
+        self.assertEqual(result['annotations'], [])
+        self.assertEqual(self.stored(self.sample), [])
+
+    def test_bad_patch_only_fails_its_sample(self):
+        other = self.samples[1]
+        results = save_patches({
+            self.sample.id: (self.version, [{'op': 'delete', 'id': ['c1']}]),
+            other.id: (0, [{'op': 'add', 'shape': {'id': 'n1', 'label': '1', 'points': RECT}}]),
+        }, 'lab1')
+
+        self.assertEqual(results[self.sample.id], {'status': 'error', 'msg': '补丁格式错误'})
+        self.assertEqual(results[other.id], {'status': 'ok', 'version': 1})
+        self.sample.refresh_from_db()
+        self.assertEqual(self.sample.annotation_version, self.version)
+        self.assertEqual([s['id'] for s in self.stored(other)], ['n1'])
+
+
+class PatchRoundTripTests(AnnotationTestCase):
+    def test_modify_with_client_payload(self):
+        """前端 diffOps 的 modify 操作里 shape 自带 id"""
+        sample = self.samples[0]
+        shape = {'id': 'c1', 'label': '1', 'points': RECT}
+        version = save_annotations({sample.id: [shape]}, 'lab1')[sample.id]['version']
+
+        moved = dict(shape, points=[{'x': p['x'] + 5, 'y': p['y']} for p in RECT])
+        r = self.post_batch([{'sample_id': sample.id, 'version': version, 'ops': [{'op': 'modify', 'id': 'c1', 'shape': moved}]}])
+
+        self.assertEqual(r.status_code, 200)
+        result = r.json()['results'][0]
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['version'], version + 1)
+        [saved] = self.stored(sample)
+        self.assertEqual(saved['id'], 'c1')
+        self.assertAlmostEqual(saved['points'][0]['x'], 15, delta=0.1)
@@ -0,0 +1,43 @@
+# apps/labeler/tests/test_batch.py
+from apps.core.models import LabelTask
+from apps.labeler.annotations import MAX_BATCH_ITEMS
+from apps.labeler.tests.base import AnnotationTestCase, RECT
+
+
+class BatchSaveTests(AnnotationTestCase):
+    def test_per_item_errors_do_not_block_others(self):
+        a, b, c = self.samples
+        r = self.post_batch([
+            {'sample_id': a.id, 'annotations': [{'label': '1', 'points': RECT}]},
+            {'sample_id': b.id, 'annotations': 'x'},
+            {'sample_id': 999999, 'annotations': []},
+            {'sample_id': c.id, 'version': 0, 'ops': [{'op': 'delete', 'id': 'z'}]},
+        ])
+
+        self.assertEqual(r.status_code, 200)
+        results = {item['sample_id']: item for item in r.json()['results']}
+        self.assertEqual(results[a.id]['status'], 'ok')
+        self.assertEqual(results[b.id], {'status': 'error', 'msg': 'annotations 必须是数组', 'sample_id': b.id})
+        self.assertEqual(results[999999]['msg'], '样本不存在')
+        self.assertEqual(results[c.id]['status'], 'error')
+        self.assertEqual(len(self.stored(a)), 1)
+        self.assertEqual(self.stored(c), [])
+        self.assertEqual(LabelTask.objects.get(id=self.task.id).labeled_count, 1)
+
+    def test_last_item_for_a_sample_wins(self):
+        sample = self.samples[0]
+        r = self.post_batch([
+            {'sample_id': sample.id, 'annotations': [{'label': '1', 'points': RECT}]},
+            {'sample_id': sample.id, 'version': 0, 'ops': [{'op': 'add', 'shape': {'id': 'n1', 'label': '2', 'points': RECT}}]},
+        ])
+
+        self.assertEqual(r.json()['results'], [{'status': 'ok', 'version': 1, 'sample_id': sample.id}])
+        self.assertEqual([s['id'] for s in self.stored(sample)], ['n1'])
+
+    def test_malformed_request(self):
+        sample = self.samples[0]
+        for items in ([{'annotations': []}], [{'sample_id': sample.id, 'ops': []}], [{}] * (MAX_BATCH_ITEMS + 1)):
+            with self.subTest(items=items[:1]):
+                self.assertEqual(self.post_batch(items).status_code, 400)
+        sample.refresh_from_db()
+        self.assertEqual(sample.annotation_version, 0)
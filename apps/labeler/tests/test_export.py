@@ -0,0 +1,103 @@
+# apps/labeler/tests/test_export.py
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from xml.etree import ElementTree as ET
+
+from django.test import override_settings
+
+from apps.core.counters import AUDIT_APPROVED
+from apps.core.models import LabelTask, SampleImage
+from apps.labeler.annotations import save_annotations
+from apps.labeler.export import build_task_export, get_cached_export, stream_zip, dataset_entries
+from apps.labeler.tests.base import AnnotationTestCase, RECT
+
+
+class ExportTestCase(AnnotationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.cache_dir = os.path.join(self.media, 'exports')
+        settings = override_settings(MEDIA_ROOT=self.media, EXPORT_CACHE_DIR=self.cache_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        images_dir = os.path.join(self.media, 'upload', 'images', self.task.code)
+        os.makedirs(images_dir)
+        for sample in self.samples:
+            with open(os.path.join(images_dir, sample.original_name), 'wb') as f:
+                f.write(b'jpeg')
+
+
+class ExportCacheTests(ExportTestCase):
+    def reload(self):
+        return LabelTask.objects.get(id=self.task.id)
+
+    def test_annotation_saves_keep_the_cache(self):
+        path = build_task_export(self.reload())
+        save_annotations({self.samples[0].id: [{'label': '1', 'points': RECT}]}, 'lab1')
+        self.assertEqual(get_cached_export(self.reload()), path)
+
+    def test_new_version_replaces_old(self):
+        old = build_task_export(self.reload())
+        self.reload().mark_content_changed()
+        new = build_task_export(self.reload())
+        self.assertNotEqual(old, new)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(new)])
+
+    def test_delete_task_removes_cache(self):
+        self.user.is_superuser = True
+        self.user.save()
+        build_task_export(self.reload())
+        self.client.get(f'/labeler/delete_task/{self.task.id}/')
+        self.assertFalse(LabelTask.objects.filter(id=self.task.id).exists())
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+class DatasetFormatTests(ExportTestCase):
+    def setUp(self):
+        super().setUp()
+        a, b, _ = self.samples
+        save_annotations({a.id: [{'label': '1', 'points': RECT}], b.id: [{'label': '3', 'points': RECT}]}, 'lab1')
+        SampleImage.objects.filter(id=a.id).update(audit_status=AUDIT_APPROVED)
+
+    def export(self, fmt, approved_only=False):
+        data = b''.join(stream_zip(dataset_entries(fmt, [self.task.id], approved_only)))
+        return zipfile.ZipFile(io.BytesIO(data))
+
+    def test_yolo(self):
+        zf = self.export('yolo')
+        self.assertEqual(zf.read('classes.txt').decode().splitlines()[1], 'Tongue')
+        self.assertIn('data.yaml', zf.namelist())
+        self.assertEqual(zf.read('images/TK-T1_img_0.jpg'), b'jpeg')
+        [line] = zf.read('labels/TK-T1_img_0.txt').decode().splitlines()
+        label, *box = line.split()
+        self.assertEqual(label, '1')
+        for value, expected in zip(map(float, box), (60 / 640, 35 / 480, 100 / 640, 50 / 480)):
+            self.assertAlmostEqual(value, expected, places=3)
+        # 未标注的图片也有一个空标签文件
+        self.assertEqual(zf.read('labels/TK-T1_img_2.txt'), b'')
+
+    def test_coco(self):
+        data = json.loads(self.export('coco').read('annotations/instances.json'))
+        self.assertEqual([image['file_name'] for image in data['images']], [f'TK-T1_img_{i}.jpg' for i in range(3)])
+        self.assertEqual([(a['id'], a['category_id']) for a in data['annotations']], [(1, 2), (2, 4)])
+        for value, expected in zip(data['annotations'][0]['bbox'], (10, 10, 100, 50)):
+            self.assertAlmostEqual(value, expected, delta=0.1)
+        self.assertEqual(len(data['categories']), 9)
+
+    def test_coco_approved_only(self):
+        data = json.loads(self.export('coco', approved_only=True).read('annotations/instances.json'))
+        self.assertEqual([image['id'] for image in data['images']], [self.samples[0].id])
+        self.assertEqual(len(data['annotations']), 1)
+
+    def test_voc(self):
+        zf = self.export('voc')
+        root = ET.fromstring(zf.read('Annotations/TK-T1_img_1.xml'))
+        self.assertEqual(root.findtext('size/width'), '640')
+        self.assertEqual(root.findtext('object/name'), 'Epiglottis')
+        self.assertEqual(root.findtext('object/bndbox/xmin'), '11')
+        self.assertEqual(zf.read('ImageSets/Main/trainval.txt').decode().splitlines(), [f'TK-T1_img_{i}' for i in range(3)])
@@ -0,0 +1,85 @@
+# apps/labeler/tests/test_importer.py
+import io
+import json
+import struct
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from apps.core.models import LabelTask
+from apps.labeler import importer
+from apps.labeler.importer import import_annotations
+from apps.labeler.tests.base import AnnotationTestCase, RECT
+
+
+def _patch_entry(data, name, flag_bits=None, method=None):
+    """改写某个条目在本地文件头与中央目录里的标志位/压缩方式，构造加密或不支持的条目"""
+    for signature, flag_offset, method_offset, name_offset in ((b'PK\x03\x04', 6, 8, 30), (b'PK\x01\x02', 8, 10, 46)):
+        pos = data.find(signature)
+        while pos != -1:
+            if data[pos + name_offset:pos + name_offset + len(name)] == name:
+                if flag_bits is not None:
+                    data[pos + flag_offset:pos + flag_offset + 2] = struct.pack('<H', flag_bits)
+                if method is not None:
+                    data[pos + method_offset:pos + method_offset + 2] = struct.pack('<H', method)
+            pos = data.find(signature, pos + 4)
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for name, content in entries.items():
+            zf.writestr(name, content)
+    return bytearray(buf.getvalue())
+
+
+class ImportTests(AnnotationTestCase):
+    def test_import_applies_save_state(self):
+        sample = self.samples[0]
+        sample.is_labeled, sample.audit_status, sample.labeled_by = True, 2, 'other'
+        sample.lease_owner, sample.lease_expires_at = 'other', timezone.now() + timedelta(minutes=5)
+        sample.draft_content, sample.draft_source_id = '[]', self.samples[1].id
+        sample.save()
+        LabelTask.objects.filter(id=self.task.id).update(labeled_count=1, audited_count=1, rejected_count=1)
+
+        data = _zip({'img_0.json': json.dumps([{'label': '1', 'points': RECT}])})
+        result = import_annotations(self.task, io.BytesIO(bytes(data)), 'lab1')
+
+        self.assertEqual(result.matched, 1)
+        sample.refresh_from_db()
+        self.assertEqual(sample.audit_status, 0)
+        self.assertEqual(sample.annotation_version, 1)
+        self.assertIsNone(sample.lease_owner)
+        self.assertIsNone(sample.draft_content)
+        self.assertIsNone(sample.draft_source_id)
+        self.assertEqual(len(self.stored(sample)), 1)
+        task = LabelTask.objects.get(id=self.task.id)
+        self.assertEqual((task.labeled_count, task.audited_count, task.rejected_count), (1, 0, 0))
+
+    def test_unreadable_entries_are_reported(self):
+        data = _zip({'img_0.json': '[]', 'img_1.json': '[]', 'img_2.json': '[]'})
+        _patch_entry(data, b'img_0.json', flag_bits=0x1)
+        _patch_entry(data, b'img_1.json', method=99)
+
+        result = import_annotations(self.task, io.BytesIO(bytes(data)), 'lab1')
+
+        self.assertEqual(result.matched, 1)
+        self.assertEqual(sorted(result.failed), ['img_0.json', 'img_1.json'])
+
+    def test_writes_in_batches(self):
+        entries = {f'img_{i}.json': json.dumps([{'label': '1', 'points': RECT}] * (i + 1)) for i in range(3)}
+        entries['dup/img_0.json'] = '[]'
+        data = _zip(entries)
+        write_batch = mock.Mock(wraps=importer._write_batch)
+        with mock.patch.object(importer, 'IMPORT_BATCH_SIZE', 2), mock.patch.object(importer, '_write_batch', write_batch):
+            result = import_annotations(self.task, io.BytesIO(bytes(data)), 'lab1')
+
+        self.assertEqual(result.matched, 4)
+        self.assertEqual([len(call.args[0]) for call in write_batch.call_args_list], [2, 2])
+        # 同一样本后出现的条目覆盖前面的
+        self.assertEqual(self.stored(self.samples[0]), [])
+        self.assertEqual(self.samples[0].annotation_version, 2)
+        self.assertEqual([len(self.stored(s)) for s in self.samples[1:]], [2, 3])
+        self.assertEqual(LabelTask.objects.get(id=self.task.id).labeled_count, 3)
@@ -0,0 +1,66 @@
+# apps/labeler/tests/test_leasing.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from apps.core.counters import AUDIT_REJECTED
+from apps.core.models import SampleImage
+from apps.labeler.annotations import save_annotations
+from apps.labeler.leasing import _lease_chunk, next_sample
+from apps.labeler.tests.base import AnnotationTestCase
+
+
+@override_settings(LABEL_LEASE_CHUNK=2, LABEL_LEASE_SECONDS=600, LABEL_REWORK_GRACE_SECONDS=3600)
+class LeaseTests(AnnotationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.ids = [s.id for s in self.samples]
+
+    def lease(self, username='lab1'):
+        with transaction.atomic():
+            return _lease_chunk(self.task.id, username, self.now)
+
+    def reject(self, sample_id, labeled_by, audited_at):
+        SampleImage.objects.filter(id=sample_id).update(
+            is_labeled=True, labeled_by=labeled_by, audit_status=AUDIT_REJECTED, audited_at=audited_at
+        )
+
+    def test_chunks_do_not_overlap(self):
+        self.assertEqual(self.lease('lab1'), self.ids[:2])
+        self.assertEqual(self.lease('lab2'), self.ids[2:])
+        self.assertEqual(self.lease('lab3'), [])
+        sample = SampleImage.objects.get(id=self.ids[0])
+        self.assertEqual(sample.lease_owner, 'lab1')
+        self.assertEqual(sample.lease_expires_at, self.now + timedelta(seconds=600))
+
+    def test_expired_lease_is_reclaimed(self):
+        SampleImage.objects.filter(id=self.ids[0]).update(lease_owner='lab2', lease_expires_at=self.now - timedelta(seconds=1))
+        SampleImage.objects.filter(id=self.ids[1]).update(lease_owner='lab2', lease_expires_at=self.now + timedelta(seconds=60))
+        self.assertEqual(self.lease(), [self.ids[0], self.ids[2]])
+
+    def test_pool_priority(self):
+        SampleImage.objects.filter(id=self.ids[0]).update(is_labeled=True)
+        # 他人被驳回：返工期内不领，过期后排在未标注之后
+        self.reject(self.ids[1], 'lab2', self.now)
+        self.reject(self.ids[2], 'lab1', self.now)
+        self.assertEqual(self.lease(), [self.ids[2]])
+
+        SampleImage.objects.update(lease_owner=None, lease_expires_at=None)
+        self.reject(self.ids[1], 'lab2', self.now - timedelta(hours=2))
+        SampleImage.objects.filter(id=self.ids[0]).update(is_labeled=False)
+        self.assertEqual(self.lease(), [self.ids[2], self.ids[0]])
+
+    def test_next_sample_walks_own_lease_then_leases_more(self):
+        first = next_sample(self.task.id, 'lab1')
+        self.assertEqual(first, self.ids[0])
+        self.assertEqual(next_sample(self.task.id, 'lab1', after=first), self.ids[1])
+        # 回到前一张时仍优先给手上的下一张
+        self.assertEqual(next_sample(self.task.id, 'lab1', after=self.ids[1]), self.ids[0])
+
+        save_annotations({self.ids[0]: [], self.ids[1]: []}, 'lab1')
+        self.assertEqual(SampleImage.objects.filter(lease_owner='lab1').count(), 0)
+        self.assertEqual(next_sample(self.task.id, 'lab1', after=self.ids[1]), self.ids[2])
+        self.assertIsNone(next_sample(self.task.id, 'lab2'))
@@ -0,0 +1,144 @@
+# apps/labeler/tracker.py
+"""
+帧间图形跟踪引擎 (标注传播的计算部分)
+
+相邻抽帧里同一结构 (牙齿、会厌、声门 ...) 只是平移、轻微旋转或缩放。
+每个图形在上一帧的区域内取角点 (goodFeaturesToTrack)，用金字塔 LK 光流跟到下一帧，
+正反向各跟一次，往返误差大的点丢弃；剩余点用 RANSAC 拟合相似变换 (estimateAffinePartial2D)，
+再把变换作用到多边形顶点上。区域内纹理不足、拟合不出变换时退回直接跟踪顶点。
+有效点不足或图形移出画面即视为跟丢，该图形不再往后传播。
+
+图片先缩到最长边 max_side 再计算，纯 CPU。
+注意：本模块不依赖 Django，spawn 出来的子进程可直接导入
+"""
+import cv2
+import numpy as np
+
+DEFAULT_MAX_SIDE = 640
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01),
+)
+# 正反向光流的往返误差上限 (缩放后像素)
+MAX_ROUND_TRIP_ERROR = 1.0
+# 每个图形最多取的角点数、拟合变换最少需要的有效点数
+MAX_FEATURES = 80
+MIN_FEATURES = 6
+# 退回顶点跟踪时，跟上的顶点至少要占的比例
+MIN_VERTEX_RATIO = 0.5
+# 图形移出画面后剩余面积 (占原面积) 低于该比例视为跟丢
+MIN_VISIBLE_RATIO = 0.3
+
+
+def read_gray(path, max_side=DEFAULT_MAX_SIDE):
+    """读取灰度图并缩小到最长边不超过 max_side，返回 (图像, 缩放比例)；读不到时图像为 None"""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None, 1.0
+    h, w = image.shape
+    scale = min(1.0, max_side / max(h, w))
+    if scale < 1.0:
+        image = cv2.resize(image, (max(round(w * scale), 1), max(round(h * scale), 1)), interpolation=cv2.INTER_AREA)
+    return image, scale
+
+
+def track_points(prev, curr, points):
+    """LK 光流正反向跟踪，返回 (新位置 Nx2, 有效标记)"""
+    p0 = points.reshape(-1, 1, 2).astype(np.float32)
+    p1, st1, _ = cv2.calcOpticalFlowPyrLK(prev, curr, p0, None, **LK_PARAMS)
+    back, st2, _ = cv2.calcOpticalFlowPyrLK(curr, prev, p1, None, **LK_PARAMS)
+    error = np.linalg.norm((p0 - back).reshape(-1, 2), axis=1)
+    ok = (st1.ravel() == 1) & (st2.ravel() == 1) & (error < MAX_ROUND_TRIP_ERROR)
+    return p1.reshape(-1, 2), ok
+
+
+def _region_mask(shape, polygon):
+    """图形区域 (稍向外扩，轮廓附近的纹理同样随结构移动)"""
+    mask = np.zeros(shape, dtype=np.uint8)
+    cv2.fillPoly(mask, [np.round(polygon).astype(np.int32)], 255)
+    return cv2.dilate(mask, np.ones((9, 9), np.uint8))
+
+
+def move_polygon(prev, curr, polygon):
+    """把上一帧的多边形 (Nx2，缩放后坐标) 移到当前帧，跟丢时返回 None"""
+    features = cv2.goodFeaturesToTrack(
+        prev, maxCorners=MAX_FEATURES, qualityLevel=0.01, minDistance=5, mask=_region_mask(prev.shape, polygon)
+    )
+    if features is not None and len(features) >= MIN_FEATURES:
+        src = features.reshape(-1, 2)
+        dst, ok = track_points(prev, curr, src)
+        if ok.sum() >= MIN_FEATURES:
+            matrix, inliers = cv2.estimateAffinePartial2D(
+                src[ok], dst[ok], method=cv2.RANSAC, ransacReprojThreshold=3.0
+            )
+            if matrix is not None and inliers.sum() >= MIN_FEATURES:
+                return cv2.transform(polygon.reshape(-1, 1, 2), matrix).reshape(-1, 2)
+
+    # 区域内纹理不足：直接跟踪顶点，跟丢的顶点按其余顶点的平均位移移动
+    dst, ok = track_points(prev, curr, polygon)
+    if ok.mean() < MIN_VERTEX_RATIO:
+        return None
+    dst[~ok] = polygon[~ok] + (dst[ok] - polygon[ok]).mean(axis=0)
+    return dst
+
+
+def _area(polygon):
+    return abs(cv2.contourArea(polygon.astype(np.float32)))
+
+
+def clip_polygon(polygon, width, height, is_rect=False):
+    """
+    限制在画面内；矩形保持轴对齐 (按外接框重建 4 个顶点)
+    移出画面太多时返回 None
+    """
+    if is_rect:
+        x0, y0 = polygon.min(axis=0)
+        x1, y1 = polygon.max(axis=0)
+        polygon = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+    area = _area(polygon)
+    clipped = polygon.copy()
+    clipped[:, 0] = clipped[:, 0].clip(0, width - 1)
+    clipped[:, 1] = clipped[:, 1].clip(0, height - 1)
+    if area <= 0 or _area(clipped) < area * MIN_VISIBLE_RATIO:
+        return None
+    return clipped
+
+
+def track_sequence(paths, shapes, max_side=DEFAULT_MAX_SIDE):
+    """
+    进程池任务：把 paths[0] 上的图形逐帧传播到 paths[1:]
+    shapes: [(label, is_rect, [(x, y), ...]), ...]，原图像素坐标
+    返回按帧排列的结果 [[(label, [(x, y), ...]), ...], ...]；图形全部跟丢或图片读不到时提前结束，
+    所以结果可能比 paths[1:] 短
+    """
+    prev, scale = read_gray(paths[0], max_side)
+    if prev is None:
+        return []
+    height, width = prev.shape
+    alive = [
+        (label, is_rect, np.array(points, dtype=np.float32) * scale)
+        for label, is_rect, points in shapes
+    ]
+    results = []
+    for path in paths[1:]:
+        curr, curr_scale = read_gray(path, max_side)
+        # 尺寸不同说明不是同一段视频的相邻帧
+        if curr is None or curr.shape != prev.shape or curr_scale != scale:
+            break
+        moved = []
+        for label, is_rect, polygon in alive:
+            polygon = move_polygon(prev, curr, polygon)
+            if polygon is not None:
+                polygon = clip_polygon(polygon, width, height, is_rect)
+            if polygon is not None:
+                moved.append((label, is_rect, polygon))
+        if not moved:
+            break
+        results.append([
+            (label, [(round(float(x) / scale, 2), round(float(y) / scale, 2)) for x, y in polygon])
+            for label, is_rect, polygon in moved
+        ])
+        alive, prev = moved, curr
+    return results
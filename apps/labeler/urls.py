@@ -9,15 +9,27 @@ urlpatterns = [
     
     # 图片墙
     path('gallery/<int:task_id>/', views.gallery, name='gallery'),
+    path('api/gallery/<int:task_id>/', views.gallery_api, name='gallery_api'),
     
     # 下载
     path('download/<int:task_id>/', views.download_zip, name='download'),
+    # 导出训练格式 (YOLO / COCO / VOC)
+    path('export/', views.export_dataset, name='export'),
+    path('api/label_stats/', views.label_stats_api, name='label_stats_api'),
     
     # 上传
     path('upload/<int:task_id>/', views.upload_annotation, name='upload'),
     #标注
+    path('start/<int:task_id>/', views.start_labeling, name='start'),
+    path('api/next/<int:task_id>/', views.next_sample_api, name='next_api'),
     path('annotate/<int:sample_id>/', views.annotate_page, name='annotate'),
     path('api/save/<int:sample_id>/', views.save_annotation_data, name='save_api'),
+    # 相邻样本窗口 (翻页预取)
+    path('api/neighbors/<int:sample_id>/', views.neighbors_api, name='neighbors_api'),
+    # 批量保存 (标注页本地排队后分批提交)
+    path('api/save_batch/', views.save_annotation_batch, name='save_batch_api'),
+    # 跟踪传播：当前图片的标注带到后续帧作为预标注草稿
+    path('api/propagate/<int:sample_id>/', views.propagate_api, name='propagate_api'),
     # 【新增】删除任务路由
     path('delete_task/<int:task_id>/', views.delete_task, name='delete_task'),
 ]
\ No newline at end of file
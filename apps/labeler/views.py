@@ -1,11 +1,8 @@
 # apps/labeler/views.py
 import json
-import os
-import zipfile
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
-from django.conf import settings
-from django.utils import timezone
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
 from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_POST
@@ -13,93 +10,168 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 
 from apps.core.decorators import labeler_required
 from apps.core.models import LabelTask, SampleImage, STATUS_READY
-from apps.core.utils import log_operation
-
-LABEL_CONFIG = [
-    {'code': '0', 'name_cn': '0 牙齿',   'name_en': '0 Teeth',        'color': '#E74C3C'},
-    {'code': '1', 'name_cn': '1 舌头',   'name_en': '1 Tongue',       'color': '#2ECC71'},
-    {'code': '2', 'name_cn': '2 悬雍垂', 'name_en': '2 Uvula',        'color': '#3498DB'},
-    {'code': '3', 'name_cn': '3 会厌',   'name_en': '3 Epiglottis',   'color': '#F1C40F'},
-    {'code': '4', 'name_cn': '4 声门-1', 'name_en': '4 Glottis-CL-1', 'color': '#9B59B6'},
-    {'code': '5', 'name_cn': '5 声门-2', 'name_en': '5 Glottis-CL-2', 'color': '#1ABC9C'},
-    {'code': '6', 'name_cn': '6 声门-3', 'name_en': '6 Glottis-CL-3', 'color': '#E67E22'},
-    {'code': '7', 'name_cn': '7 气管环', 'name_en': '7 Ring',         'color': '#34495E'},
-    {'code': '8', 'name_cn': '8 食道',   'name_en': '8 Esophagus',    'color': '#95A5A6'},
-]
+from apps.core.summary import STATUS_FILTERS, DASHBOARD_SORTS, DEFAULT_SORT, status_stats
+from apps.core.samples import (
+    neighbor_window, window_item, window_links, gallery_page, DEFAULT_WINDOW, GALLERY_FILTERS, GALLERY_PAGE_SIZE,
+)
+from apps.core.utils import log_operation, ranged_file_response
+from apps.labeler.labels import LABEL_CONFIG, LABEL_CODES
+from apps.labeler.importer import import_annotations
+from apps.labeler.annotations import save_annotations, save_patches, load_annotations, MAX_BATCH_ITEMS
+from apps.labeler.geometry import GRID
+from apps.labeler.shapes import label_stats, parse_shape_list
+from apps.labeler.propagation import propagate_from, get_propagation_frames, MAX_PROPAGATION_FRAMES
+from apps.labeler.leasing import next_sample, active_lease_owner
+from apps.labeler.export import (
+    stream_zip, task_export_entries, get_cached_export, remove_task_exports, dataset_entries, EXPORT_FORMATS,
+)
+
+# 任务大厅每页任务数
+DASHBOARD_PAGE_SIZE = 12
+
 
 @never_cache
 @labeler_required
 def dashboard(request):
-    # 只获取状态为 "就绪" (READY) 的任务
-    tasks = LabelTask.objects.filter(state=STATUS_READY).order_by('-created_at')
-    
-    # 初始化统计数据
-    stats = {
-        'total': tasks.count(),
-        'not_started': 0,
-        'in_progress': 0,
-        'completed': 0
-    }
-
-    for task in tasks:
-        # 计算进度百分比
-        if task.sample_count > 0:
-            task.progress = int((task.labeled_count / task.sample_count) * 100)
-        else:
-            task.progress = 0
-            
-        # ✅ [优化] 状态分类逻辑
-        if task.labeled_count == 0:
-            # 标注量为0 -> 未开始
-            stats['not_started'] += 1
-            task.status_tag = 'not_started' 
-        elif task.labeled_count < task.sample_count:
-            # 标注量 > 0 但 < 总量 -> 进行中
-            stats['in_progress'] += 1
-            task.status_tag = 'processing'
-        else:
-            # 标注量 >= 总量 -> 已完成
-            stats['completed'] += 1
-            task.status_tag = 'done'
+    """
+    任务大厅：计数、首张样本 id 都已反范式存在 LabelTask 上，
+    一条聚合查询出统计卡片，一条查询取当前页任务；排序、筛选、分页都在 SQL 里完成
+    GET ?status=not_started|processing|done&sort=newest|oldest|progress|remaining|name&page=N
+    """
+    tasks = LabelTask.objects.filter(state=STATUS_READY)
+    stats = status_stats(tasks)
 
-        # 获取第一张图片ID用于跳转
-        first_sample = task.samples.first()
-        task.first_sample_id = first_sample.id if first_sample else None
+    status = request.GET.get('status', '')
+    total = stats['total']
+    if status in STATUS_FILTERS:
+        tasks = tasks.filter(STATUS_FILTERS[status])
+        total = stats[status]
+    else:
+        status = ''
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in DASHBOARD_SORTS:
+        sort = DEFAULT_SORT
+    tasks = tasks.select_related('creator').order_by(*DASHBOARD_SORTS[sort])
+
+    paginator = Paginator(tasks, DASHBOARD_PAGE_SIZE)
+    # 总数已由上面的聚合查询得到，省掉 Paginator 自己的 COUNT(*)
+    paginator.count = total
+    try:
+        page_obj = paginator.page(request.GET.get('page'))
+    except PageNotAnInteger:
+        page_obj = paginator.page(1)
+    except EmptyPage:
+        page_obj = paginator.page(paginator.num_pages)
 
     return render(request, 'labeler/dashboard.html', {
-        'tasks': tasks,
-        'stats': stats # 将统计数据传递给模板
+        'tasks': page_obj,
+        'page_obj': page_obj,
+        'stats': stats, # 将统计数据传递给模板
+        'status': status,
+        'sort': sort,
     })
 
 @never_cache
 @labeler_required
 def gallery(request, task_id):
     task = get_object_or_404(LabelTask, id=task_id)
-    samples = task.samples.all()[:100]
-    return render(request, 'labeler/gallery.html', {'task': task, 'samples': samples})
+    # 图片由 gallery_api 分页加载，这里只准备筛选项
+    labelers = (SampleImage.objects.filter(task=task).exclude(labeled_by__isnull=True).exclude(labeled_by='')
+                .order_by('labeled_by').values_list('labeled_by', flat=True).distinct())
+    return render(request, 'labeler/gallery.html', {
+        'task': task,
+        'labelers': list(labelers),
+        'label_config': LABEL_CONFIG,
+        'page_size': GALLERY_PAGE_SIZE,
+    })
+
+@never_cache
+@labeler_required
+def gallery_api(request, task_id):
+    """
+    图片库分页: GET ?after=<上一页最后一个 id>&limit=100&status=unlabeled|labeled|approved|rejected&labeled_by=xxx&label=7
+    按 id 做 keyset 分页，返回 next_after 作为下一页游标 (null 表示没有更多)
+    """
+    status = request.GET.get('status') or None
+    label = request.GET.get('label') or None
+    if (status and status not in GALLERY_FILTERS) or (label and label not in LABEL_CODES):
+        return JsonResponse({'status': 'error', 'msg': '未知的筛选条件'}, status=400)
+    try:
+        rows, next_after = gallery_page(
+            task_id,
+            after=request.GET.get('after') or 0,
+            limit=request.GET.get('limit') or GALLERY_PAGE_SIZE,
+            status=status,
+            labeled_by=request.GET.get('labeled_by') or None,
+            label=label,
+        )
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': '分页参数格式错误'}, status=400)
+    return JsonResponse({
+        'status': 'ok',
+        'items': [dict(window_item(s), preview=s.preview_url) for s in rows],
+        'next_after': next_after,
+    })
+
+@never_cache
+@labeler_required
+def start_labeling(request, task_id):
+    """任务大厅「开始/继续标注」：领取一张分给自己的样本并进入标注页"""
+    task = get_object_or_404(LabelTask, id=task_id)
+    sample_id = next_sample(task.id, request.user.username)
+    if sample_id is None:
+        messages.info(request, f"任务【{task.name}】暂无可领取的样本，可在图片库中查看")
+        return redirect('labeler:gallery', task_id=task.id)
+    return redirect('labeler:annotate', sample_id=sample_id)
+
+@require_POST
+@labeler_required
+def next_sample_api(request, task_id):
+    """
+    领取下一张待办: POST ?after=<当前样本 id>
+    手上的领取处理完后按批领取新样本 (被驳回的优先回到原标注员)，返回 sample_id；没有可领取的返回 status=empty
+    """
+    try:
+        after = int(request.GET.get('after') or 0)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'after 参数格式错误'}, status=400)
+    sample_id = next_sample(task_id, request.user.username, after=after)
+    if sample_id is None:
+        return JsonResponse({'status': 'empty', 'msg': '该任务暂无可领取的样本'})
+    return JsonResponse({'status': 'ok', 'sample_id': sample_id})
 
 @never_cache
 @labeler_required
 def annotate_page(request, sample_id):
     sample = get_object_or_404(SampleImage, id=sample_id)
-    task = sample.task
-    
-    next_sample = SampleImage.objects.filter(task=task, id__gt=sample.id).order_by('id').first()
-    prev_sample = SampleImage.objects.filter(task=task, id__lt=sample.id).order_by('-id').first()
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.GET.get('ajax'):
+        # 前后若干张一次查出，上一张/下一张从窗口里取，前端据此预取相邻图片
+        window = neighbor_window(sample.id, DEFAULT_WINDOW, task_id=sample.task_id)
+        prev_id, next_id = window_links(window, sample.id)
+        lease_owner = active_lease_owner(sample)
         return JsonResponse({
             'status': 'ok',
             'sample': {
                 'id': sample.id,
-                'url': f"/media/{sample.file_path}",
+                'url': sample.image_url,
                 'name': sample.original_name,
-                'annotations': json.loads(sample.annotation_content) if sample.annotation_content else []
+                # 顶点可能是紧凑编码 (pc 字段)，前端按 size 解码
+                'annotations': load_annotations(sample.annotation_content),
+                'size': [sample.width, sample.height],
+                'version': sample.annotation_version,
+                # 已被其他标注员领取时前端给出提示
+                'leased_by': lease_owner if lease_owner != request.user.username else None,
+                # 跟踪传播的预标注草稿 (同样可能是紧凑编码)，已标注的图片不再提供
+                'draft': load_annotations(sample.draft_content) if not sample.is_labeled else [],
+                'draft_source': sample.draft_source_id if not sample.is_labeled else None,
             },
-            'next_id': next_sample.id if next_sample else None,
-            'prev_id': prev_sample.id if prev_sample else None
+            'next_id': next_id,
+            'prev_id': prev_id,
+            'neighbors': [window_item(s) for s in window],
         })
 
+    task = sample.task
     last_task_id = request.session.get('last_view_task_id')
     if last_task_id != task.id:
         log_operation(request, action="开始标注任务", target=task.name, details=f"进入任务 {task.code}")
@@ -107,75 +179,208 @@ def annotate_page(request, sample_id):
 
     return render(request, 'labeler/annotate.html', {
         'sample': sample,
-        'next_sample': next_sample,
-        'previous_sample': prev_sample,
         'task': task,
         'label_config': LABEL_CONFIG, 
+        'geometry_grid': GRID,
     })
 
+@labeler_required
+def neighbors_api(request, sample_id):
+    """
+    相邻样本窗口: GET ?size=5
+    返回当前样本前后各 size 张的 id、图片地址、标注/审核状态 (一条查询)
+    """
+    try:
+        size = int(request.GET.get('size', DEFAULT_WINDOW))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'size 参数格式错误'}, status=400)
+    window = neighbor_window(sample_id, size)
+    if not window:
+        return JsonResponse({'status': 'error', 'msg': '样本不存在'}, status=404)
+    prev_id, next_id = window_links(window, sample_id)
+    return JsonResponse({
+        'status': 'ok',
+        'current': sample_id,
+        'prev_id': prev_id,
+        'next_id': next_id,
+        'items': [window_item(s) for s in window],
+    })
+
+def _save_items(items, username):
+    """
+    items: [{"sample_id": 1, "annotations": [...]}]  整份保存
+       或  [{"sample_id": 1, "version": 3, "ops": [...]}]  增量补丁 (见 annotations.apply_ops)
+    两种可以混在一个请求里；格式错误时抛出 ValueError/TypeError/KeyError
+    """
+    entries, patches = {}, {}
+    # 同一样本出现多次时以最后一条为准
+    for item in items:
+        sample_id = int(item['sample_id'])
+        if 'ops' in item:
+            patches[sample_id] = (int(item['version']), item['ops'])
+            entries.pop(sample_id, None)
+        else:
+            entries[sample_id] = item.get('annotations', [])
+            patches.pop(sample_id, None)
+    results = {}
+    if entries:
+        results.update(save_annotations(entries, username))
+    if patches:
+        results.update(save_patches(patches, username))
+    return results
+
 @require_POST
 @labeler_required
 def save_annotation_data(request, sample_id):
+    """
+    单张保存: POST {"annotations": [...]} 或增量 {"version": 3, "ops": [...]}
+    版本冲突返回 409 及服务端最新标注
+    """
     try:
-        sample = SampleImage.objects.get(id=sample_id)
         data = json.loads(request.body)
-        
-        sample.annotation_content = json.dumps(data.get('annotations', []), ensure_ascii=False)
-        sample.is_labeled = True
-        sample.labeled_by = request.user.username
-        sample.labeled_at = timezone.now()
-        sample.save(update_fields=['annotation_content', 'is_labeled', 'labeled_by', 'labeled_at'])
-        
-        task = sample.task
-        task.labeled_count = task.samples.filter(is_labeled=True).count()
-        task.save(update_fields=['labeled_count'])
-
-        return JsonResponse({'status': 'ok'})
+        result = _save_items([dict(data, sample_id=sample_id)], request.user.username)[sample_id]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'status': 'error', 'msg': '请求格式错误'}, status=400)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'msg': str(e)}, status=500)
+    status = {'ok': 200, 'conflict': 409}.get(result['status'], 400)
+    return JsonResponse(result, status=status)
+
+@require_POST
+@labeler_required
+def save_annotation_batch(request):
+    """
+    批量保存标注: POST {"items": [{"sample_id": 1, "annotations": [...]} 或 {"sample_id": 1, "version": 3, "ops": [...]}, ...]}
+    一个事务内完成，返回每张图片的结果 (ok 带新版本号，conflict 带服务端最新标注)，单张出错不影响其他图片
+    """
+    try:
+        items = json.loads(request.body).get('items', [])
+        if not isinstance(items, list) or len(items) > MAX_BATCH_ITEMS:
+            return JsonResponse({'status': 'error', 'msg': f'items 必须是数组且不超过 {MAX_BATCH_ITEMS} 条'}, status=400)
+        results = _save_items(items, request.user.username)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'status': 'error', 'msg': '请求格式错误'}, status=400)
     except Exception as e:
         return JsonResponse({'status': 'error', 'msg': str(e)}, status=500)
+    return JsonResponse({
+        'status': 'ok',
+        'results': [dict(result, sample_id=sample_id) for sample_id, result in results.items()],
+    })
+
+@require_POST
+@labeler_required
+def propagate_api(request, sample_id):
+    """
+    从当前图片向后跟踪传播: POST {"frames": 5, "annotations": [...]}
+    annotations 为画布上的图形 (像素坐标，可含未保存的修改)，不给时使用已保存的标注；
+    结果写成后续未标注帧的预标注草稿，遇到已标注帧即止，返回生成的草稿数
+    """
+    sample = get_object_or_404(SampleImage, id=sample_id)
+    try:
+        data = json.loads(request.body or '{}')
+        frames = min(max(int(data.get('frames') or get_propagation_frames()), 1), MAX_PROPAGATION_FRAMES)
+        shapes = None
+        if 'annotations' in data:
+            shapes = parse_shape_list(data['annotations'], sample.width, sample.height)
+        drafts = propagate_from(sample, frames, shapes)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'status': 'error', 'msg': '请求格式错误'}, status=400)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'msg': str(e)}, status=500)
+    return JsonResponse({'status': 'ok', 'drafts': drafts})
 
 @never_cache
 @labeler_required
 def download_zip(request, task_id):
     task = get_object_or_404(LabelTask, id=task_id)
     log_operation(request, action="下载数据集", target=task.name)
-    images_dir = os.path.join(settings.MEDIA_ROOT, 'upload', 'images', task.code)
-    response = HttpResponse(content_type='application/zip')
-    response['Content-Disposition'] = f'attachment; filename="{task.code}_images.zip"'
-    
-    with zipfile.ZipFile(response, 'w') as zf:
-        if os.path.exists(images_dir):
-            for root, dirs, files in os.walk(images_dir):
-                for file in files:
-                    if file.lower().endswith(('.jpg', '.png', '.jpeg')):
-                        zf.write(os.path.join(root, file), arcname=file)
+    filename = f"{task.code}_images.zip"
+    # 当前版本已缓存：直接返回文件，支持断点续传
+    cached = get_cached_export(task)
+    if cached:
+        return ranged_file_response(
+            request, cached, filename, content_type='application/zip',
+            etag=f'"{task.code}-v{task.content_version}"'
+        )
+
+    # 缓存缺失或已过期 (等待 build_exports 重建)：边打包边发送
+    response = StreamingHttpResponse(stream_zip(task_export_entries(task)), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
+@never_cache
+@labeler_required
+def export_dataset(request):
+    """
+    导出训练格式数据集 (图片 + 标注)，边查询边打包发送
+    GET ?format=yolo|coco|voc&tasks=1,2,3&approved=1
+    """
+    fmt = request.GET.get('format', '')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'msg': '不支持的导出格式'}, status=400)
+    try:
+        task_ids = [int(i) for i in request.GET.get('tasks', '').split(',') if i.strip()]
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'tasks 参数格式错误'}, status=400)
+    tasks = list(LabelTask.objects.filter(id__in=task_ids).only('id', 'code', 'name'))
+    if not tasks:
+        return JsonResponse({'status': 'error', 'msg': '请选择要导出的任务'}, status=400)
+    approved_only = request.GET.get('approved') == '1'
+
+    log_operation(
+        request, action="导出数据集", target=', '.join(t.name for t in tasks),
+        details=f"格式 {fmt}{'，仅审核通过' if approved_only else ''}"
+    )
+    name = tasks[0].code if len(tasks) == 1 else f"dataset_{len(tasks)}tasks"
+    entries = dataset_entries(fmt, [t.id for t in tasks], approved_only=approved_only)
+    response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{name}_{fmt}.zip"'
+    return response
+
+@never_cache
+@labeler_required
+def label_stats_api(request):
+    """
+    按类别统计图形数 / 含该类别的帧数 / 平均面积，由结构化图形表一条 GROUP BY 得出
+    GET ?tasks=1,2,3 (省略则统计全部任务)
+    """
+    try:
+        task_ids = [int(i) for i in request.GET.get('tasks', '').split(',') if i.strip()]
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'tasks 参数格式错误'}, status=400)
+    names = {item['code']: item['name_cn'] for item in LABEL_CONFIG}
+    items = [
+        dict(row, name=names.get(row['label'], row['label']), avg_area=round(row['avg_area'] or 0, 1))
+        for row in label_stats(task_ids)
+    ]
+    return JsonResponse({'status': 'ok', 'items': items})
+
 @never_cache
 @labeler_required
 def upload_annotation(request, task_id):
     if request.method == 'POST':
         task = get_object_or_404(LabelTask, id=task_id)
+        is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
         anno_file = request.FILES.get('annotation_file')
         if not anno_file or not anno_file.name.endswith('.zip'):
+            if is_ajax:
+                return JsonResponse({'status': 'error', 'msg': '请上传 ZIP'}, status=400)
             messages.error(request, "请上传 ZIP")
             return redirect('labeler:gallery', task_id=task.id)
         try:
-            with zipfile.ZipFile(anno_file, 'r') as zf:
-                for filename in zf.namelist():
-                    base_name = os.path.splitext(os.path.basename(filename))[0]
-                    sample = SampleImage.objects.filter(task=task, original_name__startswith=base_name).first()
-                    if sample:
-                        sample.annotation_content = zf.read(filename).decode('utf-8', errors='ignore')
-                        sample.is_labeled = True
-                        sample.labeled_by = request.user.username 
-                        sample.save()
-            task.labeled_count = task.samples.filter(is_labeled=True).count()
-            task.save()
-            messages.success(request, "上传成功")
+            result = import_annotations(task, anno_file, request.user.username)
+            log_operation(request, action="上传标注", target=task.name, details=result.summary())
+            if is_ajax:
+                return JsonResponse({'status': 'ok', **result.as_dict()})
+            if result.unmatched or result.failed:
+                messages.warning(request, f"上传完成：{result.summary()}")
+            else:
+                messages.success(request, f"上传成功：{result.summary()}")
         except Exception as e:
+            if is_ajax:
+                return JsonResponse({'status': 'error', 'msg': str(e)}, status=500)
             messages.error(request, f"失败: {e}")
-    return redirect('labeler:gallery', task_id=task.id)
+    return redirect('labeler:gallery', task_id=task_id)
 
 def is_superuser(user): 
     return user.is_superuser
@@ -184,5 +389,7 @@ def is_superuser(user):
 @login_required
 @user_passes_test(is_superuser)
 def delete_task(request, task_id):
-    get_object_or_404(LabelTask, id=task_id).delete()
+    task = get_object_or_404(LabelTask, id=task_id)
+    task.delete()
+    remove_task_exports(task)
     return redirect('labeler:dashboard')
\ No newline at end of file
@@ -103,5 +103,57 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
-}
\ No newline at end of file
+    },
+    # 抽帧进度：worker 与 Web 是不同进程，需要可跨进程共享的缓存 (多机部署请改为 Redis)
+    'progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'progress'),
+    },
+}
+
+# 10. 视频抽帧配置
+# 抽帧模式: auto (按间隔自动选择 grab/seek) | grab | seek | read (旧的逐帧解码)
+VIDEO_EXTRACT_MODE = 'auto'
+
+# 每批 bulk_create 的样本数，同时也是 sample_count 检查点的粒度
+VIDEO_INGEST_BATCH_SIZE = 500
+# 长视频分段并行抽帧：进程数 (0/1 关闭，None 为 CPU 核数)，以及启用并行的最短视频时长 (秒)
+# 相似帧过滤会跨段衔接；自适应采样各段独立，每段第一帧总会保留，段边界处可能比单进程多几帧
+VIDEO_SEGMENT_WORKERS = None
+VIDEO_SEGMENT_MIN_SECONDS = 600
+# 单进程流水线：JPEG 编码线程数、阶段间队列长度
+VIDEO_ENCODER_THREADS = 2
+VIDEO_PIPELINE_QUEUE_SIZE = 16
+# 相似帧过滤阈值：64 位感知哈希的汉明距离，<= 该值视为重复帧 (新建任务时勾选后生效)
+VIDEO_DEDUP_DISTANCE = 5
+# 场景自适应采样：默认最低/最高频率 (帧/秒)，以及判定「画面变化」的阈值 (缩略灰度图平均绝对差，0~255)
+VIDEO_ADAPTIVE_MIN_FPS = 0.2
+VIDEO_ADAPTIVE_MAX_FPS = 5
+VIDEO_ADAPTIVE_THRESHOLD = 12.0
+# 抽帧进度写入缓存的最小间隔 (秒)
+VIDEO_PROGRESS_INTERVAL = 1.0
+
+# 视频处理队列 (python manage.py run_video_worker)
+VIDEO_WORKER_CONCURRENCY = 2
+VIDEO_JOB_LEASE_SECONDS = 300
+VIDEO_JOB_MAX_ATTEMPTS = 3
+
+# 11. 数据集导出缓存：按任务 + 内容版本 (图片集变化时递增) 缓存打包好的图片 ZIP，重复下载直接返回文件 (支持断点续传)
+# 缓存由 python manage.py build_exports 构建，建议用 cron 定期执行
+EXPORT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'exports')
+
+# 12. 标注几何紧凑编码：顶点按图片尺寸量化为整数、差分后打包成 base64 存储 (见 apps/labeler/geometry.py)
+# 关闭后新保存的标注按原始浮点坐标存储，已编码的数据仍可正常读取
+ANNOTATION_COMPACT_GEOMETRY = True
+
+# 13. 标注领取：每次领取的样本数、领取有效期 (秒，领取下一张时自动续期)、
+# 驳回样本留给原标注员返工的时间 (秒)，超过后其他标注员也可领取
+LABEL_LEASE_CHUNK = 20
+LABEL_LEASE_SECONDS = 1800
+LABEL_REWORK_GRACE_SECONDS = 86400
+
+# 14. 标注跟踪传播 (预标注)：每个已标注帧向后传播的帧数、批量传播的进程数 (0/1 关闭，None 为 CPU 核数)、
+# 光流计算前把图片缩到的最长边 (像素)
+ANNOTATION_PROPAGATION_FRAMES = 5
+ANNOTATION_PROPAGATION_WORKERS = None
+ANNOTATION_PROPAGATION_MAX_SIDE = 640